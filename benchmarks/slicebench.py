@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+"""
+Benchmarks of the slice hot path: reading slices, assigning them to models,
+loading them through the view context and drawing them. Synthetic cubes of
+several sizes and both sortings are generated in a temporary directory, and
+the timings are written as JSON, one record per benchmark.
+
+Drawing needs a QApplication, so on a machine without a display run it
+under e.g. xvfb-run.
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import segyio
+from PyQt4.QtGui import QApplication
+
+import segyviewlib
+from segyviewlib import SliceDataSource, SliceModel, SliceViewContext, SliceViewWidget, SliceDirection as SD
+
+# (inlines, crosslines, samples)
+SIZES = {
+    'small': (50, 50, 250),
+    'medium': (150, 150, 500),
+    'large': (300, 300, 1000),
+}
+
+SORTINGS = {
+    'inline': segyio.TraceSortingFormat.INLINE_SORTING,
+    'crossline': segyio.TraceSortingFormat.CROSSLINE_SORTING,
+}
+
+DIRECTIONS = [SD.inline, SD.crossline, SD.depth]
+
+# the layout of the viewer for large files, one view of each direction
+_LAYOUT = {'dims': (2, 2), 'grid': [(0, 0), (0, 1), (1, slice(0, 2))]}
+
+
+def create_cube(filename, shape, sorting):
+    """
+    Write a post-stack cube of float traces with a smooth, deterministic
+    pattern, in inline or crossline sorting.
+
+    :type shape: (int, int, int)
+    :type sorting: int
+    """
+    il_count, xl_count, sample_count = shape
+
+    spec = segyio.spec()
+    spec.format = 1
+    spec.sorting = sorting
+    spec.samples = list(range(sample_count))
+    spec.ilines = list(range(1, il_count + 1))
+    spec.xlines = list(range(1, xl_count + 1))
+
+    depth = np.linspace(0.0, 8 * np.pi, sample_count, dtype=np.single)
+
+    if sorting == segyio.TraceSortingFormat.CROSSLINE_SORTING:
+        positions = [(il, xl) for xl in spec.xlines for il in spec.ilines]
+    else:
+        positions = [(il, xl) for il in spec.ilines for xl in spec.xlines]
+
+    with segyio.create(filename, spec) as f:
+        for trace, (il, xl) in enumerate(positions):
+            f.header[trace] = {
+                segyio.TraceField.INLINE_3D: il,
+                segyio.TraceField.CROSSLINE_3D: xl,
+                segyio.TraceField.offset: 1,
+            }
+            f.trace[trace] = np.sin(depth + 0.05 * il) * np.cos(0.05 * xl)
+
+
+def measure(fn, repeat, setup=None):
+    """
+    Call fn repeat times, fn is given the number of the call. setup is
+    called before every call, and is not timed.
+
+    :rtype: dict
+    """
+    timings = []
+    for number in range(repeat):
+        if setup is not None:
+            setup(number)
+
+        start = time.time()
+        fn(number)
+        timings.append(time.time() - start)
+
+    timings.sort()
+    return {
+        'repeat': repeat,
+        'min': timings[0],
+        'median': timings[len(timings) // 2],
+        'mean': sum(timings) / len(timings),
+        'max': timings[-1],
+    }
+
+
+def spread(count, repeat):
+    """ Indexes evenly spread over count, for reading different slices in every call. """
+    return [int(i) for i in np.linspace(0, count - 1, repeat)]
+
+
+def bench_read_slice(filename, repeat):
+    records = []
+
+    for direction in DIRECTIONS:
+        # without a cache, every read goes to the file
+        source = SliceDataSource(filename, cache_size=0, prefetch_count=0)
+        indexes = spread(len(source.indexes_for_direction(direction)), repeat)
+
+        def read(number):
+            source.read_slice(direction, indexes[number])
+
+        records.append(dict(measure(read, repeat), benchmark='read_slice', direction=direction['name'],
+                            cached=False))
+
+        source = SliceDataSource(filename, prefetch_count=0)
+        source.read_slice(direction, indexes[0])
+
+        def read_cached(number):
+            source.read_slice(direction, indexes[0])
+
+        records.append(dict(measure(read_cached, repeat), benchmark='read_slice', direction=direction['name'],
+                            cached=True))
+
+    return records
+
+
+def bench_model_data(filename, repeat):
+    records = []
+    source = SliceDataSource(filename, prefetch_count=0)
+
+    for direction in DIRECTIONS:
+        x_direction, y_direction = [d for d in DIRECTIONS if d != direction]
+        model = SliceModel("Benchmark", direction, x_direction, y_direction)
+        indexes = spread(len(source.indexes_for_direction(direction)), repeat)
+        slices = [source.read_slice(direction, index) for index in indexes]
+
+        def assign(number):
+            model.data = slices[number]
+
+        records.append(dict(measure(assign, repeat), benchmark='model_data', direction=direction['name']))
+
+    return records
+
+
+def _models():
+    return [SliceModel("Inline", SD.inline, SD.crossline, SD.depth),
+            SliceModel("Crossline", SD.crossline, SD.inline, SD.depth),
+            SliceModel("Depth", SD.depth, SD.inline, SD.crossline)]
+
+
+def bench_load_data(filename, repeat):
+    source = SliceDataSource(filename, cache_size=0, prefetch_count=0)
+    models = _models()
+    context = SliceViewContext(models, source)
+    indexes = spread(len(source.indexes_for_direction(SD.inline)), repeat)
+
+    def load(number):
+        for model in models:
+            model.index = indexes[number] % len(source.indexes_for_direction(model.index_direction))
+            model.dirty = True
+        context.load_data()
+
+    return [dict(measure(load, repeat), benchmark='load_data')]
+
+
+def bench_draw(filename, repeat):
+    source = SliceDataSource(filename, prefetch_count=0)
+    context = SliceViewContext(_models(), source)
+    widget = SliceViewWidget(context)
+    widget.set_plot_layout(_LAYOUT)
+    indexes = spread(len(source.indexes_for_direction(SD.inline)), repeat)
+
+    # the slices are read when the index is moved, only the drawing is timed
+    def move(number):
+        context.update_index_for_direction(SD.inline, indexes[number])
+
+    def draw(number):
+        widget.draw()
+
+    record = dict(measure(draw, repeat, move), benchmark='draw')
+    widget.deleteLater()
+    return [record]
+
+
+BENCHMARKS = {
+    'read_slice': bench_read_slice,
+    'model_data': bench_model_data,
+    'load_data': bench_load_data,
+    'draw': bench_draw,
+}
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'segyio': getattr(segyio, '__version__', None),
+        'segyviewlib': getattr(segyviewlib, '__version__', None),
+    }
+
+
+def run(sizes, sortings, benchmarks, repeat, directory):
+    """ :rtype: list[dict] """
+    records = []
+
+    for size in sizes:
+        for sorting in sortings:
+            filename = os.path.join(directory, "%s-%s.sgy" % (size, sorting))
+            if not os.path.exists(filename):
+                create_cube(filename, SIZES[size], SORTINGS[sorting])
+
+            for name in benchmarks:
+                for record in BENCHMARKS[name](filename, repeat):
+                    record.update(size=size, shape=SIZES[size], sorting=sorting)
+                    records.append(record)
+                    print("%-10s %-6s %-9s %-10s %-6s %8.3f ms" % (record['benchmark'], size, sorting,
+                                                                 record.get('direction', ''),
+                                                                 'cached' if record.get('cached') else '',
+                                                                 record['median'] * 1000), file=sys.stderr)
+
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark slice reading and rendering on synthetic cubes')
+    parser.add_argument('--sizes', nargs='+', choices=sorted(SIZES), default=['small', 'medium'],
+                        help='cube sizes to generate, small and medium by default')
+    parser.add_argument('--sortings', nargs='+', choices=sorted(SORTINGS), default=sorted(SORTINGS),
+                        help='trace sortings to generate, all by default')
+    parser.add_argument('--benchmarks', nargs='+', choices=sorted(BENCHMARKS), default=sorted(BENCHMARKS),
+                        help='benchmarks to run, all by default')
+    parser.add_argument('-n', '--repeat', type=int, default=10, help='calls timed per benchmark')
+    parser.add_argument('-d', '--directory', help='where to generate the cubes, and keep them between runs; '
+                                                  'a temporary directory by default')
+    parser.add_argument('-o', '--output', default='bench_output.txt', help='the JSON file to write the results to')
+
+    args = parser.parse_args()
+
+    # drawing needs an application, even when nothing is shown
+    app = QApplication(sys.argv)
+
+    directory = args.directory or tempfile.mkdtemp(prefix='slicebench-')
+    try:
+        records = run(args.sizes, args.sortings, args.benchmarks, args.repeat, directory)
+    finally:
+        if args.directory is None:
+            shutil.rmtree(directory)
+
+    with open(args.output, 'w') as f:
+        json.dump({'environment': environment(), 'results': records}, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -19,7 +19,7 @@ setup(name='segyviewer',
       url='https://github.com/equinor/segyviewer',
       install_requires=['segyviewlib'],
       setup_requires=['setuptools_scm'],
-      scripts=['applications/segyviewer'],
+      scripts=['applications/segyviewer', 'applications/segyexport'],
       license='LGPL-3.0',
       platforms='any',
       classifiers=[
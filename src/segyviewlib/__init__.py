@@ -34,9 +34,23 @@ from .layoutfigure import LayoutFigure
 from .layoutcanvas import LayoutCanvas
 
 from .slicemodel import SliceModel, SliceDirection
+from .memorybudget import MemoryBudget, MemoryAccount, memory_budget
+from .slicecache import SliceCache
+from .sliceprefetcher import SlicePrefetcher
+from .geometryindex import GeometryIndex
+from .depthsidecar import DepthSidecar
+from .brickstore import BrickStore
+from .slicepyramid import SlicePyramid
+from .sourceregistry import SourceRegistry, SharedSource, source_registry
 from .slicedatasource import SliceDataSource
+from .asyncsliceloader import AsyncSliceLoader
+from .cubestatistics import StreamingStatistics, CubeStatistics
+from .tracesample import TraceSample, TraceSampler
 from .sliceviewcontext import SliceViewContext
+from .imagerenderer import ImageRenderer
 from .sliceview import SliceView
+from .framescheduler import FrameScheduler
+from .sliceexport import SliceExporter, export_slices
 from .sliceviewwidget import SliceViewWidget
 from .settingswindow import SettingsWindow
 from .helpwindow import HelpWindow
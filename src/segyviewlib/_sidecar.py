@@ -0,0 +1,143 @@
+import os
+import struct
+import tempfile
+from contextlib import contextmanager
+
+import segyio
+
+# magic, version, source size, source modification time
+_HEADER = struct.Struct("<4sIQd")
+
+# inline field, crossline field, endianness
+_FIELDS = struct.Struct("<ii8s")
+
+
+def signature(filename):
+    """
+    The size and modification time of a file, used to decide if a sidecar
+    file is still valid for its source.
+
+    :rtype: (int, float)
+    """
+    stat = os.stat(filename)
+    return stat.st_size, stat.st_mtime
+
+
+def sidecar_path(filename, suffix, directory=None):
+    """
+    The path of a sidecar file. Sidecars are placed next to the source file
+    unless another directory is given.
+
+    :rtype: str
+    """
+    if directory is None:
+        return filename + suffix
+    return os.path.join(directory, os.path.basename(filename) + suffix)
+
+
+def write_header(f, magic, version, source_signature):
+    size, mtime = source_signature
+    f.write(_HEADER.pack(magic, version, size, mtime))
+
+
+def read_header(f):
+    """ :rtype: (bytes, int, (int, float)) """
+    data = f.read(_HEADER.size)
+    if len(data) != _HEADER.size:
+        raise IOError("Truncated sidecar header")
+
+    magic, version, size, mtime = _HEADER.unpack(data)
+    return magic, version, (size, mtime)
+
+
+def header_size():
+    return _HEADER.size
+
+
+def fields_for(kwargs):
+    """
+    The arguments of segyio.open the geometry of a file depends on, and
+    with it the sidecars of the file.
+
+    :type kwargs: dict
+    :rtype: (int, int, str)
+    """
+    return (kwargs.get('iline', segyio.TraceField.INLINE_3D),
+            kwargs.get('xline', segyio.TraceField.CROSSLINE_3D),
+            kwargs.get('endian', 'big'))
+
+
+def write_fields(f, fields):
+    iline, xline, endian = fields
+    f.write(_FIELDS.pack(iline, xline, endian.encode("ascii")))
+
+
+def read_fields(f):
+    """ :rtype: (int, int, str) """
+    data = f.read(_FIELDS.size)
+    if len(data) != _FIELDS.size:
+        raise IOError("Truncated sidecar fields")
+
+    iline, xline, endian = _FIELDS.unpack(data)
+    return iline, xline, endian.rstrip(b"\0").decode("ascii")
+
+
+def replace(temporary, path):
+    """Move a completely written sidecar into place."""
+    if os.path.exists(path):
+        os.remove(path)
+    os.rename(temporary, path)
+
+
+@contextmanager
+def writing(path):
+    """
+    Write a sidecar to a temporary file, moved into place when the block
+    completes. The temporary file is removed when the block raises, e.g.
+    when a background open is cancelled in the middle of a build, or when
+    it cannot be moved into place.
+
+    Every write has its own temporary file, so sources of the same file
+    that build a sidecar at the same time cannot interleave their writes.
+
+    :type path: str
+    :rtype: str
+    """
+    directory, name = os.path.split(path)
+    fd, temporary = tempfile.mkstemp(suffix=".tmp", prefix=name + ".", dir=directory or ".")
+    os.close(fd)
+
+    try:
+        yield temporary
+        # mkstemp only lets the owner read the file
+        os.chmod(temporary, 0o644)
+        replace(temporary, path)
+    except:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def open_or_build(cls, filename, source, directory=None, fields=None, progress=None):
+    """
+    Open the sidecar of class cls for filename, or build it when there is
+    no valid one. A sidecar that cannot be written, e.g. in a read-only
+    directory or on a full disk, is not an error; None is returned and the
+    file is read through segyio instead.
+
+    :type cls: type
+    :type filename: str
+    :type source: segyio.SegyFile
+    :param fields: The (iline, xline, endian) arguments source was opened with
+    :type fields: (int, int, str) | None
+    :param progress: Called with the completed fraction while building
+    :type progress: callable | None
+    """
+    sidecar = cls.open(filename, source, directory, fields=fields)
+    if sidecar is not None:
+        return sidecar
+
+    try:
+        return cls.build(filename, source, directory, fields=fields, progress=progress)
+    except (IOError, OSError):
+        return None
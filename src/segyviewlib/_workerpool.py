@@ -0,0 +1,47 @@
+import traceback
+
+from PyQt4.QtCore import QRunnable, QThreadPool
+
+_pool = None
+
+# work for views that are not shown, e.g. background tabs, waits for all
+# other queued work
+BACKGROUND_PRIORITY = -1
+
+
+class _FunctionRunnable(QRunnable):
+    def __init__(self, fn, args):
+        QRunnable.__init__(self)
+        self._fn = fn
+        self._args = args
+        self.setAutoDelete(True)
+
+    def run(self):
+        try:
+            self._fn(*self._args)
+        except Exception:
+            # exceptions must not escape into the Qt thread pool
+            traceback.print_exc()
+
+
+def worker_pool():
+    """
+    The thread pool shared by all background work in segyviewlib.
+
+    :rtype: QThreadPool
+    """
+    global _pool
+    if _pool is None:
+        _pool = QThreadPool()
+        _pool.setMaxThreadCount(max(2, min(4, QThreadPool.globalInstance().maxThreadCount())))
+    return _pool
+
+
+def submit(fn, *args):
+    """Run fn(*args) on a thread in the shared worker pool."""
+    worker_pool().start(_FunctionRunnable(fn, args))
+
+
+def submit_background(fn, *args):
+    """Run fn(*args) in the shared worker pool once no other work is queued."""
+    worker_pool().start(_FunctionRunnable(fn, args), BACKGROUND_PRIORITY)
@@ -0,0 +1,87 @@
+from threading import Lock
+import traceback
+
+from PyQt4.QtCore import QObject, pyqtSignal
+
+from ._workerpool import submit
+
+
+class AsyncSliceLoader(QObject):
+    """
+    Reads slices for models on the worker pool and delivers them on the
+    thread that owns the loader. Only the most recent request for a model
+    is delivered, older requests are cancelled.
+    """
+    slice_loaded = pyqtSignal(object, object, object, object)
+
+    _slice_read = pyqtSignal(object, object, int, object, object)
+
+    def __init__(self, slice_data_source, parent=None):
+        """ :type slice_data_source: segyviewlib.SliceDataSource """
+        QObject.__init__(self, parent)
+        self._slice_data_source = slice_data_source
+        self._pending = {}
+        self._token = 0
+        self._lock = Lock()
+
+        self._slice_read.connect(self._deliver)
+
+    def request(self, model):
+        """
+        Read the slice for the current index, resolution and window of model,
+        superseding any pending request for the same model. Delivered
+        requests are (index, step, window) tuples, delivered with the data
+        and how it was decimated.
+
+        :type model: segyviewlib.SliceModel
+        """
+        request = (model.index, model.resolution_step, model.window)
+
+        with self._lock:
+            pending = self._pending.get(model)
+            if pending is not None and pending[0] == request:
+                return
+
+            self._token += 1
+            token = self._token
+            self._pending[model] = (request, token)
+
+        submit(self._read, model, model.index_direction, request, token)
+
+    def is_pending(self, model):
+        with self._lock:
+            return model in self._pending
+
+    def cancel(self):
+        """Cancel every pending request."""
+        with self._lock:
+            self._pending.clear()
+
+    def _is_current(self, model, token):
+        with self._lock:
+            pending = self._pending.get(model)
+            return pending is not None and pending[1] == token
+
+    def _read(self, model, direction, request, token):
+        if not self._is_current(model, token):
+            return
+
+        index, step, window = request
+        try:
+            decimation = self._slice_data_source.decimation(step)
+            data = self._slice_data_source.read_slice(direction, index, step, window)
+        except Exception:
+            traceback.print_exc()
+            decimation, data = None, None
+
+        self._slice_read.emit(model, request, token, data, decimation)
+
+    def _deliver(self, model, request, token, data, decimation):
+        if not self._is_current(model, token):
+            return
+
+        with self._lock:
+            del self._pending[model]
+
+        if data is not None:
+            self.slice_loaded.emit(model, request, data, decimation)
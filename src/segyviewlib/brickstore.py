@@ -0,0 +1,299 @@
+import mmap
+import os
+import struct
+import zlib
+
+import numpy as np
+import segyio
+
+from . import _sidecar
+from .slicecache import SliceCache
+from .slicemodel import SliceDirection
+
+
+def _compress(brick, level):
+    # grouping the bytes of the floats by significance (shuffling) makes the
+    # data far more compressible
+    shuffled = brick.astype(np.single).view(np.uint8).reshape(-1, 4).T
+    return zlib.compress(np.ascontiguousarray(shuffled).tobytes(), level)
+
+
+def _decompress(blob, shape):
+    shuffled = np.frombuffer(zlib.decompress(blob), dtype=np.uint8).reshape(4, -1)
+    return np.ascontiguousarray(shuffled.T).view(np.single).reshape(shape)
+
+
+class BrickStore(object):
+    """
+    A copy of a post-stack cube split into zlib compressed bricks of
+    brick_size^3 samples, stored next to the SEG-Y file. Reading an inline,
+    crossline or depth slice decompresses the bricks intersecting the
+    slice, so every direction costs about the same.
+
+    The cube is indexed (inline, crossline, sample), and slices are returned
+    in the same orientation as SliceDataSource.read_slice.
+    """
+
+    SUFFIX = ".bricks.svc"
+    MAGIC = b"SVBK"
+    VERSION = 2
+
+    DEFAULT_BRICK_SIZE = 64
+    DEFAULT_CACHE_BYTES = 64 * 1024 ** 2
+    COMPRESSION_LEVEL = 1
+
+    # shape of the cube and the brick size
+    _LAYOUT = struct.Struct("<IIII")
+    # offset and length of a compressed brick
+    _ENTRY = struct.Struct("<QI")
+
+    def __init__(self, path, cache_size=DEFAULT_CACHE_BYTES):
+        super(BrickStore, self).__init__()
+        self._path = path
+
+        with open(path, "rb") as f:
+            magic, version, self._signature = _sidecar.read_header(f)
+            if magic != self.MAGIC or version != self.VERSION:
+                raise IOError("Not a brick store: %s" % path)
+
+            layout = self._LAYOUT.unpack(f.read(self._LAYOUT.size))
+            self._shape = layout[:3]
+            self._brick_size = layout[3]
+            self._fields = _sidecar.read_fields(f)
+
+            count = int(np.prod(self._brick_counts(self._shape, self._brick_size)))
+            index = f.read(count * self._ENTRY.size)
+            if len(index) != count * self._ENTRY.size:
+                raise IOError("Truncated brick store: %s" % path)
+
+            self._index = np.frombuffer(index, dtype=[("offset", "<u8"), ("length", "<u4")])
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self._bricks = SliceCache(cache_size)
+
+    @staticmethod
+    def _brick_counts(shape, brick_size):
+        return tuple((n + brick_size - 1) // brick_size for n in shape)
+
+    @property
+    def path(self):
+        """ :rtype: str """
+        return self._path
+
+    @property
+    def shape(self):
+        """ :rtype: (int, int, int) """
+        return self._shape
+
+    @property
+    def brick_size(self):
+        """ :rtype: int """
+        return self._brick_size
+
+    @property
+    def signature(self):
+        """ :rtype: (int, float) """
+        return self._signature
+
+    @property
+    def fields(self):
+        """ The (iline, xline, endian) arguments the file was opened with. """
+        return self._fields
+
+    @property
+    def brick_cache(self):
+        """ :rtype: SliceCache """
+        return self._bricks
+
+    def _brick(self, bi, bx, bs):
+        key = (bi, bx, bs)
+        brick = self._bricks.get(key)
+
+        if brick is None:
+            counts = self._brick_counts(self._shape, self._brick_size)
+            entry = self._index[(bi * counts[1] + bx) * counts[2] + bs]
+            offset, length = int(entry["offset"]), int(entry["length"])
+
+            size = self._brick_size
+            shape = tuple(min(size, n - b * size) for n, b in zip(self._shape, key))
+            brick = _decompress(self._mmap[offset:offset + length], shape)
+            self._bricks.put(key, brick)
+
+        return brick
+
+    def read_cube(self, ilines, xlines, samples):
+        """
+        Read a sub-cube given by three slices in (inline, crossline, sample)
+        index space.
+
+        :type ilines: slice
+        :type xlines: slice
+        :type samples: slice
+        :rtype: numpy.ndarray
+        """
+        ranges = [s.indices(n)[:2] for s, n in zip((ilines, xlines, samples), self._shape)]
+        out = np.empty([stop - start for start, stop in ranges], dtype=np.single)
+
+        size = self._brick_size
+        bricks = [range(start // size, (stop - 1) // size + 1) if stop > start else []
+                  for start, stop in ranges]
+
+        for bi in bricks[0]:
+            for bx in bricks[1]:
+                for bs in bricks[2]:
+                    brick = self._brick(bi, bx, bs)
+                    src, dst = [], []
+                    for b, (start, stop) in zip((bi, bx, bs), ranges):
+                        lo = max(start, b * size)
+                        hi = min(stop, (b + 1) * size)
+                        src.append(slice(lo - b * size, hi - b * size))
+                        dst.append(slice(lo - start, hi - start))
+                    out[tuple(dst)] = brick[tuple(src)]
+
+        return out
+
+    def read_slice(self, direction, index, window=None):
+        """
+        Read a slice, or the (y0, y1, x0, x1) window of it. Only the bricks
+        intersecting the window are decompressed.
+
+        :rtype: numpy.ndarray
+        """
+        if window is None:
+            rows = columns = slice(None)
+        else:
+            y0, y1, x0, x1 = window
+            rows, columns = slice(y0, y1), slice(x0, x1)
+
+        plane = slice(index, index + 1)
+        if direction == SliceDirection.inline:
+            return self.read_cube(plane, columns, rows)[0].T
+        elif direction == SliceDirection.crossline:
+            return self.read_cube(columns, plane, rows)[:, 0, :].T
+        elif direction == SliceDirection.depth:
+            return self.read_cube(columns, rows, plane)[:, :, 0].T
+        else:
+            raise ValueError("Unknown direction: %s" % direction)
+
+    def close(self):
+        self._bricks.clear()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    @classmethod
+    def open(cls, filename, source, directory=None, cache_size=DEFAULT_CACHE_BYTES, fields=None):
+        """
+        Open the brick store for filename if it exists and is still valid
+        for the source file.
+
+        :type filename: str
+        :type source: segyio.SegyFile
+        :param fields: The (iline, xline, endian) arguments source was opened
+                       with, None for the defaults of segyio.open
+        :type fields: (int, int, str) | None
+        :rtype: BrickStore | None
+        """
+        path = _sidecar.sidecar_path(filename, cls.SUFFIX, directory)
+        fields = _sidecar.fields_for({}) if fields is None else tuple(fields)
+
+        try:
+            store = cls(path, cache_size)
+        except (IOError, OSError, ValueError, struct.error):
+            return None
+
+        expected_shape = (len(source.ilines), len(source.xlines), len(source.samples))
+        valid = (store.signature == _sidecar.signature(filename) and store.shape == expected_shape
+                 and store.fields == fields)
+        if not valid:
+            store.close()
+            return None
+
+        return store
+
+    @classmethod
+    def build(cls, filename, source, directory=None, brick_size=DEFAULT_BRICK_SIZE,
+              cache_size=DEFAULT_CACHE_BYTES, fields=None, progress=None):
+        """
+        Write the brick store for filename, replacing any existing one.
+        The file is read brick_size^2 traces at a time, which is also about
+        the memory used while building.
+
+        :type filename: str
+        :type source: segyio.SegyFile
+        :param fields: The (iline, xline, endian) arguments source was opened
+                       with, None for the defaults of segyio.open
+        :type fields: (int, int, str) | None
+        :param progress: Called with the completed fraction while building
+        :type progress: callable | None
+        :rtype: BrickStore
+        """
+        path = _sidecar.sidecar_path(filename, cls.SUFFIX, directory)
+        fields = _sidecar.fields_for({}) if fields is None else tuple(fields)
+
+        with _sidecar.writing(path) as temporary:
+            shape = (len(source.ilines), len(source.xlines), len(source.samples))
+            counts = cls._brick_counts(shape, brick_size)
+            index = np.zeros(int(np.prod(counts)), dtype=[("offset", "<u8"), ("length", "<u4")])
+
+            # the lines along the sorting of the file, and the traces of a line
+            crossline_sorted = source.sorting == segyio.TraceSortingFormat.CROSSLINE_SORTING
+            if crossline_sorted:
+                line_count, line_length = shape[1], shape[0]
+            else:
+                line_count, line_length = shape[0], shape[1]
+
+            with open(temporary, "wb") as f:
+                _sidecar.write_header(f, cls.MAGIC, cls.VERSION, _sidecar.signature(filename))
+                f.write(cls._LAYOUT.pack(shape[0], shape[1], shape[2], brick_size))
+                _sidecar.write_fields(f, fields)
+                index_offset = f.tell()
+                f.write(index.tobytes())
+
+                # read one column of bricks at a time, brick_size traces of
+                # brick_size lines, so the memory used does not grow with the
+                # width of the survey
+                for start in range(0, line_count, brick_size):
+                    stop = min(start + brick_size, line_count)
+
+                    for column in range(0, line_length, brick_size):
+                        traces = slice(column, min(column + brick_size, line_length))
+                        block = np.stack([source.trace.raw[line * line_length + traces.start:
+                                                           line * line_length + traces.stop]
+                                          for line in range(start, stop)])
+
+                        if crossline_sorted:
+                            block = block.transpose(1, 0, 2)
+                            i, x = column // brick_size, start // brick_size
+                        else:
+                            i, x = start // brick_size, column // brick_size
+
+                        for s in range(counts[2]):
+                            brick = block[:, :, s * brick_size:(s + 1) * brick_size]
+                            blob = _compress(brick, cls.COMPRESSION_LEVEL)
+                            index[(i * counts[1] + x) * counts[2] + s] = (f.tell(), len(blob))
+                            f.write(blob)
+
+                    if progress is not None:
+                        progress(float(stop) / line_count)
+
+                f.seek(index_offset)
+                f.write(index.tobytes())
+
+        return cls(path, cache_size)
+
+    @classmethod
+    def open_or_build(cls, filename, source, directory=None, fields=None, progress=None):
+        """
+        The brick store for filename, built if there is no valid one, or None
+        when it cannot be written.
+
+        :rtype: BrickStore | None
+        """
+        return _sidecar.open_or_build(cls, filename, source, directory, fields, progress)
+
+    @classmethod
+    def remove(cls, filename, directory=None):
+        path = _sidecar.sidecar_path(filename, cls.SUFFIX, directory)
+        if os.path.exists(path):
+            os.remove(path)
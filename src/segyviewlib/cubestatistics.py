@@ -0,0 +1,298 @@
+import json
+import os
+import threading
+
+import numpy as np
+import segyio
+from PyQt4.QtCore import QObject, pyqtSignal
+
+from . import _sidecar
+from ._workerpool import submit
+
+
+class StreamingStatistics(object):
+    """
+    Single pass statistics of a stream of samples: minimum, maximum, mean,
+    RMS and a histogram that grows its range as needed, from which
+    approximate percentiles are computed. Non-finite samples are ignored.
+    """
+
+    BINS = 4096
+
+    def __init__(self, bins=BINS):
+        super(StreamingStatistics, self).__init__()
+        if bins % 2 != 0:
+            raise ValueError("The number of bins must be even")
+
+        self._count = 0
+        self._sum = 0.0
+        self._sum_of_squares = 0.0
+        self._minimum = None
+        self._maximum = None
+        self._histogram = np.zeros(bins, dtype=np.int64)
+        self._low = None
+        self._high = None
+
+    @property
+    def count(self):
+        """ :rtype: int """
+        return self._count
+
+    @property
+    def minimum(self):
+        """ :rtype: float """
+        return self._minimum
+
+    @property
+    def maximum(self):
+        """ :rtype: float """
+        return self._maximum
+
+    @property
+    def mean(self):
+        """ :rtype: float """
+        return self._sum / self._count if self._count else None
+
+    @property
+    def rms(self):
+        """ :rtype: float """
+        return np.sqrt(self._sum_of_squares / self._count) if self._count else None
+
+    @property
+    def histogram(self):
+        """ :rtype: numpy.ndarray """
+        return self._histogram
+
+    @property
+    def bin_edges(self):
+        """ :rtype: numpy.ndarray """
+        if self._low is None:
+            return None
+        return np.linspace(self._low, self._high, len(self._histogram) + 1)
+
+    def update(self, samples):
+        """ :type samples: numpy.ndarray """
+        samples = np.asarray(samples).ravel()
+        samples = samples[np.isfinite(samples)]
+
+        if samples.size == 0:
+            return
+
+        chunk_min = float(samples.min())
+        chunk_max = float(samples.max())
+
+        self._count += samples.size
+        self._sum += float(np.sum(samples, dtype=np.float64))
+        self._sum_of_squares += float(np.dot(samples.astype(np.float64), samples.astype(np.float64)))
+        self._minimum = chunk_min if self._minimum is None else min(self._minimum, chunk_min)
+        self._maximum = chunk_max if self._maximum is None else max(self._maximum, chunk_max)
+
+        if self._low is None:
+            width = chunk_max - chunk_min
+            if width == 0:
+                width = max(abs(chunk_max), 1.0)
+            self._low = chunk_min - width / 2.0
+            self._high = chunk_max + width / 2.0
+
+        while chunk_min < self._low:
+            self._grow(downwards=True)
+
+        while chunk_max >= self._high:
+            self._grow(downwards=False)
+
+        histogram, _ = np.histogram(samples, bins=len(self._histogram), range=(self._low, self._high))
+        self._histogram += histogram
+
+    def _grow(self, downwards):
+        # double the range, merging pairs of bins keeps every edge exact
+        merged = self._histogram.reshape(-1, 2).sum(axis=1)
+        half = len(merged)
+        self._histogram = np.zeros_like(self._histogram)
+        width = self._high - self._low
+
+        if downwards:
+            self._histogram[half:] = merged
+            self._low -= width
+        else:
+            self._histogram[:half] = merged
+            self._high += width
+
+    def percentile(self, percent):
+        """
+        The approximate percentile, interpolated within a histogram bin.
+
+        :type percent: float
+        :rtype: float
+        """
+        if self._count == 0:
+            return None
+
+        target = self._count * percent / 100.0
+        cumulative = np.cumsum(self._histogram)
+        index = int(np.searchsorted(cumulative, target))
+        index = min(index, len(self._histogram) - 1)
+
+        before = cumulative[index - 1] if index > 0 else 0
+        in_bin = self._histogram[index]
+        fraction = (target - before) / float(in_bin) if in_bin else 0.0
+
+        edges = self.bin_edges
+        value = edges[index] + fraction * (edges[index + 1] - edges[index])
+        return float(min(max(value, self._minimum), self._maximum))
+
+    def to_dict(self):
+        return {
+            "count": self._count,
+            "sum": self._sum,
+            "sum_of_squares": self._sum_of_squares,
+            "minimum": self._minimum,
+            "maximum": self._maximum,
+            "low": self._low,
+            "high": self._high,
+            "histogram": self._histogram.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, values):
+        statistics = cls(len(values["histogram"]))
+        statistics._count = values["count"]
+        statistics._sum = values["sum"]
+        statistics._sum_of_squares = values["sum_of_squares"]
+        statistics._minimum = values["minimum"]
+        statistics._maximum = values["maximum"]
+        statistics._low = values["low"]
+        statistics._high = values["high"]
+        statistics._histogram = np.array(values["histogram"], dtype=np.int64)
+        return statistics
+
+
+class CubeStatistics(QObject):
+    """
+    Computes StreamingStatistics for every sample in a SEG-Y file on the
+    worker pool, reading the traces in chunks. The result is cached in a
+    file next to the SEG-Y file, and reused while the size and modification
+    time of the SEG-Y file are unchanged. If the file cannot be read, e.g.
+    when it is truncated or replaced while it is read, failed is emitted
+    with the error instead of finished.
+    """
+    progress_changed = pyqtSignal(float)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(object)
+
+    SUFFIX = ".stats.json"
+    VERSION = 1
+
+    # the number of traces read at a time
+    CHUNK_TRACES = 4096
+
+    def __init__(self, filename, segyioargs=None, parent=None):
+        QObject.__init__(self, parent)
+        self._filename = filename
+        self._segyioargs = dict(segyioargs or {})
+        self._cancelled = threading.Event()
+        self._result = None
+
+    @property
+    def result(self):
+        """ :rtype: StreamingStatistics | None """
+        return self._result
+
+    def start(self):
+        """
+        Emit finished with the statistics, immediately if they are cached,
+        otherwise when the background computation is done.
+        """
+        statistics = self.load(self._filename)
+        if statistics is not None:
+            self._finish(statistics)
+            return
+
+        self._cancelled.clear()
+        submit(self._run)
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def _finish(self, statistics):
+        self._result = statistics
+        self.progress_changed.emit(1.0)
+        self.finished.emit(statistics)
+
+    def _run(self):
+        try:
+            statistics = self._compute()
+        except Exception as e:
+            self.failed.emit(e)
+            return
+
+        if statistics is None:
+            return
+
+        try:
+            self.save(self._filename, statistics)
+        except (IOError, OSError):
+            pass
+
+        self._finish(statistics)
+
+    def _compute(self):
+        """ :rtype: StreamingStatistics | None """
+        statistics = StreamingStatistics()
+        args = dict(self._segyioargs, ignore_geometry=True)
+
+        with segyio.open(self._filename, "r", **args) as f:
+            f.mmap()
+            count = f.tracecount
+
+            for start in range(0, count, self.CHUNK_TRACES):
+                if self._cancelled.is_set():
+                    return None
+
+                stop = min(start + self.CHUNK_TRACES, count)
+                statistics.update(f.trace.raw[start:stop])
+                self.progress_changed.emit(float(stop) / count)
+
+        return statistics
+
+    @classmethod
+    def path(cls, filename, directory=None):
+        return _sidecar.sidecar_path(filename, cls.SUFFIX, directory)
+
+    @classmethod
+    def load(cls, filename, directory=None):
+        """
+        The cached statistics for filename, if they are still valid.
+
+        :rtype: StreamingStatistics | None
+        """
+        try:
+            with open(cls.path(filename, directory)) as f:
+                values = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+        if values.get("version") != cls.VERSION:
+            return None
+
+        if tuple(values.get("signature", ())) != _sidecar.signature(filename):
+            return None
+
+        return StreamingStatistics.from_dict(values["statistics"])
+
+    @classmethod
+    def save(cls, filename, statistics, directory=None):
+        values = {
+            "version": cls.VERSION,
+            "signature": list(_sidecar.signature(filename)),
+            "statistics": statistics.to_dict(),
+        }
+
+        with _sidecar.writing(cls.path(filename, directory)) as temporary:
+            with open(temporary, "w") as f:
+                json.dump(values, f)
+
+    @classmethod
+    def remove(cls, filename, directory=None):
+        path = cls.path(filename, directory)
+        if os.path.exists(path):
+            os.remove(path)
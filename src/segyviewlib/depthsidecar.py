@@ -0,0 +1,177 @@
+import os
+import struct
+
+import numpy as np
+import segyio
+
+from . import _sidecar
+
+
+class DepthSidecar(object):
+    """
+    A copy of a post-stack cube stored sample-major, as an array of shape
+    (samples, crosslines, inlines), next to the SEG-Y file. A depth slice is a
+    single contiguous read from the memory mapped sidecar, instead of a read
+    of one sample from every trace in the file.
+    """
+
+    SUFFIX = ".depth.svc"
+    MAGIC = b"SVDS"
+    VERSION = 2
+
+    _SHAPE = struct.Struct("<III")
+    _DATA_OFFSET = 64
+
+    # the amount of memory used for the line buffer when building
+    BUILD_BUFFER_BYTES = 64 * 1024 ** 2
+
+    def __init__(self, path):
+        super(DepthSidecar, self).__init__()
+        self._path = path
+
+        with open(path, "rb") as f:
+            magic, version, self._signature = _sidecar.read_header(f)
+            shape = self._SHAPE.unpack(f.read(self._SHAPE.size))
+            self._fields = _sidecar.read_fields(f)
+
+        if magic != self.MAGIC or version != self.VERSION:
+            raise IOError("Not a depth sidecar: %s" % path)
+
+        self._data = np.memmap(path, dtype=np.single, mode="r", offset=self._DATA_OFFSET, shape=shape)
+
+    @property
+    def path(self):
+        """ :rtype: str """
+        return self._path
+
+    @property
+    def shape(self):
+        """ :rtype: (int, int, int) """
+        return self._data.shape
+
+    @property
+    def signature(self):
+        """ :rtype: (int, float) """
+        return self._signature
+
+    @property
+    def fields(self):
+        """ The (iline, xline, endian) arguments the file was opened with. """
+        return self._fields
+
+    def depth_slice(self, index, window=None):
+        """
+        The depth slice at index, shaped (crosslines, inlines) like
+        SliceDataSource.read_slice, or the (y0, y1, x0, x1) window of it.
+
+        :rtype: numpy.ndarray
+        """
+        if window is None:
+            return np.array(self._data[index])
+
+        y0, y1, x0, x1 = window
+        return np.array(self._data[index, y0:y1, x0:x1])
+
+    def close(self):
+        self._data = None
+
+    @classmethod
+    def open(cls, filename, source, directory=None, fields=None):
+        """
+        Open the sidecar for filename if it exists and is still valid for
+        the source file.
+
+        :type filename: str
+        :type source: segyio.SegyFile
+        :param fields: The (iline, xline, endian) arguments source was opened
+                       with, None for the defaults of segyio.open
+        :type fields: (int, int, str) | None
+        :rtype: DepthSidecar | None
+        """
+        path = _sidecar.sidecar_path(filename, cls.SUFFIX, directory)
+        fields = _sidecar.fields_for({}) if fields is None else tuple(fields)
+
+        try:
+            sidecar = cls(path)
+        except (IOError, OSError, ValueError, struct.error):
+            return None
+
+        expected_shape = (len(source.samples), len(source.xlines), len(source.ilines))
+        valid = (sidecar.signature == _sidecar.signature(filename) and sidecar.shape == expected_shape
+                 and sidecar.fields == fields)
+        if not valid:
+            sidecar.close()
+            return None
+
+        return sidecar
+
+    @classmethod
+    def build(cls, filename, source, directory=None, fields=None, progress=None):
+        """
+        Write the sidecar for filename, replacing any existing one.
+
+        :type filename: str
+        :type source: segyio.SegyFile
+        :param fields: The (iline, xline, endian) arguments source was opened
+                       with, None for the defaults of segyio.open
+        :type fields: (int, int, str) | None
+        :param progress: Called with the completed fraction while building
+        :type progress: callable | None
+        :rtype: DepthSidecar
+        """
+        path = _sidecar.sidecar_path(filename, cls.SUFFIX, directory)
+        fields = _sidecar.fields_for({}) if fields is None else tuple(fields)
+
+        with _sidecar.writing(path) as temporary:
+            ilines, xlines, samples = source.ilines, source.xlines, source.samples
+            shape = (len(samples), len(xlines), len(ilines))
+
+            with open(temporary, "wb") as f:
+                _sidecar.write_header(f, cls.MAGIC, cls.VERSION, _sidecar.signature(filename))
+                f.write(cls._SHAPE.pack(*shape))
+                _sidecar.write_fields(f, fields)
+
+            data = np.memmap(temporary, dtype=np.single, mode="r+", offset=cls._DATA_OFFSET, shape=shape)
+
+            # read along the sorting of the file, so the source is read sequentially
+            if source.sorting == segyio.TraceSortingFormat.CROSSLINE_SORTING:
+                lines, numbers, axis = source.xline, xlines, 1
+            else:
+                lines, numbers, axis = source.iline, ilines, 2
+
+            line_bytes = shape[0] * (shape[1] if axis == 2 else shape[2]) * 4
+            chunk = max(1, cls.BUILD_BUFFER_BYTES // max(1, line_bytes))
+
+            for start in range(0, len(numbers), chunk):
+                stop = min(start + chunk, len(numbers))
+                block = np.stack([lines[number] for number in numbers[start:stop]])
+
+                # block is (lines, traces, samples), the sidecar wants samples first
+                if axis == 2:
+                    data[:, :, start:stop] = block.transpose(2, 1, 0)
+                else:
+                    data[:, start:stop, :] = block.transpose(2, 0, 1)
+
+                if progress is not None:
+                    progress(float(stop) / len(numbers))
+
+            data.flush()
+            del data
+
+        return cls(path)
+
+    @classmethod
+    def open_or_build(cls, filename, source, directory=None, fields=None, progress=None):
+        """
+        The sidecar for filename, built if there is no valid one, or None
+        when it cannot be written.
+
+        :rtype: DepthSidecar | None
+        """
+        return _sidecar.open_or_build(cls, filename, source, directory, fields, progress)
+
+    @classmethod
+    def remove(cls, filename, directory=None):
+        path = _sidecar.sidecar_path(filename, cls.SUFFIX, directory)
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,75 @@
+import time
+from collections import OrderedDict
+
+from PyQt4.QtCore import QObject, QTimer
+
+
+class FrameScheduler(QObject):
+    """
+    Coalesces bursts of updates into at most one update per frame. Every
+    update is scheduled under a key, and only the latest update for a key
+    is run when the next frame is due; the updates of a frame run in the
+    order their keys were first scheduled.
+    """
+
+    DEFAULT_FRAME_RATE = 30
+
+    def __init__(self, frame_rate=DEFAULT_FRAME_RATE, parent=None):
+        QObject.__init__(self, parent)
+        self._frame_rate = frame_rate
+        self._pending = OrderedDict()
+        self._last_frame = None
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.flush)
+
+    @property
+    def frame_rate(self):
+        """ :rtype: float """
+        return self._frame_rate
+
+    @frame_rate.setter
+    def frame_rate(self, value):
+        """ :type value: float """
+        if value <= 0:
+            raise ValueError("The frame rate must be positive")
+        self._frame_rate = value
+
+    def is_pending(self, key):
+        """ :rtype: bool """
+        return key in self._pending
+
+    def pending_args(self, key):
+        """ The arguments of the pending update for key, or None. """
+        if key not in self._pending:
+            return None
+        return self._pending[key][1]
+
+    def schedule(self, key, fn, *args):
+        """
+        Run fn(*args) with the next frame, replacing any update pending
+        for the same key.
+        """
+        self._pending[key] = (fn, args)
+
+        if not self._timer.isActive():
+            elapsed = 0.0 if self._last_frame is None else time.time() - self._last_frame
+            delay = max(0.0, 1.0 / self._frame_rate - elapsed)
+            self._timer.start(int(delay * 1000))
+
+    def flush(self):
+        """ Run every pending update now. """
+        self._timer.stop()
+        self._last_frame = time.time()
+
+        # updates scheduled while running these wait for the next frame
+        pending = list(self._pending.values())
+        self._pending.clear()
+
+        for fn, args in pending:
+            fn(*args)
+
+    def cancel(self):
+        self._timer.stop()
+        self._pending.clear()
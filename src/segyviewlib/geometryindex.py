@@ -0,0 +1,192 @@
+import os
+import struct
+
+import numpy as np
+import segyio
+
+from . import _sidecar
+
+
+class GeometryIndex(object):
+    """
+    The inline, crossline and offset numbers and the sorting of a post-stack
+    file, stored next to the SEG-Y file. With a valid index the file is
+    opened without segyio scanning the trace headers for its geometry.
+    """
+
+    SUFFIX = ".geometry.svc"
+    MAGIC = b"SVGI"
+    VERSION = 1
+
+    # inline field, crossline field, endianness, sorting, inline, crossline and offset count
+    _LAYOUT = struct.Struct("<ii8siIII")
+
+    def __init__(self, ilines, xlines, offsets, sorting, fields):
+        """
+        :param fields: The (iline, xline, endian) arguments the geometry was inferred with
+        :type fields: (int, int, str)
+        """
+        super(GeometryIndex, self).__init__()
+        self._ilines = np.asarray(ilines, dtype=np.intc)
+        self._xlines = np.asarray(xlines, dtype=np.intc)
+        self._offsets = np.asarray(offsets, dtype=np.intc)
+        self._sorting = sorting
+        self._fields = fields
+
+    @property
+    def ilines(self):
+        """ :rtype: numpy.ndarray """
+        return self._ilines
+
+    @property
+    def xlines(self):
+        """ :rtype: numpy.ndarray """
+        return self._xlines
+
+    @property
+    def offsets(self):
+        """ :rtype: numpy.ndarray """
+        return self._offsets
+
+    @property
+    def sorting(self):
+        """ :rtype: int """
+        return self._sorting
+
+    @property
+    def fields(self):
+        """ :rtype: (int, int, str) """
+        return self._fields
+
+    @property
+    def tracecount(self):
+        """ :rtype: int """
+        return len(self._ilines) * len(self._xlines) * len(self._offsets)
+
+    def apply(self, source):
+        """
+        Give a file opened with ignore_geometry=True the geometry of the
+        index. A trace in a sorted post-stack file is found from its line
+        numbers and the sorting, so no trace position map is needed.
+
+        :type source: segyio.SegyFile
+        :rtype: segyio.SegyFile
+        """
+        if source.tracecount != self.tracecount:
+            raise ValueError("Geometry index does not match trace count")
+
+        return source.interpret(self._ilines, self._xlines, self._offsets, self._sorting)
+
+    @staticmethod
+    def fields_for(kwargs):
+        """
+        The arguments of segyio.open the geometry depends on.
+
+        :type kwargs: dict
+        :rtype: (int, int, str)
+        """
+        return _sidecar.fields_for(kwargs)
+
+    @classmethod
+    def from_source(cls, source, fields):
+        """
+        :type source: segyio.SegyFile
+        :type fields: (int, int, str)
+        :rtype: GeometryIndex
+        """
+        return cls(source.ilines, source.xlines, source.offsets, source.sorting, fields)
+
+    @classmethod
+    def read(cls, path):
+        """ :rtype: ((int, float), GeometryIndex) """
+        with open(path, "rb") as f:
+            magic, version, signature = _sidecar.read_header(f)
+            if magic != cls.MAGIC or version != cls.VERSION:
+                raise IOError("Not a geometry index: %s" % path)
+
+            layout = f.read(cls._LAYOUT.size)
+            iline, xline, endian, sorting, il_count, xl_count, offset_count = cls._LAYOUT.unpack(layout)
+
+            counts = [il_count, xl_count, offset_count]
+            numbers = np.fromfile(f, dtype="<i4", count=sum(counts))
+            if len(numbers) != sum(counts):
+                raise IOError("Truncated geometry index: %s" % path)
+
+        ilines = numbers[:il_count]
+        xlines = numbers[il_count:il_count + xl_count]
+        offsets = numbers[il_count + xl_count:]
+        fields = (iline, xline, endian.rstrip(b"\0").decode("ascii"))
+        return signature, cls(ilines, xlines, offsets, sorting, fields)
+
+    def write(self, filename, directory=None):
+        """ Write the index for filename, replacing any existing one. """
+        path = _sidecar.sidecar_path(filename, self.SUFFIX, directory)
+        with _sidecar.writing(path) as temporary:
+            iline, xline, endian = self._fields
+            with open(temporary, "wb") as f:
+                _sidecar.write_header(f, self.MAGIC, self.VERSION, _sidecar.signature(filename))
+                f.write(self._LAYOUT.pack(iline, xline, endian.encode("ascii"), self._sorting,
+                                          len(self._ilines), len(self._xlines), len(self._offsets)))
+                f.write(np.concatenate([self._ilines, self._xlines, self._offsets]).astype("<i4").tobytes())
+
+    @classmethod
+    def open(cls, filename, fields, directory=None):
+        """
+        The index for filename if it exists and is still valid for the
+        file and the fields.
+
+        :type filename: str
+        :type fields: (int, int, str)
+        :rtype: GeometryIndex | None
+        """
+        path = _sidecar.sidecar_path(filename, cls.SUFFIX, directory)
+
+        try:
+            signature, index = cls.read(path)
+        except (IOError, OSError, ValueError, UnicodeError, struct.error):
+            return None
+
+        if signature != _sidecar.signature(filename) or index.fields != tuple(fields):
+            return None
+
+        return index
+
+    @classmethod
+    def open_segy(cls, filename, directory=None, **kwargs):
+        """
+        Open filename with segyio.open(filename, "r", **kwargs). The
+        geometry is taken from a valid index when there is one, and an index
+        is written after the trace headers have been scanned otherwise. An
+        index that cannot be written is not an error.
+
+        :type filename: str
+        :rtype: segyio.SegyFile
+        """
+        if kwargs.get('ignore_geometry'):
+            return segyio.open(filename, "r", **kwargs)
+
+        fields = cls.fields_for(kwargs)
+        index = cls.open(filename, fields, directory)
+
+        if index is not None:
+            source = segyio.open(filename, "r", ignore_geometry=True, **kwargs)
+            try:
+                return index.apply(source)
+            except ValueError:
+                source.close()
+
+        source = segyio.open(filename, "r", **kwargs)
+
+        if not source.unstructured:
+            try:
+                cls.from_source(source, fields).write(filename, directory)
+            except (IOError, OSError):
+                pass
+
+        return source
+
+    @classmethod
+    def remove(cls, filename, directory=None):
+        path = _sidecar.sidecar_path(filename, cls.SUFFIX, directory)
+        if os.path.exists(path):
+            os.remove(path)
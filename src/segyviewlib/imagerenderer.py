@@ -0,0 +1,92 @@
+import numpy as np
+from matplotlib.cm import ScalarMappable
+from PyQt4.QtGui import QImage
+
+from .slicecache import SliceCache
+
+
+class ImageRenderer(object):
+    """
+    Colour maps slices straight into QImages with a lookup table, for
+    painting on the canvas without going through matplotlib's AxesImage.
+    Rendered pixels are kept in a least recently used cache, so going back
+    to a recent slice or colour scale does not colour map again.
+    """
+
+    LUT_SIZE = 256
+    DEFAULT_CACHE_BYTES = 64 * 1024 ** 2
+
+    def __init__(self, lut_size=LUT_SIZE, cache_size=DEFAULT_CACHE_BYTES):
+        super(ImageRenderer, self).__init__()
+        self._lut_size = lut_size
+        self._luts = {}
+        self._cache = SliceCache(cache_size)
+
+    @property
+    def cache(self):
+        """ :rtype: SliceCache """
+        return self._cache
+
+    def clear(self):
+        self._cache.clear()
+
+    def lut(self, colormap):
+        """
+        The colormap as packed 32-bit ARGB values, the pixel layout of
+        QImage.Format_ARGB32. The lut_size colours of the colormap are
+        followed by its colour for bad values, which NaN is drawn with, as
+        matplotlib does.
+
+        :type colormap: str
+        :rtype: numpy.ndarray
+        """
+        if colormap not in self._luts:
+            cmap = ScalarMappable(cmap=colormap).get_cmap()
+            values = np.append(np.linspace(0.0, 1.0, self._lut_size), np.nan)
+            rgba = cmap(values, bytes=True).astype(np.uint32)
+            r, g, b, a = rgba[:, 0], rgba[:, 1], rgba[:, 2], rgba[:, 3]
+            self._luts[colormap] = (a << 24) | (r << 16) | (g << 8) | b
+        return self._luts[colormap]
+
+    def map(self, data, colormap, vmin, vmax):
+        """
+        Colour map data between vmin and vmax, clipping values outside.
+
+        :type data: numpy.ndarray
+        :rtype: numpy.ndarray
+        """
+        lut = self.lut(colormap)
+        bad = len(lut) - 1
+        top = bad - 1
+
+        scale = top / float(vmax - vmin) if vmax > vmin else 0.0
+        indexes = (np.asarray(data, dtype=np.single) - vmin) * scale
+        np.clip(indexes, 0, top, out=indexes)
+        indexes[np.isnan(indexes)] = bad
+
+        return lut.take(indexes.astype(np.intp))
+
+    def render(self, data, colormap, vmin, vmax, key=None):
+        """
+        Render data as a QImage. With a key identifying data, the pixels are
+        cached under (key, colormap, vmin, vmax).
+
+        :type data: numpy.ndarray
+        :rtype: QImage
+        """
+        argb = None
+        if key is not None:
+            key = (key, colormap, vmin, vmax)
+            argb = self._cache.get(key)
+
+        if argb is None:
+            argb = np.ascontiguousarray(self.map(data, colormap, vmin, vmax))
+            if key is not None:
+                self._cache.put(key, argb)
+
+        height, width = argb.shape
+        image = QImage(argb.data, width, height, width * 4, QImage.Format_ARGB32)
+
+        # the image does not own its pixels, keep them alive with it
+        image.pixels = argb
+        return image
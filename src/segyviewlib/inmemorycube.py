@@ -0,0 +1,94 @@
+import numpy as np
+import segyio
+
+from .slicemodel import SliceDirection
+
+
+class InMemoryCube(object):
+    """
+    A post-stack cube held entirely in memory as one contiguous array of
+    shape (inlines, crosslines, samples). Slices in every direction are
+    views of the array, in the same orientation as
+    SliceDataSource.read_slice, so no slice is ever copied.
+    """
+
+    # lines read between progress reports
+    PROGRESS_INTERVAL = 16
+
+    def __init__(self, cube):
+        """ :type cube: numpy.ndarray """
+        super(InMemoryCube, self).__init__()
+        self._cube = cube
+
+    @property
+    def shape(self):
+        """ :rtype: (int, int, int) """
+        return self._cube.shape
+
+    @property
+    def nbytes(self):
+        """ :rtype: int """
+        return self._cube.nbytes
+
+    def read_slice(self, direction, index):
+        """ :rtype: numpy.ndarray """
+        if direction == SliceDirection.inline:
+            return self._cube[index].T
+        elif direction == SliceDirection.crossline:
+            return self._cube[:, index, :].T
+        elif direction == SliceDirection.depth:
+            return self._cube[:, :, index].T
+        else:
+            raise ValueError("Unknown direction: %s" % direction)
+
+    @staticmethod
+    def required_bytes(source):
+        """
+        :type source: segyio.SegyFile
+        :rtype: int
+        """
+        return len(source.ilines) * len(source.xlines) * len(source.samples) * 4
+
+    @classmethod
+    def load(cls, source, lock, progress=None, cancelled=None):
+        """
+        Read the entire cube, line by line along the sorting of the file.
+        The lock is held for each line only, so other readers of the source
+        are not blocked while loading.
+
+        :type source: segyio.SegyFile
+        :type lock: threading.RLock
+        :param progress: Called with the completed fraction while loading
+        :type progress: callable | None
+        :param cancelled: Polled between lines, loading stops if it returns True
+        :type cancelled: callable | None
+        :rtype: InMemoryCube | None
+        """
+        cube = np.empty((len(source.ilines), len(source.xlines), len(source.samples)), dtype=np.single)
+
+        crossline_sorted = source.sorting == segyio.TraceSortingFormat.CROSSLINE_SORTING
+        if crossline_sorted:
+            lines, numbers = source.xline, source.xlines
+        else:
+            lines, numbers = source.iline, source.ilines
+
+        for position, number in enumerate(numbers):
+            if cancelled is not None and cancelled():
+                return None
+
+            with lock:
+                # the source may have been closed while waiting for the lock
+                if cancelled is not None and cancelled():
+                    return None
+                line = lines[number]
+
+            if crossline_sorted:
+                cube[:, position, :] = line
+            else:
+                cube[position] = line
+
+            done = position + 1
+            if progress is not None and (done % cls.PROGRESS_INTERVAL == 0 or done == len(numbers)):
+                progress(float(done) / len(numbers))
+
+        return cls(cube)
@@ -23,16 +23,30 @@ class LayoutFigure(Figure):
 
         grid_spec = gridspec.GridSpec(rows, columns + 1, width_ratios=ratios)
 
-        for axes in self._axes:
+        # existing axes are moved into place, keeping their contents, and
+        # only the difference in count is added or removed
+        cells = [grid_spec[sub_spec] for sub_spec in layout_spec['grid']]
+
+        for axes in self._axes[len(cells):]:
             self.delaxes(axes)
-        self._axes = [self.add_subplot(grid_spec[sub_spec]) for sub_spec in layout_spec['grid']]
+        self._axes = self._axes[:len(cells)]
+
+        for axes, cell in zip(self._axes, cells):
+            self._move_axes(axes, cell)
 
-        if self._colormap_axes is not None:
-            self.delaxes(self._colormap_axes)
-        self._colormap_axes = self.add_subplot(grid_spec[:, columns])
+        self._axes.extend(self.add_subplot(cell) for cell in cells[len(self._axes):])
+
+        if self._colormap_axes is None:
+            self._colormap_axes = self.add_subplot(grid_spec[:, columns])
+        else:
+            self._move_axes(self._colormap_axes, grid_spec[:, columns])
 
         self._current_layout = layout_spec
 
+    def _move_axes(self, axes, subplot_spec):
+        axes.set_subplotspec(subplot_spec)
+        axes.set_position(subplot_spec.get_position(self))
+
     def index(self, axes):
         """
         :param axes: The Axes instance to find the index of.
@@ -0,0 +1,188 @@
+from threading import Lock
+from weakref import WeakSet
+
+
+class MemoryBudget(object):
+    """
+    One memory budget for the slice memory of the process. Every SliceCache
+    registers itself, as do MemoryAccounts for memory held elsewhere, e.g.
+    cubes loaded into memory and the data buffers of slice models. When
+    they together hold more than the budget, memory is evicted from the
+    lowest priority first, so the memory of views that are not shown is
+    given back before that of the shown ones. Among caches of the same
+    priority, the slices farthest from the viewed slices go first, and
+    evictable accounts go after all slices of their priority.
+
+    Images drawn by matplotlib and the one image each view keeps for
+    painting are not accounted for.
+    """
+
+    DEFAULT_MAX_BYTES = 1024 ** 3
+
+    # priorities, memory of lower priority is evicted first; WARM is memory
+    # of views that are not shown, but are likely to be shown soon
+    OFF_SCREEN = 0
+    WARM = 1
+    ON_SCREEN = 2
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        super(MemoryBudget, self).__init__()
+        self._max_bytes = max_bytes
+        self._accounts = WeakSet()
+        self._lock = Lock()
+        self._evictions = 0
+
+    @property
+    def max_bytes(self):
+        """ :rtype: int """
+        return self._max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, value):
+        """ :type value: int """
+        self._max_bytes = value
+        self.enforce()
+
+    @property
+    def bytes(self):
+        """ The bytes held by everything registered. """
+        return sum(account.bytes for account in self.accounts)
+
+    @property
+    def evictions(self):
+        """ The slices and accounts evicted to keep within the budget. """
+        return self._evictions
+
+    @property
+    def accounts(self):
+        """ :rtype: list[segyviewlib.SliceCache | MemoryAccount] """
+        with self._lock:
+            return list(self._accounts)
+
+    def register(self, account):
+        """
+        Account for a SliceCache or MemoryAccount from now on. They are
+        referenced weakly and leave the budget when garbage collected.
+
+        :type account: segyviewlib.SliceCache | MemoryAccount
+        """
+        with self._lock:
+            self._accounts.add(account)
+
+    def unregister(self, account):
+        """ :type account: segyviewlib.SliceCache | MemoryAccount """
+        with self._lock:
+            self._accounts.discard(account)
+
+    def enforce(self):
+        """ Evict until everything registered fits within the budget. """
+        with self._lock:
+            accounts = list(self._accounts)
+            total = sum(account.bytes for account in accounts)
+
+            for priority in sorted(set(account.priority for account in accounts)):
+                group = [account for account in accounts if account.priority == priority]
+
+                while total > self._max_bytes:
+                    candidates = []
+                    for account in group:
+                        candidate = account.eviction_candidate()
+                        if candidate is not None:
+                            candidates.append((candidate, account))
+
+                    if not candidates:
+                        break
+
+                    (_, key), account = max(candidates, key=lambda candidate: candidate[0][0])
+                    freed = account.evict(key)
+                    if freed:
+                        total -= freed
+                        self._evictions += 1
+
+    def statistics(self):
+        """ :rtype: dict """
+        accounts = self.accounts
+        return {
+            "bytes": sum(account.bytes for account in accounts),
+            "max_bytes": self._max_bytes,
+            "accounts": len(accounts),
+            "evictions": self._evictions,
+        }
+
+
+class MemoryAccount(object):
+    """
+    Memory held outside a SliceCache, accounted for by a MemoryBudget. With
+    an evict function the memory can be given back, which is done after
+    all slices of the same priority are evicted; without one it is only
+    counted.
+    """
+
+    def __init__(self, nbytes=0, evict=None, priority=MemoryBudget.ON_SCREEN, budget=None):
+        """
+        :param evict: Called to give the memory back, must not block on
+                      locks held while filling slice caches
+        :type evict: callable | None
+        :param budget: The MemoryBudget to account to, None for the process-wide one
+        """
+        super(MemoryAccount, self).__init__()
+        self._bytes = nbytes
+        self._evict = evict
+        self._priority = priority
+        self._budget = memory_budget() if budget is None else budget
+        self._budget.register(self)
+
+        if nbytes:
+            self._budget.enforce()
+
+    @property
+    def bytes(self):
+        """ :rtype: int """
+        return self._bytes
+
+    @bytes.setter
+    def bytes(self, value):
+        """ :type value: int """
+        grown = value > self._bytes
+        self._bytes = value
+
+        if grown:
+            self._budget.enforce()
+
+    @property
+    def priority(self):
+        """ :rtype: int """
+        return self._priority
+
+    @priority.setter
+    def priority(self, value):
+        """ :type value: int """
+        self._priority = value
+
+    def eviction_candidate(self):
+        """ The (distance, key) to evict, after every slice, or None. """
+        if self._evict is None or not self._bytes:
+            return None
+        return -1, None
+
+    def evict(self, key=None):
+        """
+        :rtype: int
+        :return: The bytes freed
+        """
+        freed, self._bytes = self._bytes, 0
+        self._evict()
+        return freed
+
+
+# created up front, caches are created and filled from worker threads as well
+_budget = MemoryBudget()
+
+
+def memory_budget():
+    """
+    The budget shared by all slice memory in the process.
+
+    :rtype: MemoryBudget
+    """
+    return _budget
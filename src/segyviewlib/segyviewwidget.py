@@ -1,13 +1,26 @@
-from PyQt4.QtGui import QFileDialog, QToolButton, QToolBar, QVBoxLayout, QWidget, QWidgetAction
+from PyQt4.QtGui import QFileDialog, QToolButton, QToolBar, QVBoxLayout, QWidget, QWidgetAction, QProgressBar
+from PyQt4.QtGui import QMessageBox
 
 from segyviewlib import ColormapCombo, LayoutCombo, SettingsWindow, SliceViewContext, HelpWindow
 from segyviewlib import SliceDataSource, SliceModel, SliceDirection as SD, SliceViewWidget, resource_icon
+from segyviewlib import SliceCache
 
 
 class SegyViewWidget(QWidget):
     def __init__(self, filename, show_toolbar=True, color_maps=None,
                  width=11.7, height=8.3, dpi=100,
-                 segyioargs={}, parent=None):
+                 segyioargs={}, slice_cache_size=SliceCache.DEFAULT_MAX_BYTES, asynchronous=False,
+                 depth_sidecar=False, brick_store=False, pyramid=False, statistics=False, direct_rendering=False,
+                 in_memory_limit=0, geometry_index=False, shared_source=False, slice_data_source=None,
+                 parent=None):
+        """
+        :param shared_source: Share the opened file and slice cache with other
+                              widgets showing the same file
+        :type shared_source: bool
+        :param slice_data_source: A data source to show instead of opening
+                                  filename, e.g. one opened in the background
+        :type slice_data_source: SliceDataSource | None
+        """
         QWidget.__init__(self, parent)
 
         inline = SliceModel("Inline", SD.inline, SD.crossline, SD.depth)
@@ -15,13 +28,21 @@ class SegyViewWidget(QWidget):
         depth = SliceModel("Depth", SD.depth, SD.inline, SD.crossline)
 
         slice_models = [inline, xline, depth]
-        slice_data_source = SliceDataSource(filename, **segyioargs)
+        if slice_data_source is None:
+            slice_data_source = SliceDataSource(filename, cache_size=slice_cache_size,
+                                                depth_sidecar=depth_sidecar, brick_store=brick_store,
+                                                pyramid=pyramid, in_memory_limit=in_memory_limit,
+                                                geometry_index=geometry_index, shared=shared_source,
+                                                **segyioargs)
         self._slice_data_source = slice_data_source
+        self._opening_filename = None
 
-        self._context = SliceViewContext(slice_models, slice_data_source)
+        self._context = SliceViewContext(slice_models, slice_data_source, asynchronous=asynchronous,
+                                         statistics=statistics)
         self._context.show_indicators(True)
 
         self._slice_view_widget = SliceViewWidget(self._context, width, height, dpi, self)
+        self._slice_view_widget.direct_rendering = direct_rendering
 
         layout = QVBoxLayout()
 
@@ -106,6 +127,25 @@ class SegyViewWidget(QWidget):
         self._help_button.toggled.connect(self._show_help)
         toolbar.addWidget(self._help_button)
 
+        self._progress_bar = QProgressBar()
+        self._progress_bar.setRange(0, 100)
+        self._progress_bar.setMaximumWidth(160)
+        self._progress_bar.setFormat("Loading %p%")
+        self._progress_action = toolbar.addWidget(self._progress_bar)
+        self._progress_action.setVisible(self._slice_data_source.in_memory_loading)
+        self._slice_data_source.in_memory_progress.connect(self._in_memory_progress)
+        self._slice_data_source.in_memory_loaded.connect(self._in_memory_loaded)
+
+        self._cancel_button = QToolButton()
+        self._cancel_button.setText("Cancel")
+        self._cancel_button.setToolTip("Cancel opening the file")
+        self._cancel_button.clicked.connect(self.cancel_open)
+        self._cancel_action = toolbar.addWidget(self._cancel_button)
+        self._cancel_action.setVisible(False)
+        self._slice_data_source.open_progress.connect(self._open_progress)
+        self._slice_data_source.open_failed.connect(self._open_failed)
+        self._slice_data_source.slice_data_source_changed.connect(self._source_changed)
+
         def toggle_on_close(event):
             self._settings_button.setChecked(False)
             event.accept()
@@ -149,12 +189,65 @@ class SegyViewWidget(QWidget):
 
         fig.layout_figure().savefig(output_file)
 
-    def set_source_filename(self, filename):
-        self._slice_data_source.set_source_filename(filename)
+    def _in_memory_progress(self, progress):
+        if self._slice_data_source.opening:
+            return
+
+        self._progress_bar.setFormat("Loading %p%")
+        self._progress_bar.setValue(int(progress * 100))
+        self._progress_action.setVisible(self._slice_data_source.in_memory_loading)
+
+    def _in_memory_loaded(self):
+        self._progress_action.setVisible(self._slice_data_source.opening)
+
+    def _open_progress(self, progress):
+        if not self._slice_data_source.opening:
+            return
+
+        self._progress_bar.setFormat("Opening %p%")
+        self._progress_bar.setValue(int(progress * 100))
+
+    def _open_ended(self):
+        self._opening_filename = None
+        self._cancel_action.setVisible(False)
+        self._progress_action.setVisible(self._slice_data_source.in_memory_loading)
+
+    def _source_changed(self):
+        opened = self._opening_filename is not None
+        self._open_ended()
+
+        if opened:
+            self.set_default_layout()
+
+    def _open_failed(self, error):
+        filename = self._opening_filename
+        self._open_ended()
+        QMessageBox.warning(self, "Open SEG-Y file", "Could not open %s:\n%s" % (filename, error))
+
+    def set_source_filename(self, filename, **segyioargs):
+        self._slice_data_source.set_source_filename(filename, **segyioargs)
+
+    def open_source_filename(self, filename, **segyioargs):
+        """
+        Open filename in the background, with progress and a cancel button
+        in the toolbar. The current file stays visible until the new one is
+        open, then each slice is shown as soon as it is read.
+        """
+        self._opening_filename = filename
+        self._slice_data_source.open_source_filename(filename, **segyioargs)
+
+        self._progress_bar.setFormat("Opening %p%")
+        self._progress_bar.setValue(0)
+        self._progress_action.setVisible(True)
+        self._cancel_action.setVisible(True)
+
+    def cancel_open(self):
+        self._slice_data_source.cancel_open()
+        self._open_ended()
 
     def set_default_layout(self):
         # default slice view layout depends on the file size
-        if self._slice_data_source.file_size < 8 * 10 ** 8:
+        if self._slice_data_source.file_size < SliceDataSource.SMALL_FILE_SIZE:
             self._layout_combo.setCurrentIndex(self._layout_combo.DEFAULT_SMALL_FILE_LAYOUT)
         else:
             self._layout_combo.setCurrentIndex(self._layout_combo.DEFAULT_LARGE_FILE_LAYOUT)
@@ -2,11 +2,12 @@ from __future__ import print_function
 
 from contextlib import contextmanager
 
-from PyQt4.QtGui import QToolButton, QToolBar, QVBoxLayout, QWidget, QTabWidget
-from PyQt4.QtCore import QModelIndex
+from PyQt4.QtGui import QToolButton, QToolBar, QVBoxLayout, QWidget, QTabWidget, QLabel, QMessageBox
+from PyQt4.QtCore import QModelIndex, pyqtSignal, Qt
 
-from segyviewlib import LayoutCombo, SettingsWindow, SliceViewContext
+from segyviewlib import LayoutCombo, SettingsWindow, SliceViewContext, SegyViewWidget
 from segyviewlib import SliceDataSource, SliceModel, SliceDirection as SD, resource_icon
+from ._workerpool import submit_background
 from itertools import chain
 import os
 
@@ -19,7 +20,96 @@ def blocked_update(ctxt, current_ctxt):
     ctxt.blockSignals(blocked)
 
 
+class _LazySegyTab(QWidget):
+    """
+    Stands in for the SegyViewWidget of a tab that has not been shown yet.
+    The file can be opened, and the slices first shown read into the cache,
+    in the background; the SegyViewWidget is created by materialize.
+    """
+    ready = pyqtSignal()
+
+    # SegyViewWidget arguments that are used to create the SliceDataSource
+    _DATA_SOURCE_ARGS = {'slice_cache_size': 'cache_size',
+                         'depth_sidecar': 'depth_sidecar',
+                         'brick_store': 'brick_store',
+                         'pyramid': 'pyramid',
+                         'in_memory_limit': 'in_memory_limit',
+                         'geometry_index': 'geometry_index',
+                         'shared_source': 'shared'}
+
+    def __init__(self, filename, widget_args, parent=None):
+        QWidget.__init__(self, parent)
+        self._filename = filename
+        self._widget_args = dict(widget_args)
+        self._slice_data_source = None
+        """ :type: SliceDataSource """
+        self._error = None
+
+        self._label = QLabel("Opening %s..." % os.path.basename(filename))
+        layout = QVBoxLayout()
+        layout.addWidget(self._label, 0, Qt.AlignCenter)
+        self.setLayout(layout)
+
+    @property
+    def filename(self):
+        return self._filename
+
+    @property
+    def error(self):
+        """ The error the file failed to open with, if it did. """
+        return self._error
+
+    @property
+    def started(self):
+        """ :rtype: bool """
+        return self._slice_data_source is not None
+
+    def open_in_background(self):
+        """ Open the file and read its first slices, ready is emitted when done. """
+        source_args = {}
+        for key, name in self._DATA_SOURCE_ARGS.items():
+            if key in self._widget_args:
+                source_args[name] = self._widget_args.pop(key)
+
+        # inactive sources do not prefetch until the tab is shown
+        self._slice_data_source = SliceDataSource(None, **source_args)
+        self._slice_data_source.active = False
+        self._slice_data_source.slice_data_source_changed.connect(self._opened)
+        self._slice_data_source.open_failed.connect(self._open_failed)
+        self._slice_data_source.open_source_filename(self._filename, **self._widget_args.pop('segyioargs', {}))
+
+    def _opened(self):
+        submit_background(self._preload, self._slice_data_source)
+
+    def _open_failed(self, error):
+        self._error = error
+        self._label.setText("Could not open %s:\n%s" % (os.path.basename(self._filename), error))
+        self.ready.emit()
+
+    def _preload(self, slice_data_source):
+        for direction in [SD.inline, SD.crossline, SD.depth]:
+            slice_data_source.preload_slice(direction, len(slice_data_source.indexes_for_direction(direction)) // 2)
+        self.ready.emit()
+
+    def materialize(self):
+        """ :rtype: segyviewlib.SegyViewWidget """
+        if self._slice_data_source is None:
+            return SegyViewWidget(self._filename, **self._widget_args)
+
+        self._slice_data_source.slice_data_source_changed.disconnect(self._opened)
+        self._slice_data_source.open_failed.disconnect(self._open_failed)
+        self._slice_data_source.active = True
+        return SegyViewWidget(None, slice_data_source=self._slice_data_source, **self._widget_args)
+
+
 class SegyTabWidget(QWidget):
+    # background tabs opened at the same time, the others wait their turn
+    MAX_BACKGROUND_OPENS = 2
+
+    # the number of recently shown tabs, besides the current one, whose
+    # slices are read in the background when the shared indexes change
+    RECENT_TABS = 3
+
     def __init__(self, segywidgets=None, parent=None):
         QWidget.__init__(self, parent)
         """
@@ -29,6 +119,18 @@ class SegyTabWidget(QWidget):
         self._context = None
         self._segywidgets = segywidgets if segywidgets else []
         self._tab_widget = QTabWidget()
+        self._queued_tabs = []
+        """ :type: list[_LazySegyTab] """
+        self._opening_tabs = []
+        """ :type: list[_LazySegyTab] """
+
+        # the shared indexes are versioned, and every tab remembers the
+        # version it was last synchronised to
+        self._index_version = 0
+        self._shared_indexes = None
+        self._tab_versions = {}
+        self._recent_tabs = []
+        """ :type: list[segyviewlib.SegyViewWidget] """
         self.initialize()
 
     def initialize(self):
@@ -73,9 +175,16 @@ class SegyTabWidget(QWidget):
     @property
     def _ctxs(self):
         """
+        The contexts of the tabs that have been shown, tabs that have not
+        are brought up to date when they are first shown.
+
         :rtype: list of SliceViewContext
         """
-        return [self._tab_widget.widget(index).context for index in range(0, self._tab_widget.count())]
+        return [widget.context for widget in self._segy_view_widgets()]
+
+    def _segy_view_widgets(self):
+        widgets = [self._tab_widget.widget(index) for index in range(0, self._tab_widget.count())]
+        return [widget for widget in widgets if not isinstance(widget, _LazySegyTab)]
 
     def count(self):
         """
@@ -108,11 +217,84 @@ class SegyTabWidget(QWidget):
 
         return id
 
+    def add_segy_file(self, ind, filename, name=None, **kwargs):
+        """
+        Add a tab for filename without holding up the tab being shown. The
+        file is opened and its first slices read in the background, a few
+        files at a time, and its SegyViewWidget is created when the tab is
+        first shown. The keyword arguments are passed on to SegyViewWidget.
+
+        :type filename: str
+        :rtype: int
+        """
+        if self._context is None:
+            return self.add_segy_view_widget(ind, SegyViewWidget(filename, **kwargs), name)
+
+        tab = _LazySegyTab(filename, kwargs)
+        tab.ready.connect(self._background_open_finished)
+
+        if name is None:
+            name = os.path.basename(filename)
+
+        id = self._tab_widget.insertTab(ind, tab, name)
+
+        self._queued_tabs.append(tab)
+        self._open_queued_tabs()
+        return id
+
+    def _open_queued_tabs(self):
+        while self._queued_tabs and len(self._opening_tabs) < self.MAX_BACKGROUND_OPENS:
+            tab = self._queued_tabs.pop(0)
+            self._opening_tabs.append(tab)
+            tab.open_in_background()
+
+    def _background_open_finished(self):
+        tab = self.sender()
+        if tab in self._opening_tabs:
+            self._opening_tabs.remove(tab)
+        self._open_queued_tabs()
+
+    def _materialize(self, index):
+        tab = self._tab_widget.widget(index)
+        if not isinstance(tab, _LazySegyTab):
+            return
+
+        if tab in self._queued_tabs:
+            self._queued_tabs.remove(tab)
+
+        # a tab shown while opening no longer holds up the background tabs
+        if tab in self._opening_tabs:
+            self._opening_tabs.remove(tab)
+            self._open_queued_tabs()
+
+        widget = tab.materialize()
+        name = self._tab_widget.tabText(index)
+
+        blocked = self._tab_widget.blockSignals(True)
+        try:
+            self._tab_widget.removeTab(index)
+            self.add_segy_view_widget(index, widget, name)
+            self._tab_widget.setCurrentIndex(index)
+        finally:
+            self._tab_widget.blockSignals(blocked)
+
+        tab.setParent(None)
+
+        if tab.error is not None:
+            QMessageBox.warning(self, "Open SEG-Y file", "Could not open %s:\n%s" % (tab.filename, tab.error))
+
     def remove_segy_view_widget(self, index):
         """
         :param index: The index of the tab to be removed
         :type index: int
         """
+        tab = self._tab_widget.widget(index)
+        if tab in self._queued_tabs:
+            self._queued_tabs.remove(tab)
+
+        self._tab_versions.pop(tab, None)
+        if tab in self._recent_tabs:
+            self._recent_tabs.remove(tab)
 
         self._tab_widget.removeTab(index)
 
@@ -169,26 +351,85 @@ class SegyTabWidget(QWidget):
                 ctxt.samples_unit = val
 
     def _update_models(self):
-        dirty_models = [m for m in self._context.models if m.dirty]
-        local_models = list(chain.from_iterable([ctx.models for ctx in self._ctxs]))
+        """
+        Take in changes to the shared indexes. Only the current tab is
+        synchronised right away, recently shown tabs have their slices read
+        in the background and the other tabs catch up when they are shown.
+        """
+        for m in self._context.models:
+            m.dirty = False
+
+        indexes = [m.index for m in self._context.models]
+        if indexes == self._shared_indexes:
+            return
+
+        self._shared_indexes = indexes
+        self._index_version += 1
+        self._warm_recent_tabs()
 
-        for m in dirty_models:
-            for local_m in local_models:
+    def _sync_tab(self, widget):
+        """
+        Bring the indexes of a tab up to the shared indexes. Models are only
+        marked dirty when their index changes.
+
+        :type widget: segyviewlib.SegyViewWidget
+        """
+        if self._tab_versions.get(widget) == self._index_version:
+            return
+
+        for m in self._context.models:
+            for local_m in widget.context.models:
                 if local_m.index_direction == m.index_direction:
                     local_m.index = m.index
                 if local_m.x_index_direction == m.index_direction:
                     local_m.x_index = m.index
                 if local_m.y_index_direction == m.index_direction:
                     local_m.y_index = m.index
-                local_m.dirty = True
-            m.dirty = False
+
+        self._tab_versions[widget] = self._index_version
+
+    def _warm_recent_tabs(self):
+        current = self._tab_widget.currentWidget()
+        version = self._index_version
+
+        for widget in self._recent_tabs:
+            if widget is current:
+                continue
+
+            # read at the resolution the tab shows the slices in
+            for m in self._context.models:
+                local_m = widget.context.model_for_direction(m.index_direction)
+                step = (1, 1) if local_m is None else local_m.resolution_step
+                submit_background(self._warm, widget.slice_data_source, version, m.index_direction, m.index, step)
+
+    def _warm(self, slice_data_source, version, direction, index, step):
+        # superseded by a later index change before it got its turn
+        if version != self._index_version:
+            return
+        slice_data_source.preload_slice(direction, index, step)
 
     def _update_views(self):
-        self._tab_widget.currentWidget().context.context_changed.emit()
-        self._tab_widget.currentWidget().context.load_data()
+        current = self._tab_widget.currentWidget()
+        self._sync_tab(current)
+        current.context.context_changed.emit()
+        current.context.load_data()
 
     def _tab_changed(self):
         if self._tab_widget.count() == 0: return
+        self._materialize(self._tab_widget.currentIndex())
+
+        current = self._tab_widget.currentWidget()
+        if current in self._recent_tabs:
+            self._recent_tabs.remove(current)
+        self._recent_tabs.insert(0, current)
+        del self._recent_tabs[self.RECENT_TABS + 1:]
+
+        # only the data source of the tab shown keeps a full cache, and
+        # those of the recent tabs keep the slices read for them
+        for widget in self._segy_view_widgets():
+            widget.slice_data_source.active = widget is current
+            widget.slice_data_source.warm = widget in self._recent_tabs
+
         widget_spec = self._tab_widget.currentWidget().slice_view_widget.current_layout()
         setting_spec = self.layout_combo.get_current_layout()
         if widget_spec != setting_spec:
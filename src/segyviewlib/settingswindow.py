@@ -1,12 +1,16 @@
 from __future__ import division
 from PyQt4.QtGui import QCheckBox, QWidget, QFormLayout, QComboBox, QLabel
 from PyQt4.QtGui import QPushButton, QHBoxLayout, QVBoxLayout, QTreeWidget, QTreeWidgetItem
-from PyQt4.QtCore import Qt, QObject, pyqtSignal
+from PyQt4.QtCore import Qt, QObject, QTimer, pyqtSignal
 
 from segyviewlib import SliceDirection, SampleScaleController, IndexController, PlotExportSettingsWidget
+from segyviewlib import memory_budget
 
 
 class SettingsWindow(QWidget):
+    # the memory usage is refreshed this often while the window is shown
+    MEMORY_INTERVAL = 1000
+
     min_max_changed = pyqtSignal(tuple, str)
     indicators_changed = pyqtSignal(bool)
     interpolation_changed = pyqtSignal(str)
@@ -24,6 +28,7 @@ class SettingsWindow(QWidget):
         self._context.context_changed.connect(self._settings_changed)
         self._context.data_changed.connect(self._settings_changed)
         self._context.data_source_changed.connect(self._settings_changed)
+        self._context.statistics_changed.connect(self._statistics_changed)
 
         f_layout = QFormLayout()
 
@@ -33,6 +38,12 @@ class SettingsWindow(QWidget):
         self._sample_count = QLabel("")
         self._minimum_value = QLabel("")
         self._maximum_value = QLabel("")
+        self._statistics = QLabel("")
+        self._memory = QLabel("")
+
+        self._memory_timer = QTimer(self)
+        self._memory_timer.setInterval(self.MEMORY_INTERVAL)
+        self._memory_timer.timeout.connect(self._memory_changed)
 
         f_layout.addRow("Inline Count:", self._iline_count)
         f_layout.addRow("Crossline Count:", self._xline_count)
@@ -42,6 +53,9 @@ class SettingsWindow(QWidget):
         if self._context._has_data:
             f_layout.addRow("Minimum Value:", self._minimum_value)
             f_layout.addRow("Maximum Value:", self._maximum_value)
+            f_layout.addRow("Statistics:", self._statistics)
+
+        f_layout.addRow("Memory:", self._memory)
 
         # iline
         self._il_ctrl = IndexController(parent=self,
@@ -71,6 +85,11 @@ class SettingsWindow(QWidget):
         self._symmetric_scale = QCheckBox()
         self._symmetric_scale.toggled.connect(self._context.set_symmetric_scale)
 
+        self._clip_combo = QComboBox()
+        self._clip_percentiles = [None, 99.5, 98.0]
+        self._clip_combo.addItems(['Min/max', '99.5%', '98%'])
+        self._clip_combo.currentIndexChanged.connect(self._clip_changed)
+
         self._samples_unit = QComboBox()
         self._samples_unit.addItems(['Time (ms)', 'Depth (m)'])
         self._samples_unit.currentIndexChanged[str].connect(self.samples_unit)
@@ -117,7 +136,8 @@ class SettingsWindow(QWidget):
             {"Color Scale": [
                 {"Custom min.:": self._align(self._sample_ctrl.min_spinbox, self._sample_ctrl.min_checkbox)},
                 {"Custom max.:": self._align(self._sample_ctrl.max_spinbox, self._sample_ctrl.max_checkbox)},
-                {"Symmetric scale:": self._align(self._symmetric_scale)}
+                {"Symmetric scale:": self._align(self._symmetric_scale)},
+                {"Clip:": self._align(self._clip_combo)}
             ]
             },
             {"View": [{"": self._align(self._view_label)},
@@ -239,6 +259,9 @@ class SettingsWindow(QWidget):
 
         self._symmetric_scale.setChecked(ctx.symmetric_scale)
 
+        if ctx.clip_percentile in self._clip_percentiles:
+            self._clip_combo.setCurrentIndex(self._clip_percentiles.index(ctx.clip_percentile))
+
         ilines, xlines, offsets, samples = ctx.slice_data_source().dims()
         self._iline_count.setText("%d" % ilines)
         self._xline_count.setText("%d" % xlines)
@@ -248,6 +271,7 @@ class SettingsWindow(QWidget):
         if ctx._has_data:
             self._minimum_value.setText("%f" % ctx.global_minimum)
             self._maximum_value.setText("%f" % ctx.global_maximum)
+            self._statistics_changed()
 
         indexes = ctx.slice_data_source().indexes_for_direction(SliceDirection.inline).tolist()
         index = ctx.index_for_direction(SliceDirection.inline)
@@ -265,6 +289,32 @@ class SettingsWindow(QWidget):
         if index != -1:
             self._samples_unit.setCurrentIndex(index)
 
+    def _statistics_changed(self):
+        ctx = self._context
+        statistics = ctx.statistics
+
+        if statistics is not None and statistics.count > 0:
+            self._statistics.setText("mean %f, rms %f" % (statistics.mean, statistics.rms))
+        elif ctx.statistics_progress is not None:
+            self._statistics.setText("computing (%d%%)" % (ctx.statistics_progress * 100))
+        elif ctx.statistics_error is not None:
+            self._statistics.setText("from viewed slices, the file could not be read: %s" % ctx.statistics_error)
+        else:
+            self._statistics.setText("from viewed slices")
+
+    def _memory_changed(self):
+        statistics = memory_budget().statistics()
+        self._memory.setText("%.0f of %.0f MB" % (statistics["bytes"] / 1024 ** 2, statistics["max_bytes"] / 1024 ** 2))
+
+    def showEvent(self, event):
+        self._memory_changed()
+        self._memory_timer.start()
+        QWidget.showEvent(self, event)
+
+    def hideEvent(self, event):
+        self._memory_timer.stop()
+        QWidget.hideEvent(self, event)
+
     def _set_view_label(self, indicator_on):
         self._view_label.setText("indicators {0}".format("on" if indicator_on else "off"))
 
@@ -277,6 +327,11 @@ class SettingsWindow(QWidget):
         self._context.set_interpolation(interpolation_name)
         self.interpolation_changed.emit(interpolation_name)
 
+    def _clip_changed(self, index):
+        percent = self._clip_percentiles[index]
+        if percent != self._context.clip_percentile:
+            self._context.set_clip_percentile(percent)
+
     def _index_changed_fn(self, direction):
         def fn(value):
             self._context.update_index_for_direction(direction, value)
@@ -0,0 +1,202 @@
+from collections import OrderedDict
+from threading import RLock
+
+from .memorybudget import MemoryBudget, memory_budget
+
+
+class SliceCache(object):
+    """
+    A least recently used cache of slices with a memory budget in bytes.
+    Every cache is also accounted for by the process-wide MemoryBudget,
+    which evicts by the priority of the cache and, when the cache has a
+    distance function, by the distance of slices from the viewed ones.
+    """
+
+    DEFAULT_MAX_BYTES = 256 * 1024 ** 2
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, budget=None):
+        """ :param budget: The MemoryBudget to account to, None for the process-wide one """
+        super(SliceCache, self).__init__()
+        self._max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = RLock()
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+        self._priority = MemoryBudget.ON_SCREEN
+        self._distance = None
+        self._budget = memory_budget() if budget is None else budget
+        self._budget.register(self)
+
+    @property
+    def max_bytes(self):
+        """ :rtype: int """
+        return self._max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, value):
+        """ :type value: int """
+        with self._lock:
+            self._max_bytes = value
+            self._evict()
+
+    @property
+    def bytes(self):
+        """ :rtype: int """
+        return self._bytes
+
+    @property
+    def priority(self):
+        """ The MemoryBudget priority, OFF_SCREEN caches are evicted from first. """
+        return self._priority
+
+    @priority.setter
+    def priority(self, value):
+        """ :type value: int """
+        self._priority = value
+
+    @property
+    def distance(self):
+        """
+        Called with a key, returns how far the slice is from the viewed
+        slices. None evicts in least recently used order only.
+
+        :rtype: callable | None
+        """
+        return self._distance
+
+    @distance.setter
+    def distance(self, value):
+        """ :type value: callable | None """
+        self._distance = value
+
+    @property
+    def hits(self):
+        """ :rtype: int """
+        return self._hits
+
+    @property
+    def misses(self):
+        """ :rtype: int """
+        return self._misses
+
+    @property
+    def evictions(self):
+        """ :rtype: int """
+        return self._evictions
+
+    def get(self, key):
+        """
+        :param key: The key of the slice, usually (direction name, index)
+        :rtype: numpy.ndarray | None
+        """
+        with self._lock:
+            data = self._entries.pop(key, None)
+
+            if data is None:
+                self._misses += 1
+                return None
+
+            self._entries[key] = data
+            self._hits += 1
+            return data
+
+    def peek(self, key):
+        """Look up a slice without affecting the statistics or the eviction order."""
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key, data):
+        """
+        Slices larger than the entire budget are not cached.
+
+        :type data: numpy.ndarray
+        """
+        if data.nbytes > self._max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+
+            self._entries[key] = data
+            self._bytes += data.nbytes
+            self._evict()
+
+        self._budget.enforce()
+
+    def eviction_candidate(self):
+        """
+        The (distance, key) of the slice to evict next, the farthest one
+        and the least recently used of those, or None when empty.
+        """
+        with self._lock:
+            if not self._entries:
+                return None
+
+            distance = self._distance
+            if distance is None:
+                return 0, next(iter(self._entries))
+
+            candidate = None
+            for key in self._entries:
+                d = distance(key)
+                if candidate is None or d > candidate[0]:
+                    candidate = (d, key)
+            return candidate
+
+    def evict(self, key):
+        """
+        Drop a slice, counting it as an eviction.
+
+        :rtype: int
+        :return: The bytes freed
+        """
+        with self._lock:
+            data = self._entries.pop(key, None)
+            if data is None:
+                return 0
+
+            self._bytes -= data.nbytes
+            self._evictions += 1
+            return data.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def reset_statistics(self):
+        with self._lock:
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+
+    def statistics(self):
+        """ :rtype: dict """
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self._max_bytes,
+            }
+
+    def _evict(self):
+        while self._bytes > self._max_bytes and self._entries:
+            _, data = self._entries.popitem(last=False)
+            self._bytes -= data.nbytes
+            self._evictions += 1
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
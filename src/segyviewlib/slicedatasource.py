@@ -1,11 +1,96 @@
 from PyQt4.QtCore import QObject, pyqtSignal
 
 from .slicemodel import SliceDirection
+from .memorybudget import MemoryBudget, MemoryAccount
+from .slicecache import SliceCache
+from .sliceprefetcher import SlicePrefetcher
+from .depthsidecar import DepthSidecar
+from .brickstore import BrickStore
+from .slicepyramid import SlicePyramid
+from .geometryindex import GeometryIndex
+from .inmemorycube import InMemoryCube
+from .sourceregistry import SharedSource, source_registry
+from ._workerpool import submit
+from threading import RLock
 import numpy as np
 import segyio
 import os
 
 
+def decimate(data, step, average=False):
+    """
+    Reduce the resolution of a slice by a (y, x) step, either by picking
+    every step'th sample (a view, no copy) or by averaging step-sized
+    blocks.
+
+    :type data: numpy.ndarray
+    :type step: (int, int)
+    :type average: bool
+    :rtype: numpy.ndarray
+    """
+    y_step, x_step = step
+    if y_step == 1 and x_step == 1:
+        return data
+
+    if not average:
+        return data[::y_step, ::x_step]
+
+    rows = np.arange(0, data.shape[0], y_step)
+    columns = np.arange(0, data.shape[1], x_step)
+    sums = np.add.reduceat(np.add.reduceat(data, rows, axis=0), columns, axis=1)
+
+    row_counts = np.diff(np.append(rows, data.shape[0]))
+    column_counts = np.diff(np.append(columns, data.shape[1]))
+    return (sums / np.outer(row_counts, column_counts)).astype(data.dtype)
+
+
+def crop(data, window, step=(1, 1)):
+    """
+    Cut the (y0, y1, x0, x1) window, in full resolution coordinates, out of
+    a slice decimated by step. The window must start at a multiple of step.
+
+    :type data: numpy.ndarray
+    :type window: (int, int, int, int) | None
+    :rtype: numpy.ndarray
+    """
+    if window is None:
+        return data
+
+    y0, y1, x0, x1 = window
+    y_step, x_step = step
+    return data[y0 // y_step:(y1 + y_step - 1) // y_step, x0 // x_step:(x1 + x_step - 1) // x_step]
+
+
+def read_line_window(source, direction, index, window):
+    """
+    Read the (y0, y1, x0, x1) window of an inline or crossline of a
+    post-stack file, reading only the traces within the window.
+
+    :type source: segyio.SegyFile
+    :type direction: dict
+    :type index: int
+    :type window: (int, int, int, int)
+    :rtype: numpy.ndarray
+    """
+    y0, y1, x0, x1 = window
+    iline_count, xline_count = len(source.ilines), len(source.xlines)
+    inline_sorted = source.sorting == segyio.TraceSortingFormat.INLINE_SORTING
+
+    # the traces of a line are either consecutive or one line length apart
+    if direction == SliceDirection.inline:
+        count = xline_count
+        start, stride = (index * xline_count, 1) if inline_sorted else (index, iline_count)
+    elif direction == SliceDirection.crossline:
+        count = iline_count
+        start, stride = (index, xline_count) if inline_sorted else (index * iline_count, 1)
+    else:
+        raise ValueError("Only inlines and crosslines are read by trace: %s" % direction)
+
+    x0, x1 = max(x0, 0), max(min(x1, count), x0)
+    traces = source.trace.raw[start + x0 * stride:start + x1 * stride:stride]
+    return traces[:, y0:y1].T
+
+
 class EmptyDataSource(object):
     def __init__(self):
         super(EmptyDataSource, self).__init__()
@@ -61,57 +146,672 @@ class EmptyDataSource(object):
         return segyio.TraceSortingFormat.CROSSLINE_SORTING
 
 
+class _OpenCancelled(Exception):
+    pass
+
+
+class _OpenedSource(object):
+    """ A file opened by SliceDataSource, with the sidecars it uses. """
+
+    def __init__(self, filename, segyio_args, file_size, source):
+        super(_OpenedSource, self).__init__()
+        self.filename = filename
+        self.segyio_args = segyio_args
+        self.file_size = file_size
+        self.source = source
+        """ :type: segyio.SegyFile """
+        self.depth_sidecar = None
+        self.brick_store = None
+        self.pyramid = None
+
+    def close(self):
+        for sidecar in (self.depth_sidecar, self.brick_store, self.pyramid):
+            if sidecar is not None:
+                sidecar.close()
+        self.source.close()
+
+
 class SliceDataSource(QObject):
     slice_data_source_changed = pyqtSignal()
+    in_memory_progress = pyqtSignal(float)
+    in_memory_loaded = pyqtSignal()
+    open_progress = pyqtSignal(float)
+    open_failed = pyqtSignal(object)
+
+    _source_opened = pyqtSignal(int, object)
+
+    # files smaller than this are considered small, e.g. for the default layout
+    SMALL_FILE_SIZE = 8 * 10 ** 8
 
-    def __init__(self, filename, **kwargs):
+    # the cache of an inactive source only keeps a few recent slices
+    INACTIVE_CACHE_SIZE = 64 * 1024 ** 2
+
+    def __init__(self, filename, cache_size=SliceCache.DEFAULT_MAX_BYTES,
+                 prefetch_count=SlicePrefetcher.DEFAULT_COUNT, depth_sidecar=False, brick_store=False,
+                 pyramid=False, in_memory_limit=0, geometry_index=False, shared=False, **kwargs):
+        """
+        :param in_memory_limit: Files whose cube takes fewer than this many
+                                bytes as float32 are loaded entirely into
+                                memory in the background, 0 disables
+                                loading into memory
+        :type in_memory_limit: int
+        :param geometry_index: Keep the geometry of opened files in an index
+                               next to the file, so a file opened again does
+                               not have its trace headers scanned
+        :type geometry_index: bool
+        :param shared: Share the opened file and the slice cache with the
+                       other shared sources of the same file, through the
+                       process-wide SourceRegistry
+        :type shared: bool
+        """
         QObject.__init__(self)
 
         self._file_size = 0
         self._source = None
         """ :type: segyio.SegyFile """
+        self._segyio_args = {}
+        self._use_geometry_index = geometry_index
+        self._use_depth_sidecar = depth_sidecar
+        self._depth_sidecar = None
+        """ :type: DepthSidecar """
+        self._average_decimation = False
+        self._use_brick_store = brick_store
+        self._brick_store = None
+        """ :type: BrickStore """
+        self._use_pyramid = pyramid
+        self._pyramid = None
+        """ :type: SlicePyramid """
+        self._in_memory_limit = in_memory_limit
+        self._in_memory_cube = None
+        """ :type: InMemoryCube """
+        self._cube_account = None
+        """ :type: MemoryAccount """
+        self._in_memory_generation = 0
+        self._in_memory_loading = False
+        self._open_generation = 0
+        self._opening = False
+        self._cache_size = cache_size
+        self._active = True
+        self._warm = False
+        self._viewed_indexes = {}
+        self._use_registry = shared
+        self._shared_source = None
+        """ :type: SharedSource """
+        self._cache = SliceCache(cache_size)
+        self._cache.distance = self._slice_distance
+        self._read_lock = RLock()
+        self._prefetcher = SlicePrefetcher(self, prefetch_count)
+        self._source_opened.connect(self._open_finished)
         self.set_source_filename(filename, **kwargs)
         self._source_filename = filename
 
     def _close_current_file(self):
-        self._file_size = 0
+        self._prefetcher.cancel()
 
-        if self._source is None: return
+        with self._read_lock:
+            self._file_size = 0
 
-        try: self._source.close()
-        except AttributeError: pass
+            self._in_memory_generation += 1
+            self._in_memory_loading = False
+            self._in_memory_cube = None
 
-        self._source = None
+            if self._cube_account is not None:
+                self._cube_account.bytes = 0
+                self._cube_account = None
+
+            shared, self._shared_source = self._shared_source, None
+            if shared is None:
+                self._cache.clear()
+            else:
+                # the file, sidecars and cache are left to the other holders;
+                # a prefetch waiting for the lock finds no file to read
+                self._source = None
+                self._depth_sidecar = None
+                self._brick_store = None
+                self._pyramid = None
+
+        if shared is not None:
+            self._cache = SliceCache(self._cache_size)
+            self._cache.distance = self._slice_distance
+            self._apply_cache_budget()
+            self._read_lock = RLock()
+            source_registry().release(shared, self)
+            return
+
+        with self._read_lock:
+            if self._depth_sidecar is not None:
+                self._depth_sidecar.close()
+                self._depth_sidecar = None
+
+            if self._brick_store is not None:
+                self._brick_store.close()
+                self._brick_store = None
+
+            if self._pyramid is not None:
+                self._pyramid.close()
+                self._pyramid = None
+
+            if self._source is None: return
+
+            try: self._source.close()
+            except AttributeError: pass
+
+            self._source = None
 
     @property
     def file_size(self):
         return self._file_size
 
+    @property
+    def cache(self):
+        """ :rtype: SliceCache """
+        return self._cache
+
+    @property
+    def prefetcher(self):
+        """ :rtype: SlicePrefetcher """
+        return self._prefetcher
+
+    @property
+    def depth_sidecar(self):
+        """ :rtype: DepthSidecar | None """
+        return self._depth_sidecar
+
+    @property
+    def brick_store(self):
+        """ :rtype: BrickStore | None """
+        return self._brick_store
+
+    @property
+    def pyramid(self):
+        """ :rtype: SlicePyramid | None """
+        return self._pyramid
+
+    @property
+    def in_memory_cube(self):
+        """
+        The cube, when loaded into memory and not evicted by the
+        MemoryBudget since.
+
+        :rtype: InMemoryCube | None
+        """
+        if self._shared_source is not None:
+            return self._shared_source.cube
+        return self._in_memory_cube
+
+    @property
+    def in_memory_loading(self):
+        """ Whether the cube is being loaded into memory. """
+        return self._in_memory_loading
+
+    @property
+    def active(self):
+        """
+        Whether the source backs a view that is shown. Inactive sources do
+        not prefetch, their cache is shrunk to INACTIVE_CACHE_SIZE, and the
+        MemoryBudget evicts from it before the caches of active sources.
+
+        :rtype: bool
+        """
+        return self._active
+
+    @active.setter
+    def active(self, value):
+        """ :type value: bool """
+        self._active = value
+
+        if not value:
+            self._prefetcher.cancel()
+
+        self._apply_cache_budget()
+
+    @property
+    def warm(self):
+        """
+        Whether an inactive source backs a view that is likely to be shown
+        soon, and has slices read into its cache ahead of that. A warm
+        source keeps its full cache, which the MemoryBudget evicts from
+        after the caches of other inactive sources.
+
+        :rtype: bool
+        """
+        return self._warm
+
+    @warm.setter
+    def warm(self, value):
+        """ :type value: bool """
+        self._warm = value
+        self._apply_cache_budget()
+
+    def _apply_cache_budget(self):
+        if self._active:
+            budget, priority = self._cache_size, MemoryBudget.ON_SCREEN
+        elif self._warm:
+            budget, priority = self._cache_size, MemoryBudget.WARM
+        else:
+            budget, priority = min(self._cache_size, self.INACTIVE_CACHE_SIZE), MemoryBudget.OFF_SCREEN
+
+        if self._shared_source is not None:
+            self._shared_source.set_budget(self, budget, priority, self._slice_distance)
+        else:
+            self._cache.max_bytes = budget
+            self._cache.priority = priority
+
+            if self._cube_account is not None:
+                self._cube_account.priority = priority
+
+    def _evict_cube(self):
+        # called by the memory budget, which may be waited for by readers
+        # holding the read lock; readers take the cube reference only once
+        self._in_memory_cube = None
+
+    def _slice_distance(self, key):
+        # cache keys start with the direction name and the index
+        index = self._viewed_indexes.get(key[0])
+        return 0 if index is None else abs(key[1] - index)
+
+    @property
+    def shared_source(self):
+        """ :rtype: SharedSource | None """
+        return self._shared_source
+
+    @property
+    def opening(self):
+        """ Whether a file is being opened in the background. """
+        return self._opening
+
+    @property
+    def overview_step(self):
+        """
+        The coarsest (y, x) step that can be read without touching the
+        full resolution data, useful for a quick first paint.
+
+        :rtype: (int, int)
+        """
+        if self._pyramid is None:
+            return 1, 1
+        factor = self._pyramid.coarsest_factor
+        return factor, factor
+
+    @property
+    def average_decimation(self):
+        """
+        Whether decimated slices average blocks of samples, instead of
+        picking every n'th sample.
+
+        :rtype: bool
+        """
+        return self._average_decimation
+
+    @average_decimation.setter
+    def average_decimation(self, value):
+        """ :type value: bool """
+        self._average_decimation = value
+
     @property
     def source_filename(self):
         return self._source_filename
 
+    @property
+    def segyio_args(self):
+        """ The arguments the current file was opened with by segyio.open. """
+        return dict(self._segyio_args)
+
     def set_source_filename(self, filename, **kwargs):
+        self.cancel_open()
+
         if filename:
-            try:
-                file_size = os.stat(filename).st_size
-                source = segyio.open(filename, "r", **kwargs)
-                self._source_filename = filename
-            except:
-                raise
-            else:
-                self._close_current_file()
-                self._source = source
-                self._file_size = file_size
-                self._source.mmap()
-                samples = self._source.samples
+            self._install(self._open(filename, kwargs))
         else:
             self._close_current_file()
             self._source = EmptyDataSource()
+            self._segyio_args = {}
 
         self.slice_data_source_changed.emit()
 
-    def read_slice(self, direction, index):
+    def open_source_filename(self, filename, **kwargs):
+        """
+        Open filename in the background, as set_source_filename does,
+        including building any sidecars it needs. The current file is kept
+        until the new one is ready. open_progress is emitted while opening,
+        then either slice_data_source_changed or open_failed. An earlier
+        open that has not finished is cancelled.
+        """
+        self.cancel_open()
+
+        self._opening = True
+        generation = self._open_generation
+
+        def progress(fraction):
+            if generation != self._open_generation:
+                raise _OpenCancelled()
+            self.open_progress.emit(fraction)
+
+        def open_file():
+            try:
+                opened = self._open(filename, kwargs, progress)
+            except _OpenCancelled:
+                return
+            except Exception as e:
+                opened = e
+
+            self._source_opened.emit(generation, opened)
+
+        submit(open_file)
+
+    def cancel_open(self):
+        """ Cancel opening a file in the background, keeping the current file. """
+        self._open_generation += 1
+        self._opening = False
+
+    def _open_finished(self, generation, opened):
+        if generation != self._open_generation:
+            if isinstance(opened, SharedSource):
+                source_registry().release(opened)
+            elif isinstance(opened, _OpenedSource):
+                opened.close()
+            return
+
+        self._opening = False
+
+        if isinstance(opened, Exception):
+            self.open_failed.emit(opened)
+            return
+
+        self._install(opened)
+        self.slice_data_source_changed.emit()
+
+    def _open(self, filename, segyio_args, progress=None):
+        """
+        Open filename and its sidecars, or reference them in the registry
+        when shared. Only reads state that is fixed at construction, so it
+        can run on the worker pool.
+
+        :type filename: str
+        :type segyio_args: dict
+        :param progress: Called with the completed fraction while opening
+        :type progress: callable | None
+        :rtype: _OpenedSource | SharedSource
+        """
+        if not self._use_registry:
+            return self._open_file(filename, segyio_args, progress)
+
+        options = (self._use_depth_sidecar, self._use_brick_store, self._use_pyramid)
+        key = source_registry().key(filename, segyio_args, options)
+        return source_registry().acquire(key, lambda: self._open_file(filename, segyio_args, progress))
+
+    def _open_file(self, filename, segyio_args, progress=None):
+        """ :rtype: _OpenedSource """
+        def phase_progress(phase, phases):
+            if progress is None:
+                return None
+            return lambda fraction: progress((phase + fraction) / float(phases))
+
+        if progress is not None:
+            progress(0.0)
+
+        file_size = os.stat(filename).st_size
+        if self._use_geometry_index:
+            source = GeometryIndex.open_segy(filename, **segyio_args)
+        else:
+            source = segyio.open(filename, "r", **segyio_args)
+
+        opened = _OpenedSource(filename, segyio_args, file_size, source)
+
+        try:
+            source.mmap()
+
+            sidecars = []
+            if not source.unstructured:
+                if self._use_depth_sidecar:
+                    sidecars.append(('depth_sidecar', DepthSidecar))
+                if self._use_brick_store:
+                    sidecars.append(('brick_store', BrickStore))
+                if self._use_pyramid:
+                    sidecars.append(('pyramid', SlicePyramid))
+
+            # a sidecar is only valid for the header fields the file is opened with
+            fields = GeometryIndex.fields_for(segyio_args)
+
+            phases = len(sidecars) + 1
+            for phase, (name, sidecar) in enumerate(sidecars):
+                report = phase_progress(phase + 1, phases)
+                setattr(opened, name, sidecar.open_or_build(filename, source, fields=fields, progress=report))
+
+            # cancelling raises from here as well, the file must not leak
+            if progress is not None:
+                progress(1.0)
+        except:
+            opened.close()
+            raise
+
+        return opened
+
+    def _install(self, opened):
+        """ :type opened: _OpenedSource | SharedSource """
+        self._close_current_file()
+
+        if isinstance(opened, SharedSource):
+            self._shared_source = opened
+            self._cache = opened.cache
+            self._read_lock = opened.lock
+            self._apply_cache_budget()
+            opened = opened.opened
+
+        self._source_filename = opened.filename
+        self._source = opened.source
+        self._segyio_args = opened.segyio_args
+        self._file_size = opened.file_size
+        self._depth_sidecar = opened.depth_sidecar
+        self._brick_store = opened.brick_store
+        self._pyramid = opened.pyramid
+
+        # the limit is on the float32 cube, not the file, which may be in a
+        # smaller format or hold large trace headers
+        source = opened.source
+        if not source.unstructured and InMemoryCube.required_bytes(source) < self._in_memory_limit:
+            self._load_in_memory()
+
+    def _load_in_memory(self):
+        source = self._source
+        shared = self._shared_source
+        generation = self._in_memory_generation
+        self._in_memory_loading = True
+
+        def cancelled():
+            # a shared cube is loaded for as long as anyone holds the file
+            if shared is not None:
+                return shared.closed
+            return generation != self._in_memory_generation
+
+        def loaded(cube):
+            with self._read_lock:
+                if cube is None or generation != self._in_memory_generation:
+                    return
+
+                self._in_memory_loading = False
+
+                # a shared cube is kept, and accounted for, by the shared
+                # source; the cache is shared with others that may still
+                # read from the file
+                if shared is None:
+                    self._in_memory_cube = cube
+                    self._cube_account = MemoryAccount(cube.nbytes, self._evict_cube, self._cache.priority)
+                    self._cache.clear()
+
+            self.in_memory_loaded.emit()
+
+        def load():
+            cube = InMemoryCube.load(source, self._read_lock, self.in_memory_progress.emit, cancelled)
+
+            if shared is not None:
+                shared.set_cube(cube)
+            else:
+                loaded(cube)
+
+        # the other holders of a shared file wait for the cube of the first
+        if shared is not None and not shared.request_cube(lambda cube: submit(loaded, cube)):
+            return
+
+        submit(load)
+
+    def read_slice(self, direction, index, step=(1, 1), window=None):
+        """
+        :type direction: dict
+        :type index: int
+        :param step: The (y, x) decimation of the returned slice
+        :type step: (int, int)
+        :param window: The (y0, y1, x0, x1) part of the slice to read, in full
+                       resolution coordinates, or None for the entire slice.
+                       The window should start at a multiple of the step.
+        :type window: (int, int, int, int) | None
+        :rtype: numpy.ndarray
+        """
+        step = tuple(step)
+
+        cube = self.in_memory_cube
+        if cube is not None:
+            return decimate(crop(cube.read_slice(direction, index), window), step, self._average_decimation)
+
+        if self._pyramid_level(step) > 1:
+            key = (direction['name'], index, step)
+            data = self._cache.get(key)
+
+            if data is None:
+                data = self._load_slice(key, direction, index, step)
+
+            return crop(data, window, step)
+
+        key = (direction['name'], index)
+        data = self._cache.get(key)
+
+        if data is None and window is not None and self._can_read_window(direction):
+            # only the window is read, the full slice is left for the prefetcher
+            with self._read_lock:
+                data = self._read_window(direction, index, window)
+            return decimate(data, step, self._average_decimation)
+
+        if data is None:
+            data = self._load_slice(key, direction, index)
+
+        return decimate(crop(data, window), step, self._average_decimation)
+
+    def _can_read_window(self, direction):
+        if self._brick_store is not None:
+            return True
+
+        if direction == SliceDirection.depth:
+            return self._depth_sidecar is not None
+
+        # lines of post-stack files are read as ranges of traces, depth
+        # slices touch every trace and are read whole
+        source = self._source
+        return isinstance(source, segyio.SegyFile) and not source.unstructured and len(source.offsets) == 1
+
+    def _read_window(self, direction, index, window):
+        if direction == SliceDirection.depth and self._depth_sidecar is not None:
+            return self._depth_sidecar.depth_slice(index, window)
+
+        if self._brick_store is not None:
+            return self._brick_store.read_slice(direction, index, window)
+
+        return read_line_window(self._source, direction, index, window)
+
+    def decimation(self, step):
+        """
+        How a slice decimated by step is read: None at full resolution,
+        "pyramid" for the block means of the pyramid, and "average" or
+        "pick" for averaging or picking the samples of the full slice. It
+        changes when the cube is loaded into memory or evicted, and with
+        average_decimation.
+
+        :type step: (int, int)
+        :rtype: str | None
+        """
+        step = tuple(step)
+        if step == (1, 1):
+            return None
+
+        if self.in_memory_cube is None and self._pyramid_level(step) > 1:
+            return "pyramid"
+
+        return "average" if self._average_decimation else "pick"
+
+    def _pyramid_level(self, step):
+        if self._pyramid is None:
+            return 1
+        return self._pyramid.level_for(step)
+
+    def is_cached(self, direction, index, step=(1, 1)):
+        """ :rtype: bool """
+        if self.in_memory_cube is not None:
+            return True
+
+        step = tuple(step)
+        if self._pyramid_level(step) > 1:
+            return (direction['name'], index, step) in self._cache
+        return (direction['name'], index) in self._cache
+
+    def preload_slice(self, direction, index, step=(1, 1)):
+        """
+        Read a slice into the cache, unless it is already cached. With a
+        step that is read from the pyramid, the decimated slice is cached,
+        as read_slice would. Nothing is read when no file is open, e.g. for a
+        prefetch that was scheduled before the file was closed.
+        """
+        # the lock keeps the file from being closed while it is read
+        with self._read_lock:
+            if self._source is None or isinstance(self._source, EmptyDataSource):
+                return
+
+            if not 0 <= index < len(self.indexes_for_direction(direction)):
+                return
+
+            if self.in_memory_cube is not None:
+                return
+
+            step = tuple(step)
+            if self._pyramid_level(step) > 1:
+                key = (direction['name'], index, step)
+            else:
+                key, step = (direction['name'], index), (1, 1)
+
+            if self._cache.peek(key) is None:
+                self._load_slice(key, direction, index, step)
+
+    def prefetch(self, direction, index):
+        """Let the prefetcher read ahead of index in the background."""
+        # the memory budget evicts the slices farthest from the viewed ones first
+        self._viewed_indexes[direction['name']] = index
+
+        if self._source is None or isinstance(self._source, EmptyDataSource) or not self._active:
+            return
+
+        self._prefetcher.index_changed(direction, index)
+
+    def _load_slice(self, key, direction, index, step=(1, 1)):
+        # slices can be read from the prefetch threads, segyio must only be
+        # accessed by one thread at a time
+        with self._read_lock:
+            data = self._cache.peek(key)
+
+            if data is None:
+                # only slices read from the pyramid are cached decimated
+                if step != (1, 1):
+                    data = self._pyramid.read_slice(direction, index, step)
+                else:
+                    data = self._read_slice(direction, index)
+                self._cache.put(key, data)
+
+        return data
+
+    def _read_slice(self, direction, index):
+        if direction == SliceDirection.depth and self._depth_sidecar is not None:
+            return self._depth_sidecar.depth_slice(index)
+
+        if self._brick_store is not None:
+            return self._brick_store.read_slice(direction, index)
+
         if direction == SliceDirection.inline:
             iline_index = self._source.ilines[index]
             return self._source.iline[iline_index].T
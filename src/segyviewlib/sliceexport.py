@@ -0,0 +1,185 @@
+import os
+from multiprocessing import Pool, cpu_count
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.cm import ScalarMappable
+
+from .layoutfigure import LayoutFigure
+from .slicemodel import SliceModel, SliceDirection
+from .slicedatasource import SliceDataSource
+from .sliceview import SliceView
+from .sliceviewcontext import ViewLimit
+
+DIRECTIONS = {
+    'inline': (SliceDirection.inline, SliceDirection.crossline, SliceDirection.depth),
+    'crossline': (SliceDirection.crossline, SliceDirection.inline, SliceDirection.depth),
+    'depth': (SliceDirection.depth, SliceDirection.inline, SliceDirection.crossline),
+}
+
+TITLES = {'inline': "Inline", 'crossline': "Crossline", 'depth': "Depth"}
+
+_SINGLE_LAYOUT = {'dims': (1, 1), 'grid': [(0, 0)]}
+
+
+class SliceExporter(object):
+    """
+    Renders slices to image files without a display, with the same figure
+    layout and slice styling as the viewer. One figure is kept for each
+    direction and reused for every slice exported in that direction.
+    """
+
+    def __init__(self, filename, segyio_args=None, colormap='seismic', interpolation='nearest',
+                 width=11.7, height=8.3, dpi=100, min_value=None, max_value=None, samples_unit="Time (ms)"):
+        """
+        :param min_value: The lower end of the colour scale, None to scale every slice by its own values
+        :param max_value: The upper end of the colour scale, None to scale every slice by its own values
+        """
+        super(SliceExporter, self).__init__()
+        self._data_source = SliceDataSource(filename, prefetch_count=0, **(segyio_args or {}))
+        self._colormap = colormap
+        self._interpolation = interpolation
+        self._size = (width, height, dpi)
+        self._min_value = min_value
+        self._max_value = max_value
+        self._samples_unit = samples_unit
+        self._figures = {}
+
+    @property
+    def data_source(self):
+        """ :rtype: SliceDataSource """
+        return self._data_source
+
+    def slice_jobs(self, direction, every=1, directory=".", image_format="png"):
+        """
+        The (direction, index, path) of every n'th slice in direction, named
+        after the file and the line number or sample.
+
+        :type direction: str
+        :rtype: list[(str, int, str)]
+        """
+        numbers = self._data_source.indexes_for_direction(DIRECTIONS[direction][0])
+        name = os.path.splitext(os.path.basename(self._data_source.source_filename))[0]
+
+        jobs = []
+        for index in range(0, len(numbers), every):
+            filename = "%s-%s-%g.%s" % (name, direction, numbers[index], image_format)
+            jobs.append((direction, index, os.path.join(directory, filename)))
+        return jobs
+
+    def export(self, direction, index, path):
+        """
+        Render the slice at index in direction to path, in the format given
+        by the extension of path.
+
+        :type direction: str
+        :type index: int
+        :type path: str
+        """
+        figure, axes, view, model, colorbar = self._figure(direction)
+
+        model.index = index
+        model.data = self._data_source.read_slice(model.index_direction, index)
+
+        context = self._context(model)
+        view.data_changed(context)
+        view.context_changed(context)
+        colorbar.mappable.set_clim(context['min'], context['max'])
+
+        number = self._data_source.indexes_for_direction(model.index_direction)[index]
+        axes.set_title("%s %g" % (model.title, number), fontsize=12)
+
+        figure.savefig(path)
+
+    def _figure(self, direction):
+        if direction not in self._figures:
+            index_direction, x_direction, y_direction = DIRECTIONS[direction]
+
+            model = SliceModel(TITLES[direction], index_direction, x_direction, y_direction)
+            model.indexes = list(self._data_source.indexes_for_direction(index_direction))
+            model.x_indexes = list(self._data_source.indexes_for_direction(x_direction))
+            model.y_indexes = list(self._data_source.indexes_for_direction(y_direction))
+            model.x_index = None
+            model.y_index = None
+
+            width, height, dpi = self._size
+            figure = LayoutFigure(width, height, dpi)
+            FigureCanvasAgg(figure)
+            figure.set_plot_layout(_SINGLE_LAYOUT)
+
+            axes = figure.layout_axes()[0]
+            view = SliceView(axes, model, interpolation=self._interpolation)
+            view.create_slice(self._context(model))
+
+            mappable = ScalarMappable(cmap=self._colormap)
+            mappable.set_array([])
+            colorbar = figure.colorbar(mappable, cax=figure.colormap_axes(), use_gridspec=True)
+            colorbar.ax.tick_params(labelsize=9)
+
+            self._figures[direction] = (figure, axes, view, model, colorbar)
+
+        return self._figures[direction]
+
+    def _context(self, model):
+        vmin = model.min_value if self._min_value is None else self._min_value
+        vmax = model.max_value if self._max_value is None else self._max_value
+
+        # per slice scales are symmetric around zero, as in the viewer
+        if vmin is not None and vmax is not None and self._min_value is None and self._max_value is None:
+            if vmin <= 0.0 <= vmax:
+                vmax = max(abs(vmin), vmax)
+                vmin = -vmax
+
+        return {
+            "colormap": self._colormap,
+            "show_indicators": False,
+            "min": vmin,
+            "max": vmax,
+            "interpolation": self._interpolation,
+            "view_limits": {model.index_direction['name']: ViewLimit(model)},
+            "samples_unit": self._samples_unit,
+        }
+
+
+# the exporter of a pool process, created once by the pool initializer
+_exporter = None
+
+
+def _initialize(filename, options):
+    global _exporter
+    _exporter = SliceExporter(filename, **options)
+
+
+def _export(job):
+    _exporter.export(*job)
+    return job[2]
+
+
+def export_slices(filename, jobs, processes=None, progress=None, **options):
+    """
+    Render (direction, index, path) jobs, as made by
+    SliceExporter.slice_jobs, on a pool of processes that each open the file
+    once. The options are passed on to SliceExporter.
+
+    :type filename: str
+    :type jobs: list[(str, int, str)]
+    :param processes: The number of processes, None for one per CPU
+    :type processes: int | None
+    :param progress: Called with the path of every image as it is written
+    :type progress: callable | None
+    """
+    processes = processes or cpu_count()
+
+    # a few chunks per process keeps the processes busy until the end
+    chunk = max(1, len(jobs) // (4 * processes))
+
+    pool = Pool(processes, _initialize, (filename, options))
+    try:
+        for path in pool.imap_unordered(_export, jobs, chunk):
+            if progress is not None:
+                progress(path)
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
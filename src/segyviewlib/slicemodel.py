@@ -1,5 +1,7 @@
 import numpy as np
 
+from .memorybudget import MemoryAccount
+
 
 class SliceDirection(object):
     inline = {'name': "Inlines"}
@@ -7,6 +9,48 @@ class SliceDirection(object):
     depth = {'name': "Depth"}
 
 
+def decimated_length(length, step):
+    """ The number of elements left when taking every step'th of length elements. """
+    return (length + step - 1) // step
+
+
+# elements of a slice sanitised at a time, small enough to stay in cache
+# between the copy, the inf replacement and the reduction
+SANITISE_BLOCK_SIZE = 32 * 1024
+
+
+def sanitise(data, out, mask):
+    """
+    Copy data into out with infinities replaced by 0, and return the
+    (min, max) of the result ignoring NaN. The work is done in blocks of
+    rows, so every element is read from memory once and no temporaries are
+    allocated; mask is a boolean scratch buffer of at least one block.
+
+    :type data: numpy.ndarray
+    :type out: numpy.ndarray
+    :type mask: numpy.ndarray
+    :rtype: (float, float)
+    """
+    rows = data.shape[0]
+    block_rows = mask.shape[0]
+    minimum = maximum = np.nan
+
+    for start in range(0, rows, block_rows):
+        stop = min(start + block_rows, rows)
+        block = out[start:stop]
+        block_mask = mask[:stop - start]
+
+        np.copyto(block, data[start:stop])
+        np.isinf(block, out=block_mask)
+        np.putmask(block, block_mask, 0.0)
+
+        # fmin and fmax ignore NaN, like nanmin and nanmax
+        minimum = np.fmin(minimum, np.fmin.reduce(block, axis=None))
+        maximum = np.fmax(maximum, np.fmax.reduce(block, axis=None))
+
+    return minimum, maximum
+
+
 class SliceModel(object):
     def __init__(self, title, index_direction, x_index_direction, y_index_direction):
         super(SliceModel, self).__init__()
@@ -21,6 +65,13 @@ class SliceModel(object):
         self._data = None
         self._data_x_indexes = None
         self._data_y_indexes = None
+        self._data_version = 0
+
+        # data is sanitised into two buffers taken in turn, so the previous
+        # data stays intact until the next set_data
+        self._buffers = [None, None]
+        self._mask = None
+        self._memory = MemoryAccount()
 
         self._index = 0
         self._x_index = 0
@@ -29,6 +80,13 @@ class SliceModel(object):
         self._min_value = None
         self._max_value = None
 
+        self._resolution_step = (1, 1)
+        self._data_step = (1, 1)
+        self._data_decimation = None
+        self._data_index = None
+        self._window = None
+        self._data_window = None
+
         self._visible = True
         self._dirty = False
 
@@ -46,7 +104,7 @@ class SliceModel(object):
     def indexes(self, indexes):
         """ :type indexes: list[int] """
         self._indexes = indexes
-        self._index = len(indexes) / 2
+        self._index = len(indexes) // 2
 
     @property
     def x_indexes(self):
@@ -56,9 +114,9 @@ class SliceModel(object):
     @x_indexes.setter
     def x_indexes(self, indexes):
         """ :type indexes: list[int] """
-        self._assert_shape(self._data, indexes, self._y_indexes)
+        self._assert_shape(self._data, indexes, self._y_indexes, self._data_step, self._data_window)
         self._x_indexes = indexes
-        self.x_index = len(indexes) / 2
+        self.x_index = len(indexes) // 2
 
     @property
     def y_indexes(self):
@@ -68,17 +126,25 @@ class SliceModel(object):
     @y_indexes.setter
     def y_indexes(self, indexes):
         """ :type indexes: list[int] """
-        self._assert_shape(self._data, self._x_indexes, indexes)
+        self._assert_shape(self._data, self._x_indexes, indexes, self._data_step, self._data_window)
         self._y_indexes = indexes
-        self.y_index = len(indexes) / 2
+        self.y_index = len(indexes) // 2
 
     @staticmethod
-    def _assert_shape(data, x_indexes, y_indexes):
+    def _assert_shape(data, x_indexes, y_indexes, step=(1, 1), window=None):
         if data is not None:
-            if x_indexes and len(x_indexes) != data.shape[1]:
+            y_step, x_step = step
+            if window is None:
+                width = len(x_indexes) if x_indexes else None
+                height = len(y_indexes) if y_indexes else None
+            else:
+                y0, y1, x0, x1 = window
+                width, height = x1 - x0, y1 - y0
+
+            if width is not None and decimated_length(width, x_step) != data.shape[1]:
                 raise ValueError("X axis element count does not match data shape")
 
-            if y_indexes and len(y_indexes) != data.shape[0]:
+            if height is not None and decimated_length(height, y_step) != data.shape[0]:
                 raise ValueError("Y axis element count does not match data shape")
 
     @property
@@ -99,16 +165,140 @@ class SliceModel(object):
     @data.setter
     def data(self, data):
         """ :type: numppy.ndarray """
-        self._assert_shape(data, self._x_indexes, self._y_indexes)
-        data[data == -np.inf] = 0.0
-        data[data == np.inf] = 0.0
-        self._data = data
-        self._min_value = np.nanmin(self.data)
-        self._max_value = np.nanmax(self.data)
+        self.set_data(data)
+
+    def set_data(self, data, step=(1, 1), window=None, decimation=None):
+        """
+        The data is copied into a buffer owned by the model, with infinities
+        replaced by 0. The array passed in is never modified, so it may be a
+        cached slice or a view of a file or cube.
+
+        :type data: numpy.ndarray
+        :param step: The (y, x) decimation of data relative to the full slice
+        :type step: (int, int)
+        :param window: The (y0, y1, x0, x1) part of the full slice data covers, None for all of it
+        :type window: (int, int, int, int) | None
+        :param decimation: How data was decimated, see SliceDataSource.decimation
+        :type decimation: str | None
+        """
+        self._assert_shape(data, self._x_indexes, self._y_indexes, step, window)
+        buffer = self._next_buffer(data)
+        self._min_value, self._max_value = sanitise(data, buffer, self._mask)
+        self._data = buffer
+        self._data_version += 1
+        self._data_index = self._index
+        self._data_step = tuple(step)
+        self._data_decimation = decimation
+        self._data_window = None if window is None else tuple(window)
         self._data_x_indexes = list(range(data.shape[0]))
         self._data_y_indexes = list(range(data.shape[1]))
         self._dirty = False
 
+    def _next_buffer(self, data):
+        """ :rtype: numpy.ndarray """
+        self._buffers.reverse()
+        buffer = self._buffers[0]
+        if buffer is None or buffer.shape != data.shape or buffer.dtype != data.dtype:
+            buffer = np.empty(data.shape, dtype=data.dtype)
+            self._buffers[0] = buffer
+
+        columns = max(1, data.shape[1])
+        block_rows = max(1, min(data.shape[0], SANITISE_BLOCK_SIZE // columns))
+        if self._mask is None or self._mask.shape != (block_rows, data.shape[1]):
+            self._mask = np.empty((block_rows, data.shape[1]), dtype=bool)
+
+        self._memory.bytes = sum(b.nbytes for b in self._buffers if b is not None) + self._mask.nbytes
+        return buffer
+
+    @property
+    def data_version(self):
+        """ Incremented every time data is set. """
+        return self._data_version
+
+    @property
+    def data_step(self):
+        """ :rtype: (int, int) """
+        return self._data_step
+
+    @property
+    def data_index(self):
+        """ The index of the slice the loaded data was read from. """
+        return self._data_index
+
+    @property
+    def resolution_step(self):
+        """
+        The (y, x) decimation the views need. The model is dirty when the
+        loaded data has a different decimation.
+
+        :rtype: (int, int)
+        """
+        return self._resolution_step
+
+    @resolution_step.setter
+    def resolution_step(self, step):
+        """ :type step: (int, int) """
+        self._resolution_step = tuple(step)
+        if self._data is not None and self._resolution_step != self._data_step:
+            self._dirty = True
+
+    @property
+    def data_decimation(self):
+        """ How the data was decimated, see SliceDataSource.decimation. """
+        return self._data_decimation
+
+    @property
+    def data_window(self):
+        """ :rtype: (int, int, int, int) | None """
+        return self._data_window
+
+    @property
+    def window(self):
+        """
+        The (y0, y1, x0, x1) part of the slice to load, in full resolution
+        index coordinates, or None for the entire slice. The model is dirty
+        when the loaded data covers another part of the slice.
+
+        :rtype: (int, int, int, int) | None
+        """
+        return self._window
+
+    @window.setter
+    def window(self, window):
+        """ :type window: (int, int, int, int) | None """
+        self._window = None if window is None else tuple(window)
+        if self._data is not None and self._window != self._data_window:
+            self._dirty = True
+
+    def covers(self, region):
+        """
+        Whether the loaded data covers the (y0, y1, x0, x1) region.
+
+        :rtype: bool
+        """
+        if self._data is None:
+            return False
+
+        if self._data_window is None:
+            return True
+
+        y0, y1, x0, x1 = region
+        wy0, wy1, wx0, wx1 = self._data_window
+        return wy0 <= y0 and y1 <= wy1 and wx0 <= x0 and x1 <= wx1
+
+    @property
+    def data_extent(self):
+        """
+        The (left, right, bottom, top) image extent of the loaded data.
+
+        :rtype: (int, int, int, int)
+        """
+        if self._data_window is None:
+            return 0, self.width, self.height, 0
+
+        y0, y1, x0, x1 = self._data_window
+        return x0, x1, y1, y0
+
     @property
     def index(self):
         """ :rtype: int """
@@ -236,6 +426,9 @@ class SliceModel(object):
         self._data = None
         self._data_x_indexes = None
         self._data_y_indexes = None
+        self._buffers = [None, None]
+        self._mask = None
+        self._memory.bytes = 0
 
         self._index = 0
         self._x_index = 0
@@ -243,3 +436,9 @@ class SliceModel(object):
 
         self._min_value = None
         self._max_value = None
+
+        self._data_step = (1, 1)
+        self._data_decimation = None
+        self._data_index = None
+        self._window = None
+        self._data_window = None
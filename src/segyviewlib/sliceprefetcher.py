@@ -0,0 +1,100 @@
+from collections import deque
+from threading import Lock
+import time
+
+from ._workerpool import submit
+
+
+class SlicePrefetcher(object):
+    """
+    Reads the slices ahead of the current scroll direction into the slice
+    cache on a background thread.
+    """
+
+    DEFAULT_COUNT = 4
+
+    # index changes closer than this (seconds) are considered fast scrolling
+    FAST_INTERVAL = 0.15
+
+    def __init__(self, slice_data_source, count=DEFAULT_COUNT, history=6):
+        """ :type slice_data_source: segyviewlib.SliceDataSource """
+        super(SlicePrefetcher, self).__init__()
+        self._slice_data_source = slice_data_source
+        self._count = count
+        self._history_length = history
+        self._history = {}
+        self._generations = {}
+        self._lock = Lock()
+
+    @property
+    def count(self):
+        """ :rtype: int """
+        return self._count
+
+    @count.setter
+    def count(self, value):
+        """ :type value: int """
+        self._count = value
+
+    def index_changed(self, direction, index):
+        """
+        Register a new index for a direction and schedule reading of the
+        slices the user is likely to visit next.
+
+        :type direction: dict
+        :type index: int
+        """
+        name = direction['name']
+        history = self._history.setdefault(name, deque(maxlen=self._history_length))
+        history.append((time.time(), index))
+
+        targets = self._predict(direction, history)
+
+        with self._lock:
+            generation = self._generations.get(name, 0) + 1
+            self._generations[name] = generation
+
+        if targets:
+            submit(self._prefetch, direction, targets, generation)
+
+    def cancel(self):
+        """Drop all scheduled reads and forget the scroll history."""
+        with self._lock:
+            for name in self._generations:
+                self._generations[name] += 1
+        self._history.clear()
+
+    def _predict(self, direction, history):
+        if self._count <= 0 or len(history) < 2:
+            return []
+
+        times, indexes = zip(*history)
+        deltas = [b - a for a, b in zip(indexes, indexes[1:]) if b != a]
+
+        if not deltas:
+            return []
+
+        # the most recent movement decides the direction, the typical step
+        # size decides the stride
+        sign = 1 if deltas[-1] > 0 else -1
+        stride = sorted(abs(d) for d in deltas)[len(deltas) // 2]
+
+        count = self._count
+        interval = (times[-1] - times[0]) / (len(times) - 1)
+        if interval < self.FAST_INTERVAL:
+            count *= 2
+
+        last = len(self._slice_data_source.indexes_for_direction(direction)) - 1
+        index = indexes[-1]
+        targets = [index + sign * stride * step for step in range(1, count + 1)]
+        return [target for target in targets if 0 <= target <= last]
+
+    def _is_current(self, direction, generation):
+        with self._lock:
+            return self._generations.get(direction['name']) == generation
+
+    def _prefetch(self, direction, targets, generation):
+        for index in targets:
+            if not self._is_current(direction, generation):
+                return
+            self._slice_data_source.preload_slice(direction, index)
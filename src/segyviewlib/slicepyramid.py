@@ -0,0 +1,246 @@
+import os
+import struct
+
+import numpy as np
+import segyio
+
+from . import _sidecar
+from .slicemodel import SliceDirection
+
+
+def _block_mean(cube, factor):
+    """Average factor^3 blocks of cube, blocks at the edges may be smaller."""
+    result = cube
+    for axis in range(cube.ndim):
+        starts = np.arange(0, cube.shape[axis], factor)
+        counts = np.diff(np.append(starts, cube.shape[axis]))
+        shape = [1] * cube.ndim
+        shape[axis] = len(counts)
+        result = np.add.reduceat(result, starts, axis=axis) / counts.reshape(shape)
+    return result.astype(np.single)
+
+
+class SlicePyramid(object):
+    """
+    Level of detail overviews of a post-stack cube, averaged down by 2, 4 and
+    8 in every dimension and stored in one memory mapped file next to the
+    SEG-Y file. Every level is indexed (inline, crossline, sample).
+
+    A decimated slice is served from the coarsest level that still has at
+    least the requested resolution.
+    """
+
+    SUFFIX = ".pyramid.svc"
+    MAGIC = b"SVPY"
+    VERSION = 2
+
+    FACTORS = (2, 4, 8)
+
+    _SHAPE = struct.Struct("<III")
+    _DATA_OFFSET = 64
+
+    def __init__(self, path):
+        super(SlicePyramid, self).__init__()
+        self._path = path
+
+        with open(path, "rb") as f:
+            magic, version, self._signature = _sidecar.read_header(f)
+            shape = self._SHAPE.unpack(f.read(self._SHAPE.size))
+            self._fields = _sidecar.read_fields(f)
+
+        if magic != self.MAGIC or version != self.VERSION:
+            raise IOError("Not a slice pyramid: %s" % path)
+
+        self._shape = shape
+        self._levels = {}
+
+        offset = self._DATA_OFFSET
+        for factor, level_shape in self.level_shapes(shape):
+            self._levels[factor] = np.memmap(path, dtype=np.single, mode="r", offset=offset, shape=level_shape)
+            offset += int(np.prod(level_shape)) * 4
+
+    @classmethod
+    def level_shapes(cls, shape):
+        """ :rtype: list[(int, (int, int, int))] """
+        return [(factor, tuple((n + factor - 1) // factor for n in shape)) for factor in cls.FACTORS]
+
+    @property
+    def path(self):
+        """ :rtype: str """
+        return self._path
+
+    @property
+    def shape(self):
+        """ The shape of the full resolution cube, (inlines, crosslines, samples). """
+        return self._shape
+
+    @property
+    def signature(self):
+        """ :rtype: (int, float) """
+        return self._signature
+
+    @property
+    def fields(self):
+        """ The (iline, xline, endian) arguments the file was opened with. """
+        return self._fields
+
+    @property
+    def coarsest_factor(self):
+        """ :rtype: int """
+        return self.FACTORS[-1]
+
+    def level_for(self, step):
+        """
+        The largest level factor that is not coarser than the (y, x) step,
+        or 1 if the full resolution slice is needed.
+
+        :rtype: int
+        """
+        factor = 1
+        for candidate in self.FACTORS:
+            if candidate <= min(step):
+                factor = candidate
+        return factor
+
+    def read_slice(self, direction, index, step):
+        """
+        Read the slice at full resolution index, decimated by (y, x) step,
+        in the same orientation as SliceDataSource.read_slice. The step must
+        be a multiple of level_for(step) in both dimensions.
+
+        :rtype: numpy.ndarray
+        """
+        factor = self.level_for(step)
+        if factor == 1:
+            raise ValueError("No pyramid level for step %s" % (step,))
+
+        level = self._levels[factor]
+        index = index // factor
+
+        if direction == SliceDirection.inline:
+            data = level[index].T
+        elif direction == SliceDirection.crossline:
+            data = level[:, index, :].T
+        elif direction == SliceDirection.depth:
+            data = level[:, :, index].T
+        else:
+            raise ValueError("Unknown direction: %s" % direction)
+
+        y_step, x_step = step
+        return np.array(data[::y_step // factor, ::x_step // factor])
+
+    def close(self):
+        self._levels = {}
+
+    @classmethod
+    def open(cls, filename, source, directory=None, fields=None):
+        """
+        Open the pyramid for filename if it exists and is still valid for
+        the source file.
+
+        :type filename: str
+        :type source: segyio.SegyFile
+        :param fields: The (iline, xline, endian) arguments source was opened
+                       with, None for the defaults of segyio.open
+        :type fields: (int, int, str) | None
+        :rtype: SlicePyramid | None
+        """
+        path = _sidecar.sidecar_path(filename, cls.SUFFIX, directory)
+        fields = _sidecar.fields_for({}) if fields is None else tuple(fields)
+
+        try:
+            pyramid = cls(path)
+        except (IOError, OSError, ValueError, struct.error):
+            return None
+
+        expected_shape = (len(source.ilines), len(source.xlines), len(source.samples))
+        valid = (pyramid.signature == _sidecar.signature(filename) and pyramid.shape == expected_shape
+                 and pyramid.fields == fields)
+        if not valid:
+            pyramid.close()
+            return None
+
+        return pyramid
+
+    @classmethod
+    def build(cls, filename, source, directory=None, fields=None, progress=None):
+        """
+        Write the pyramid for filename in one pass over the file, replacing
+        any existing one.
+
+        :type filename: str
+        :type source: segyio.SegyFile
+        :param fields: The (iline, xline, endian) arguments source was opened
+                       with, None for the defaults of segyio.open
+        :type fields: (int, int, str) | None
+        :param progress: Called with the completed fraction while building
+        :type progress: callable | None
+        :rtype: SlicePyramid
+        """
+        path = _sidecar.sidecar_path(filename, cls.SUFFIX, directory)
+        fields = _sidecar.fields_for({}) if fields is None else tuple(fields)
+
+        with _sidecar.writing(path) as temporary:
+            shape = (len(source.ilines), len(source.xlines), len(source.samples))
+
+            level_shapes = cls.level_shapes(shape)
+            size = cls._DATA_OFFSET + sum(int(np.prod(level_shape)) * 4 for _, level_shape in level_shapes)
+
+            with open(temporary, "wb") as f:
+                _sidecar.write_header(f, cls.MAGIC, cls.VERSION, _sidecar.signature(filename))
+                f.write(cls._SHAPE.pack(*shape))
+                _sidecar.write_fields(f, fields)
+                f.truncate(size)
+
+            levels = {}
+            offset = cls._DATA_OFFSET
+            for factor, level_shape in level_shapes:
+                levels[factor] = np.memmap(temporary, dtype=np.single, mode="r+", offset=offset, shape=level_shape)
+                offset += int(np.prod(level_shape)) * 4
+
+            crossline_sorted = source.sorting == segyio.TraceSortingFormat.CROSSLINE_SORTING
+            if crossline_sorted:
+                lines, numbers = source.xline, source.xlines
+            else:
+                lines, numbers = source.iline, source.ilines
+
+            # slabs of the coarsest factor align with the blocks of every level
+            slab = cls.FACTORS[-1]
+            for start in range(0, len(numbers), slab):
+                stop = min(start + slab, len(numbers))
+                block = np.stack([lines[number] for number in numbers[start:stop]])
+
+                if crossline_sorted:
+                    block = block.transpose(1, 0, 2)
+
+                for factor, level in levels.items():
+                    lo, hi = start // factor, (stop + factor - 1) // factor
+                    if crossline_sorted:
+                        level[:, lo:hi, :] = _block_mean(block, factor)
+                    else:
+                        level[lo:hi, :, :] = _block_mean(block, factor)
+
+                if progress is not None:
+                    progress(float(stop) / len(numbers))
+
+            for level in levels.values():
+                level.flush()
+            del levels
+
+        return cls(path)
+
+    @classmethod
+    def open_or_build(cls, filename, source, directory=None, fields=None, progress=None):
+        """
+        The pyramid for filename, built if there is no valid one, or None
+        when it cannot be written.
+
+        :rtype: SlicePyramid | None
+        """
+        return _sidecar.open_or_build(cls, filename, source, directory, fields, progress)
+
+    @classmethod
+    def remove(cls, filename, directory=None):
+        path = _sidecar.sidecar_path(filename, cls.SUFFIX, directory)
+        if os.path.exists(path):
+            os.remove(path)
@@ -1,11 +1,16 @@
 from matplotlib import patches
 from matplotlib.ticker import FuncFormatter, AutoLocator
 from matplotlib.image import AxesImage
+from matplotlib.transforms import Bbox
 from .slicemodel import SliceModel, SliceDirection
 import numpy as np
 
 
 class SliceView(object):
+    WINDOW_MARGIN = 0.5
+    # pixels around the tick labels included in the interaction region
+    REGION_MARGIN = 4
+
     def __init__(self, axes, model, interpolation="nearest", aspect="auto"):
         super(SliceView, self).__init__()
         data = np.zeros((1, 1))
@@ -27,6 +32,9 @@ class SliceView(object):
 
         self._view_limits = None
 
+        self._rendered_image = None
+        self._rendered_key = None
+
         self._min_xlim = 0
         self._max_xlim = model.width
         self._min_ylim = 0
@@ -68,12 +76,203 @@ class SliceView(object):
 
         if model.data is not None:
             self._image.set_data(model.data)
+            self._image.set_extent((0, model.width, model.height, 0))
+
+    def required_step(self):
+        """
+        The largest power of two (y, x) decimation of the data that still
+        gives at least one sample per screen pixel for the visible part
+        of the slice.
+
+        :rtype: (int, int)
+        """
+        axes = self._image.axes
+        extent = axes.get_window_extent()
+
+        def step(limits, pixels):
+            if pixels <= 0:
+                return 1
+            samples_per_pixel = abs(limits[1] - limits[0]) / float(pixels)
+            result = 1
+            while result * 2 <= samples_per_pixel:
+                result *= 2
+            return result
+
+        return step(axes.get_ylim(), extent.height), step(axes.get_xlim(), extent.width)
+
+    def visible_region(self):
+        """
+        The (y0, y1, x0, x1) part of the slice that is visible in the axes,
+        in full resolution index coordinates.
+
+        :rtype: (int, int, int, int)
+        """
+        axes = self._image.axes
+        model = self._model
+        x_min, x_max = sorted(axes.get_xlim())
+        y_min, y_max = sorted(axes.get_ylim())
+
+        x0 = min(max(0, int(np.floor(x_min))), model.width)
+        x1 = min(max(x0, int(np.ceil(x_max))), model.width)
+        y0 = min(max(0, int(np.floor(y_min))), model.height)
+        y1 = min(max(y0, int(np.ceil(y_max))), model.height)
+        return y0, y1, x0, x1
+
+    def read_window(self, step):
+        """
+        The window to load for the visible region: the region widened by
+        WINDOW_MARGIN of its size on every side, so panning a bit does not
+        require a new read, and aligned to the (y, x) step. None when the
+        window would cover the entire slice.
+
+        :rtype: (int, int, int, int) | None
+        """
+        model = self._model
+        y0, y1, x0, x1 = self.visible_region()
+        y_step, x_step = step
+
+        def widen(lo, hi, size, step):
+            margin = int((hi - lo) * self.WINDOW_MARGIN)
+            lo = max(0, lo - margin) // step * step
+            hi = min(size, hi + margin)
+            return lo, hi
+
+        y0, y1 = widen(y0, y1, model.height, y_step)
+        x0, x1 = widen(x0, x1, model.width, x_step)
+
+        if (y0, y1, x0, x1) == (0, model.height, 0, model.width):
+            return None
+        return y0, y1, x0, x1
+
+    def _interactive_artists(self):
+        axes = self._image.axes
+        artists = [self._image, self._vertical_indicator, self._horizontal_indicator]
+        return artists + list(axes.spines.values()) + [axes.xaxis, axes.yaxis]
+
+    def set_animated(self, animated):
+        """
+        Animated artists are left out of a full draw of the figure, and
+        drawn on top of a saved background by draw_animated instead.
+
+        :type animated: bool
+        """
+        for artist in self._interactive_artists():
+            artist.set_animated(animated)
+
+    def draw_animated(self, image=True):
+        """ Draw the parts of the slice that change when panning or zooming. """
+        axes = self._image.axes
+        for artist in self._interactive_artists():
+            if image or artist is not self._image:
+                axes.draw_artist(artist)
+
+    def set_image_visible(self, visible):
+        """ :type visible: bool """
+        self._image.set_visible(visible)
+
+    def image_region(self):
+        """
+        The part of the loaded data that is visible in the axes, as a
+        (x, y, width, height) source rectangle in data samples and the
+        (x0, y0, x1, y1) display rectangle it covers, in pixels from the
+        lower left corner of the figure. None if nothing is visible.
+
+        :rtype: ((float, float, float, float), (float, float, float, float)) | None
+        """
+        model = self._model
+        if model.data is None:
+            return None
+
+        axes = self._image.axes
+        left, right, bottom, top = model.data_extent
+        x_min, x_max = sorted(axes.get_xlim())
+        y_min, y_max = sorted(axes.get_ylim())
+
+        x0, x1 = max(x_min, left), min(x_max, right)
+        y0, y1 = max(y_min, top), min(y_max, bottom)
+        if x0 >= x1 or y0 >= y1:
+            return None
+
+        rows, columns = model.data.shape
+        x_scale = columns / float(right - left)
+        y_scale = rows / float(bottom - top)
+        source = ((x0 - left) * x_scale, (y0 - top) * y_scale, (x1 - x0) * x_scale, (y1 - y0) * y_scale)
+
+        corners = axes.transData.transform([(x0, y0), (x1, y1)])
+        display = (corners[:, 0].min(), corners[:, 1].min(), corners[:, 0].max(), corners[:, 1].max())
+        return source, display
+
+    def rendered_image(self, renderer):
+        """
+        The loaded data colour mapped by renderer with the colormap and
+        limits of the image. The image is cached by the renderer for the
+        slice, step, decimation and window the data was read for.
+
+        :type renderer: segyviewlib.ImageRenderer
+        :rtype: QImage
+        """
+        model = self._model
+        data = model.data
+        vmin, vmax = self._image.get_clim()
+        colormap = self._image.get_cmap().name
+
+        rendered = self._rendered_key
+        if rendered is not None and rendered[0] == model.data_version and rendered[1:] == (colormap, vmin, vmax):
+            return self._rendered_image
+
+        key = (model.index_direction['name'], model.data_index, model.data_step, model.data_decimation,
+               model.data_window)
+        self._rendered_image = renderer.render(data, colormap, vmin, vmax, key)
+        self._rendered_key = (model.data_version, colormap, vmin, vmax)
+        return self._rendered_image
+
+    def indicator_extents(self):
+        """
+        The display rectangles, (x0, y0, x1, y1), of the visible index
+        indicators.
+
+        :rtype: list[(float, float, float, float)]
+        """
+        extents = []
+        for indicator in (self._vertical_indicator, self._horizontal_indicator):
+            if indicator.get_visible():
+                extent = indicator.get_window_extent()
+                extents.append((extent.x0, extent.y0, extent.x1, extent.y1))
+        return extents
+
+    def interaction_region(self, renderer):
+        """
+        The display box of the axes including the tick labels, which is all
+        that is redrawn while the view is panned or zoomed.
+
+        :type renderer: matplotlib.backend_bases.RendererBase
+        :rtype: matplotlib.transforms.Bbox
+        """
+        axes = self._image.axes
+        region = axes.get_tightbbox(renderer).padded(self.REGION_MARGIN)
+        return Bbox.intersection(region, axes.figure.bbox) or axes.figure.bbox
+
+    def axes_extent(self):
+        """ :rtype: (float, float, float, float) """
+        extent = self._image.axes.bbox
+        return extent.x0, extent.y0, extent.x1, extent.y1
 
     def data_changed(self, context):
         """ :type context: dict """
         model = self._model
+        axes = self._image.axes
+
+        if model.data is None:
+            return
+
+        # a windowed extent must not move the axes limits
+        xlim, ylim = axes.get_xlim(), axes.get_ylim()
         self._image.set_data(model.data)
-        self._image.set_extent((0, model.width, model.height, 0))
+        self._image.set_extent(model.data_extent)
+
+        if model.data_window is not None:
+            axes.set_xlim(xlim)
+            axes.set_ylim(ylim)
 
     def context_changed(self, context):
         """ :type context: dict """
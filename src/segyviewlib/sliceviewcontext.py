@@ -1,7 +1,8 @@
 from PyQt4.QtCore import QObject
 from PyQt4.QtCore import pyqtSignal
 
-from segyviewlib import SliceModel, SliceDataSource, SliceDirection
+from segyviewlib import SliceModel, SliceDataSource, SliceDirection, AsyncSliceLoader, CubeStatistics
+from segyviewlib import TraceSampler
 
 
 class ViewLimit(object):
@@ -48,9 +49,10 @@ class SliceViewContext(QObject):
     context_changed = pyqtSignal()
     data_changed = pyqtSignal(object)
     data_source_changed = pyqtSignal()
+    statistics_changed = pyqtSignal()
 
     def __init__(self, slice_models=[], slice_data_source=None, colormap='seismic', interpolation='nearest',
-                 image_size=None, has_data=True):
+                 image_size=None, has_data=True, asynchronous=False, statistics=False):
         QObject.__init__(self)
 
         self._available_slice_models = slice_models
@@ -75,12 +77,31 @@ class SliceViewContext(QObject):
         self._has_data = has_data
         self._view_limits = {}
 
+        self._asynchronous = asynchronous
+        self._slice_loader = AsyncSliceLoader(self._slice_data_source, self)
+        self._slice_loader.slice_loaded.connect(self._slice_loaded)
+
+        self._compute_statistics = statistics
+        self._cube_statistics = None
+        """ :type: CubeStatistics """
+        self._statistics = None
+        self._statistics_progress = None
+        self._statistics_error = None
+
+        self._clip_percentile = None
+        self._trace_sampler = None
+        """ :type: TraceSampler """
+        self._trace_sample = None
+
         if self._has_data:
             self._assign_indexes()
 
             for model in self._available_slice_models:
                 self._view_limits[model.index_direction['name']] = ViewLimit(model)
 
+            if self._compute_statistics:
+                self.compute_statistics()
+
     @property
     def models(self):
         """ :rtype: list[SliceModel]"""
@@ -130,6 +151,57 @@ class SliceViewContext(QObject):
         """ :rtype: None | Tuple(float, float, int) """
         return self._image_size
 
+    @property
+    def asynchronous(self):
+        """ :rtype: bool """
+        return self._asynchronous
+
+    @asynchronous.setter
+    def asynchronous(self, value):
+        """
+        When asynchronous, load_data reads slices that are not cached on the
+        worker pool and emits data_changed for every model as it arrives.
+
+        :type value: bool
+        """
+        self._asynchronous = value
+        if not value:
+            self._slice_loader.cancel()
+
+    @property
+    def statistics(self):
+        """ :rtype: segyviewlib.StreamingStatistics | None """
+        return self._statistics
+
+    @property
+    def statistics_progress(self):
+        """
+        The completed fraction of the whole cube statistics, or None if they
+        are not being computed.
+
+        :rtype: float | None
+        """
+        return self._statistics_progress
+
+    @property
+    def statistics_error(self):
+        """
+        Why the whole cube statistics could not be computed, or None.
+
+        :rtype: Exception | None
+        """
+        return self._statistics_error
+
+    @property
+    def clip_percentile(self):
+        """
+        The percentage of samples kept inside the colour scale, or None to
+        scale by the minimum and maximum.
+
+        :rtype: float | None
+        """
+        return self._clip_percentile
+
     @property
     def has_data(self):
         return self._has_data
@@ -153,6 +225,54 @@ class SliceViewContext(QObject):
         self._symmetric_scale = symmetric
         self.context_changed.emit()
 
+    def set_clip_percentile(self, percent):
+        """
+        Clip the colour scale to the range holding the central percent of
+        the samples, e.g. 98 or 99.5, estimated from a sample of traces read
+        once in the background. None scales by the minimum and maximum.
+
+        :type percent: float | None
+        """
+        self._clip_percentile = percent
+
+        if percent is not None and self._trace_sampler is None:
+            self._sample_traces()
+
+        self.context_changed.emit()
+
+    def _sample_traces(self):
+        self._cancel_trace_sample()
+
+        if not self._has_data or self._slice_data_source.file_size == 0:
+            return
+
+        data_source = self._slice_data_source
+        self._trace_sampler = TraceSampler(data_source.source_filename, data_source.segyio_args, parent=self)
+        self._trace_sampler.finished.connect(self._trace_sample_finished)
+        self._trace_sampler.start()
+
+    def _cancel_trace_sample(self):
+        if self._trace_sampler is not None:
+            self._trace_sampler.cancel()
+            self._trace_sampler.finished.disconnect(self._trace_sample_finished)
+            self._trace_sampler = None
+
+        self._trace_sample = None
+
+    def _trace_sample_finished(self, trace_sample):
+        if self.sender() is not self._trace_sampler:
+            return
+
+        self._trace_sample = trace_sample
+        if self._clip_percentile is not None:
+            self.context_changed.emit()
+
+    def _scale_range(self):
+        if self._clip_percentile is not None and self._trace_sample is not None and self._trace_sample.size > 0:
+            return self._trace_sample.clip_range(self._clip_percentile)
+
+        return self._global_min, self._global_max
+
     def set_interpolation(self, interpolation_name):
         self._interpolation = str(interpolation_name)
         self.context_changed.emit()
@@ -203,24 +323,96 @@ class SliceViewContext(QObject):
 
         self._image_size = (width, height, dpi)
 
+    def compute_statistics(self):
+        """
+        Compute statistics for the whole cube in the background. Once they
+        are available the global minimum and maximum come from the
+        statistics, instead of from the slices that happen to have been
+        viewed, so the colour scale does not change while navigating.
+        """
+        self._cancel_statistics()
+
+        if not self._has_data or self._slice_data_source.file_size == 0:
+            return
+
+        data_source = self._slice_data_source
+        self._statistics_progress = 0.0
+        self._cube_statistics = CubeStatistics(data_source.source_filename, data_source.segyio_args, self)
+        self._cube_statistics.progress_changed.connect(self._statistics_progress_changed)
+        self._cube_statistics.finished.connect(self._statistics_finished)
+        self._cube_statistics.failed.connect(self._statistics_failed)
+        self._cube_statistics.start()
+
+    def _cancel_statistics(self):
+        if self._cube_statistics is not None:
+            self._cube_statistics.cancel()
+            self._cube_statistics.progress_changed.disconnect(self._statistics_progress_changed)
+            self._cube_statistics.finished.disconnect(self._statistics_finished)
+            self._cube_statistics.failed.disconnect(self._statistics_failed)
+            self._cube_statistics = None
+
+        self._statistics = None
+        self._statistics_progress = None
+        self._statistics_error = None
+
+    def _statistics_progress_changed(self, progress):
+        if self.sender() is not self._cube_statistics:
+            return
+
+        self._statistics_progress = progress
+        self.statistics_changed.emit()
+
+    def _statistics_finished(self, statistics):
+        if self.sender() is not self._cube_statistics:
+            return
+
+        # without a single finite sample the scale comes from the viewed slices
+        if statistics.count == 0:
+            self._statistics_progress = None
+            self.statistics_changed.emit()
+            return
+
+        self._statistics = statistics
+        self._statistics_progress = 1.0
+        self._global_min = statistics.minimum
+        self._global_max = statistics.maximum
+        self.statistics_changed.emit()
+        self.context_changed.emit()
+
+    def _statistics_failed(self, error):
+        if self.sender() is not self._cube_statistics:
+            return
+
+        self._statistics_progress = None
+        self._statistics_error = error
+        self.statistics_changed.emit()
+
     def create_context(self, assigned_slice_models):
         view_min = None
         view_max = None
 
         for model in assigned_slice_models:
+            # asynchronously loaded models may not have data yet
+            if model.data is None:
+                continue
+
             view_min = model.min_value if view_min is None else min(model.min_value, view_min)
             view_max = model.max_value if view_max is None else max(model.max_value, view_max)
-            self._global_min = view_min if self._global_min is None else min(self._global_min, view_min)
-            self._global_max = view_max if self._global_max is None else max(self._global_max, view_max)
 
-        vmin = self._global_min if self._user_min_value is None else self._user_min_value
-        vmax = self._global_max if self._user_max_value is None else self._user_max_value
-        if self._symmetric_scale and vmin <= 0.0 <= vmax:
-            vmax = max(abs(vmin), vmax)
-            vmin = -vmax
+            if self._statistics is None:
+                self._global_min = view_min if self._global_min is None else min(self._global_min, view_min)
+                self._global_max = view_max if self._global_max is None else max(self._global_max, view_max)
 
-        if vmax < vmin:
-            vmax = vmin
+        scale_min, scale_max = self._scale_range()
+        vmin = scale_min if self._user_min_value is None else self._user_min_value
+        vmax = scale_max if self._user_max_value is None else self._user_max_value
+        if vmin is not None and vmax is not None:
+            if self._symmetric_scale and vmin <= 0.0 <= vmax:
+                vmax = max(abs(vmin), vmax)
+                vmin = -vmax
+
+            if vmax < vmin:
+                vmax = vmin
 
         return {
             "colormap": self.colormap,
@@ -237,12 +429,26 @@ class SliceViewContext(QObject):
         }
 
     def _assign_indexes(self):
+        # start out with the coarsest overview the data source can offer,
+        # the views ask for the resolution they need once they are laid out
+        overview_step = self._slice_data_source.overview_step
+
         for m in self._available_slice_models:
+            m.resolution_step = overview_step
             m.indexes = list(self._slice_data_source.indexes_for_direction(m.index_direction))
             m.x_indexes = list(self._slice_data_source.indexes_for_direction(m.x_index_direction))
             m.y_indexes = list(self._slice_data_source.indexes_for_direction(m.y_index_direction))
-            data = self._slice_data_source.read_slice(m.index_direction, m.index)
-            m.data = data
+
+            # when asynchronous, slices that are not cached are left to
+            # load_data, and every slice is shown as soon as it is read
+            cached = self._slice_data_source.is_cached(m.index_direction, m.index, m.resolution_step)
+            if self._asynchronous and not cached:
+                m.dirty = True
+                continue
+
+            decimation = self._slice_data_source.decimation(m.resolution_step)
+            data = self._slice_data_source.read_slice(m.index_direction, m.index, m.resolution_step, m.window)
+            m.set_data(data, m.resolution_step, m.window, decimation)
 
     def update_index_for_direction(self, index_direction, index):
         """
@@ -266,16 +472,38 @@ class SliceViewContext(QObject):
             if m.y_index_direction == index_direction:
                 m.y_index = index
 
+        model = self.model_for_direction(index_direction)
+        if self._has_data and model is not None and model.visible:
+            self._slice_data_source.prefetch(index_direction, index)
+
         self.load_data()
 
     def load_data(self):
         if self._has_data:
             for m in [sm for sm in self._available_slice_models if sm.dirty and sm.visible]:
                 # print("loading data for %s" % m.title)
-                m.data = self._slice_data_source.read_slice(m.index_direction, m.index)
+                cached = self._slice_data_source.is_cached(m.index_direction, m.index, m.resolution_step)
+                if self._asynchronous and not cached:
+                    self._slice_loader.request(m)
+                else:
+                    step, window = m.resolution_step, m.window
+                    decimation = self._slice_data_source.decimation(step)
+                    data = self._slice_data_source.read_slice(m.index_direction, m.index, step, window)
+                    m.set_data(data, step, window, decimation)
         self.data_changed.emit(self._available_slice_models)
 
+    def _slice_loaded(self, model, request, data, decimation):
+        index, step, window = request
+        if (model.index, model.resolution_step, model.window) != request:
+            return
+
+        model.set_data(data, step, window, decimation)
+        self.data_changed.emit([model])
+
     def _reset(self):
+        self._slice_loader.cancel()
+        self._cancel_statistics()
+        self._cancel_trace_sample()
         self._global_max = None
         self._global_min = None
 
@@ -283,6 +511,13 @@ class SliceViewContext(QObject):
             model.reset()
 
         self._assign_indexes()
+
+        if self._compute_statistics:
+            self.compute_statistics()
+
+        if self._clip_percentile is not None:
+            self._sample_traces()
+
         self.data_source_changed.emit()
 
     def slice_data_source(self):
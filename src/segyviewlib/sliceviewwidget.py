@@ -1,12 +1,15 @@
-from PyQt4.QtCore import QPoint
-from PyQt4.QtGui import QMenu, QAction
+from PyQt4.QtCore import QPoint, QTimer, QRectF, Qt
+from PyQt4.QtGui import QMenu, QAction, QPainter, QPen
 from math import copysign
 
-from segyviewlib import SliceView, LayoutCanvas, SliceModel
+from segyviewlib import SliceView, LayoutCanvas, SliceModel, FrameScheduler, ImageRenderer, MemoryBudget
 from matplotlib.cm import ScalarMappable
 
 
 class SliceViewWidget(LayoutCanvas):
+    # an interaction ends this long after the last pan or zoom event
+    INTERACTION_TIMEOUT = 250
+
     def __init__(self, context, width=11.7, height=8.3, dpi=100, parent=None):
         """ :type context: segyviewlib.SliceViewContext """
         super(SliceViewWidget, self).__init__(width, height, dpi, parent)
@@ -15,61 +18,305 @@ class SliceViewWidget(LayoutCanvas):
         """ :type: list[SliceModel] """
         self._slice_views = {}
         """ :type: dict[matplotlib.axes.Axes,SliceView] """
+        self._loading_data_region = False
+
+        self._interacting_view = None
+        """ :type: SliceView """
+        self._interaction_background = None
+        self._interaction_region = None
+        """ :type: matplotlib.transforms.Bbox """
+        self._interaction_timer = QTimer(self)
+        self._interaction_timer.setSingleShot(True)
+        self._interaction_timer.setInterval(self.INTERACTION_TIMEOUT)
+        self._interaction_timer.timeout.connect(self._end_interaction)
+
+        # scroll and drag events are merged into one update per frame
+        self._frame_scheduler = FrameScheduler(parent=self)
+
+        self._direct_rendering = False
+        self._image_renderer = ImageRenderer()
+        self._image_renderer.cache.distance = self._rendered_distance
 
         self._colormappable = ScalarMappable(cmap=context.colormap)
         self._colormappable.set_array([])
+        self._colorbar = None
 
         self._context = context
         context.context_changed.connect(self._context_changed)
         context.data_changed.connect(self._data_changed)
-        context.data_source_changed.connect(self._layout_changed)
+        context.data_source_changed.connect(self._image_renderer.clear)
+        context.data_source_changed.connect(self._data_source_changed)
 
         self.layout_changed.connect(self._layout_changed)
         self.subplot_pressed.connect(self._subplot_clicked)
+        self.subplot_released.connect(self._subplot_released)
         self.subplot_scrolled.connect(self._subplot_scrolled)
         self.subplot_motion.connect(self._subplot_motion)
 
+    @property
+    def frame_rate(self):
+        """ The maximum number of index, pan and zoom updates per second. """
+        return self._frame_scheduler.frame_rate
+
+    @frame_rate.setter
+    def frame_rate(self, value):
+        self._frame_scheduler.frame_rate = value
+
+    @property
+    def direct_rendering(self):
+        """
+        When enabled, slices are colour mapped into QImages and painted
+        directly on the canvas; matplotlib only draws the axes, ticks and
+        colorbar. Saved figures are always rendered by matplotlib.
+
+        :rtype: bool
+        """
+        return self._direct_rendering
+
+    @direct_rendering.setter
+    def direct_rendering(self, value):
+        self._direct_rendering = value
+        self._context_changed()
+
+    def draw(self):
+        if not self._direct_rendering:
+            super(SliceViewWidget, self).draw()
+            return
+
+        for slice_view in self._slice_views.values():
+            slice_view.set_image_visible(False)
+        try:
+            super(SliceViewWidget, self).draw()
+        finally:
+            for slice_view in self._slice_views.values():
+                slice_view.set_image_visible(True)
+
+    def paintEvent(self, event):
+        super(SliceViewWidget, self).paintEvent(event)
+
+        if not self._direct_rendering:
+            return
+
+        ratio = float(getattr(self, '_dpi_ratio', 1))
+        height = self.figure.bbox.height
+
+        def to_widget(extent):
+            x0, y0, x1, y1 = extent
+            return QRectF(x0 / ratio, (height - y1) / ratio, (x1 - x0) / ratio, (y1 - y0) / ratio)
+
+        smooth = self._context.interpolation != 'nearest'
+        indicator_pen = QPen(Qt.black, 0.75, Qt.DotLine)
+
+        painter = QPainter(self)
+        for slice_view in self._slice_views.values():
+            region = slice_view.image_region()
+            if region is None:
+                continue
+
+            source, display = region
+            painter.setClipRect(to_widget(slice_view.axes_extent()))
+            painter.setRenderHint(QPainter.SmoothPixmapTransform, smooth)
+            painter.drawImage(to_widget(display), slice_view.rendered_image(self._image_renderer), QRectF(*source))
+
+            # the indicators are drawn by matplotlib beneath the image
+            painter.setPen(indicator_pen)
+            for extent in slice_view.indicator_extents():
+                painter.drawRect(to_widget(extent))
+
+        painter.end()
+
     def _create_context(self):
         return self._context.create_context(self._assigned_slice_models)
 
-    def _layout_changed(self):
+    def _layout_changed(self, rebuild=False):
+        """
+        Assign the slice views to the axes of the current layout. Views of
+        axes that kept their model are reused with their artists and data,
+        and only models without loaded data are read.
+
+        :param rebuild: Recreate every view, e.g. for a new data source
+        :type rebuild: bool
+        """
+        self._frame_scheduler.cancel()
+        self._end_interaction(redraw=False)
+
         fig = self.layout_figure()
         axes = fig.layout_axes()
-        self._slice_views.clear()
+
+        previous_views = {} if rebuild else self._slice_views
+        self._slice_views = {}
 
         for model in self._context.models:
             model.visible = False
 
+        created = []
         for index, ax in enumerate(axes):
-            ax.clear()
-            if index < len(self._assigned_slice_models):
-                model = self._assigned_slice_models[index]
-                model.visible = True
+            view = previous_views.get(ax)
+            model = self._assigned_slice_models[index] if index < len(self._assigned_slice_models) else None
+
+            if model is None:
+                if view is not None or rebuild:
+                    ax.clear()
+                continue
+
+            model.visible = True
+            if view is not None and view.model() is model:
+                self._slice_views[ax] = view
+            else:
+                ax.clear()
                 self._slice_views[ax] = SliceView(ax, model)
                 self._slice_views[ax].create_slice(self._create_context())
+                created.append(self._slice_views[ax])
+
+        if self._colorbar is None or self._colorbar.ax is not fig.colormap_axes():
+            self._colorbar = fig.colorbar(self._colormappable, cax=fig.colormap_axes(), use_gridspec=True)
+            self._colorbar.ax.tick_params(labelsize=9)
+
+        self._update_data_region(load=False)
+
+        visible = [m for m in self._context.models if m.visible]
+        if any(m.dirty or m.data is None for m in visible):
+            self._context.load_data()
+            self._data_changed()
+        else:
+            context = self._create_context()
+            for view in created:
+                view.data_changed(context)
+            self._context_changed()
+
+    def _data_source_changed(self):
+        self._layout_changed(rebuild=True)
+
+    def _update_data_region(self, load=True):
+        """
+        Request the decimation and window of every visible model that
+        matches its axes on screen, and reload the models that need other
+        data. Returns True when data was reloaded.
+
+        :rtype: bool
+        """
+        steps = {}
+        for slice_view in self._slice_views.values():
+            model = slice_view.model()
+            step = slice_view.required_step()
+            if model in steps:
+                step = tuple(min(a, b) for a, b in zip(step, steps[model]))
+            steps[model] = step
+
+        views = {}
+        for slice_view in self._slice_views.values():
+            views.setdefault(slice_view.model(), []).append(slice_view)
 
-        colormap_axes = self.layout_figure().colormap_axes()
-        colorbar = self.layout_figure().colorbar(self._colormappable, cax=colormap_axes, use_gridspec=True)
-        colorbar.ax.tick_params(labelsize=9)
+        requested = dict((model, (model.resolution_step, model.window)) for model in steps)
 
-        self._context.load_data()
-        self._data_changed()
+        for model, step in steps.items():
+            model.resolution_step = step
 
-    def _data_changed(self):
+            # a model shown in several axes is loaded entirely
+            if len(views[model]) > 1:
+                model.window = None
+            elif not model.covers(views[model][0].visible_region()) or model.dirty:
+                model.window = views[model][0].read_window(step)
+
+        changed = [m for m in steps if m.dirty and (m.resolution_step, m.window) != requested[m]]
+
+        if not load or not changed or self._loading_data_region:
+            return False
+
+        self._loading_data_region = True
+        try:
+            self._context.load_data()
+        finally:
+            self._loading_data_region = False
+        return True
+
+    def resizeEvent(self, event):
+        self._end_interaction(redraw=False)
+        super(SliceViewWidget, self).resizeEvent(event)
+        self._update_data_region()
+
+    def showEvent(self, event):
+        self._image_renderer.cache.priority = MemoryBudget.ON_SCREEN
+        super(SliceViewWidget, self).showEvent(event)
+
+    def hideEvent(self, event):
+        # the images of hidden views, e.g. in background tabs, are evicted first
+        self._image_renderer.cache.priority = MemoryBudget.OFF_SCREEN
+        super(SliceViewWidget, self).hideEvent(event)
+
+    def _rendered_distance(self, key):
+        # rendered images are keyed by
+        # ((direction name, index, step, decimation, window), colormap, vmin, vmax)
+        name, index = key[0][:2]
+        for model in self._context.models:
+            if model.index_direction['name'] == name:
+                return abs(index - model.index)
+        return 0
+
+    def _data_changed(self, models=None):
         context = self._create_context()
         for slice_view in self._slice_views.values():
-            slice_view.data_changed(context)
+            if models is None or slice_view.model() in models:
+                slice_view.data_changed(context)
         self._context_changed()
 
     def _context_changed(self):
+        self._end_interaction(redraw=False)
+
         ctx = self._create_context()
         for slice_view in self._slice_views.values():
             slice_view.context_changed(ctx)
 
+        # view limits, zoom and pan may need data that is not loaded, the
+        # reload redraws everything
+        if self._update_data_region():
+            return
+
         self._colormappable.set_cmap(ctx['colormap'])
         self._colormappable.set_clim(ctx['min'], ctx['max'])
         self.draw()
 
+    def _view_moved(self, slice_view):
+        """
+        Redraw a slice view after a pan or zoom. While the interaction lasts
+        only the image, indicators and axes of that view are drawn, on top
+        of a saved background of the rest of the figure; everything is
+        redrawn when the interaction ends. Only the region of the view, its
+        axes and tick labels, is copied to the screen.
+
+        :type slice_view: SliceView
+        """
+        if self._update_data_region():
+            return
+
+        if self._interacting_view is not slice_view:
+            self._end_interaction(redraw=False)
+            slice_view.set_animated(True)
+            self.draw()
+            self._interaction_region = slice_view.interaction_region(self.get_renderer())
+            self._interaction_background = self.copy_from_bbox(self._interaction_region)
+            self._interacting_view = slice_view
+
+        self.restore_region(self._interaction_background)
+        slice_view.draw_animated(image=not self._direct_rendering)
+        self.blit(self._interaction_region)
+
+        self._interaction_timer.start()
+
+    def _end_interaction(self, redraw=True):
+        self._interaction_timer.stop()
+
+        if self._interacting_view is None:
+            return
+
+        self._interacting_view.set_animated(False)
+        self._interacting_view = None
+        self._interaction_background = None
+        self._interaction_region = None
+
+        if redraw:
+            self._context_changed()
+
     def _create_slice_view_context_menu(self, subplot_index):
         context_menu = QMenu("Slice Model Reassignment Menu", self)
 
@@ -111,10 +358,16 @@ class SliceViewWidget(LayoutCanvas):
             step = copysign(step, event['step'])
 
             slice_model = self._get_slice_view(event).model()
-            index = int(slice_model.index + step)
+            direction = slice_model.index_direction
+
+            # steps taken within a frame add up
+            key = ('index', direction['name'])
+            pending = self._frame_scheduler.pending_args(key)
+            current = slice_model.index if pending is None else pending[1]
+            index = int(current + step)
 
             if 0 <= index < len(slice_model):
-                self._context.update_index_for_direction(slice_model.index_direction, index)
+                self._frame_scheduler.schedule(key, self._context.update_index_for_direction, direction, index)
 
         elif keys.state(ctrl=True) or keys.state(shift=True):
             x = event['x']
@@ -124,8 +377,16 @@ class SliceViewWidget(LayoutCanvas):
 
             slice_view = self._get_slice_view(event)
 
-            if slice_view.zoom(x, y, step):
-                self._context_changed()
+            key = ('zoom', slice_view)
+            pending = self._frame_scheduler.pending_args(key)
+            if pending is not None:
+                step += pending[3]
+
+            self._frame_scheduler.schedule(key, self._zoom, slice_view, x, y, step)
+
+    def _zoom(self, slice_view, x, y, step):
+        if slice_view.zoom(x, y, step):
+            self._view_moved(slice_view)
 
     def _get_slice_view(self, event):
         subplot_index = event['subplot_index']
@@ -141,6 +402,15 @@ class SliceViewWidget(LayoutCanvas):
             dy = event['dy']
 
             if dx is not None and dy is not None:
+                # dx and dy are relative to the last applied pan, so the
+                # latest event of a frame holds the whole movement
                 slice_view = self._get_slice_view(event)
-                slice_view.pan(dx, dy)
-                self._context_changed()
+                self._frame_scheduler.schedule(('pan', slice_view), self._pan, slice_view, dx, dy)
+
+    def _pan(self, slice_view, dx, dy):
+        slice_view.pan(dx, dy)
+        self._view_moved(slice_view)
+
+    def _subplot_released(self, event):
+        self._frame_scheduler.flush()
+        self._end_interaction()
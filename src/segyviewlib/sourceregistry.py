@@ -0,0 +1,234 @@
+import os
+from threading import Lock, RLock
+
+from . import _sidecar
+from .memorybudget import MemoryBudget, MemoryAccount
+from .slicecache import SliceCache
+
+
+class SharedSource(object):
+    """
+    An opened file with the slice cache and read lock of everyone viewing
+    it. The cache is as large as the largest budget asked for by any of
+    the holders, has the highest priority of theirs, and a slice is as
+    near the viewed slices as it is to those of the nearest holder. A cube
+    loaded into memory is loaded once and shared by all holders.
+    """
+
+    def __init__(self, key, opened):
+        super(SharedSource, self).__init__()
+        self._key = key
+        self._opened = opened
+        self._cache = SliceCache(0)
+        self._lock = RLock()
+        self._budgets = {}
+        self._references = 0
+        self._closed = False
+
+        self._cube = None
+        self._cube_account = None
+        self._cube_loading = False
+        self._cube_listeners = []
+
+    @property
+    def key(self):
+        return self._key
+
+    @property
+    def opened(self):
+        """ The object returned by the open function given to SourceRegistry.acquire. """
+        return self._opened
+
+    @property
+    def cache(self):
+        """ :rtype: SliceCache """
+        return self._cache
+
+    @property
+    def lock(self):
+        """ :rtype: threading.RLock """
+        return self._lock
+
+    @property
+    def references(self):
+        """ :rtype: int """
+        return self._references
+
+    @property
+    def closed(self):
+        """ Whether the last holder has released the source. """
+        return self._closed
+
+    @property
+    def cube(self):
+        """
+        The cube in memory, None until loaded and once evicted by the
+        MemoryBudget.
+
+        :rtype: segyviewlib.inmemorycube.InMemoryCube | None
+        """
+        return self._cube
+
+    def request_cube(self, listener):
+        """
+        Ask for the cube of the file in memory. listener is called with it
+        once it is loaded, right away if it already is, and with None if
+        loading is cancelled.
+
+        :type listener: callable
+        :rtype: bool
+        :return: Whether the caller is the first to ask, and should load the
+                 cube and hand it over with set_cube
+        """
+        with self._lock:
+            cube = self._cube
+            if cube is None:
+                self._cube_listeners.append(listener)
+                first = not self._cube_loading
+                self._cube_loading = True
+                return first
+
+        listener(cube)
+        return False
+
+    def set_cube(self, cube):
+        """ :type cube: segyviewlib.inmemorycube.InMemoryCube | None """
+        with self._lock:
+            self._cube = cube
+            self._cube_loading = False
+            listeners, self._cube_listeners = self._cube_listeners, []
+
+            if cube is not None and not self._closed:
+                self._cube_account = MemoryAccount(cube.nbytes, self._evict_cube, self._cache.priority)
+
+        for listener in listeners:
+            listener(cube)
+
+    def _evict_cube(self):
+        # called by the memory budget, must not wait for the lock
+        self._cube = None
+
+    def set_budget(self, holder, max_bytes, priority=MemoryBudget.ON_SCREEN, distance=None):
+        """
+        :type max_bytes: int
+        :param priority: The MemoryBudget priority of the holder
+        :type priority: int
+        :param distance: The SliceCache distance function of the holder
+        :type distance: callable | None
+        """
+        self._budgets[holder] = (max_bytes, priority, distance)
+        self._update_budget()
+
+    def _update_budget(self):
+        budgets = list(self._budgets.values())
+        distances = [distance for _, _, distance in budgets if distance is not None]
+
+        def nearest(key):
+            return min(distance(key) for distance in distances)
+
+        self._cache.max_bytes = max(max_bytes for max_bytes, _, _ in budgets) if budgets else 0
+        self._cache.priority = max(priority for _, priority, _ in budgets) if budgets else MemoryBudget.OFF_SCREEN
+        self._cache.distance = nearest if distances else None
+
+        if self._cube_account is not None:
+            self._cube_account.priority = self._cache.priority
+
+
+class SourceRegistry(object):
+    """
+    Opened files by canonical path, segyio arguments and options, so
+    viewers of the same file share one memory map and one slice cache.
+    Files are closed when the last reference is released, and a file that
+    has changed on disk is opened anew.
+    """
+
+    def __init__(self):
+        super(SourceRegistry, self).__init__()
+        self._sources = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def key(filename, segyio_args, options=()):
+        """
+        :type filename: str
+        :type segyio_args: dict
+        :param options: Anything else the opened object depends on
+        :type options: tuple
+        """
+        path = os.path.realpath(filename)
+        return path, _sidecar.signature(path), tuple(sorted(segyio_args.items())), tuple(options)
+
+    def acquire(self, key, open_fn):
+        """
+        Reference the source for key, calling open_fn to open it if it is
+        not open already. open_fn is called without holding the registry
+        lock; the object it returns must have a close method.
+
+        :rtype: SharedSource
+        """
+        with self._lock:
+            shared = self._sources.get(key)
+            if shared is not None:
+                shared._references += 1
+                return shared
+
+        opened = open_fn()
+
+        with self._lock:
+            shared = self._sources.get(key)
+            if shared is None:
+                shared = SharedSource(key, opened)
+                self._sources[key] = shared
+                opened = None
+
+            shared._references += 1
+
+        # opened at the same time by someone else, who came first
+        if opened is not None:
+            opened.close()
+
+        return shared
+
+    def release(self, shared, holder=None):
+        """
+        Drop a reference, and the cache budget of holder. The file is
+        closed with the last reference.
+
+        :type shared: SharedSource
+        """
+        with self._lock:
+            shared._budgets.pop(holder, None)
+            shared._references -= 1
+
+            if shared._references > 0:
+                shared._update_budget()
+                return
+
+            if self._sources.get(shared.key) is shared:
+                del self._sources[shared.key]
+
+        with shared.lock:
+            shared._closed = True
+            shared._cube = None
+
+            if shared._cube_account is not None:
+                shared._cube_account.bytes = 0
+                shared._cube_account = None
+            shared.cache.clear()
+            shared.opened.close()
+
+    def __len__(self):
+        return len(self._sources)
+
+
+# created up front, sources are acquired from worker threads as well
+_registry = SourceRegistry()
+
+
+def source_registry():
+    """
+    The registry shared by all SliceDataSources in the process.
+
+    :rtype: SourceRegistry
+    """
+    return _registry
@@ -0,0 +1,95 @@
+import threading
+
+import numpy as np
+import segyio
+from PyQt4.QtCore import QObject, pyqtSignal
+
+from ._workerpool import submit
+
+
+class TraceSample(object):
+    """
+    The sorted, finite samples of a set of traces spread across a cube,
+    used to estimate percentiles of the whole cube cheaply.
+    """
+
+    def __init__(self, samples):
+        """ :type samples: numpy.ndarray """
+        super(TraceSample, self).__init__()
+        samples = np.asarray(samples, dtype=np.single).ravel()
+        self._samples = np.sort(samples[np.isfinite(samples)])
+
+    @property
+    def size(self):
+        """ :rtype: int """
+        return self._samples.size
+
+    def percentile(self, percent):
+        """
+        :type percent: float
+        :rtype: float
+        """
+        if self._samples.size == 0:
+            return None
+        return float(np.percentile(self._samples, percent))
+
+    def clip_range(self, percent):
+        """
+        The range holding the central percent of the samples, e.g. from the
+        1st to the 99th percentile for 98.
+
+        :type percent: float
+        :rtype: (float, float)
+        """
+        tail = (100.0 - percent) / 2.0
+        return self.percentile(tail), self.percentile(100.0 - tail)
+
+
+class TraceSampler(QObject):
+    """
+    Reads a sample of traces from a SEG-Y file on the worker pool, one trace
+    picked at random from each of count equally sized runs of traces, so the
+    sample is spread evenly across the cube.
+    """
+    finished = pyqtSignal(object)
+
+    DEFAULT_COUNT = 2000
+
+    def __init__(self, filename, segyioargs=None, count=DEFAULT_COUNT, parent=None):
+        QObject.__init__(self, parent)
+        self._filename = filename
+        self._segyioargs = dict(segyioargs or {})
+        self._count = count
+        self._cancelled = threading.Event()
+
+    def start(self):
+        self._cancelled.clear()
+        submit(self._run)
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @staticmethod
+    def trace_indexes(tracecount, count, seed=0):
+        """ :rtype: numpy.ndarray """
+        if tracecount <= count:
+            return np.arange(tracecount)
+
+        bounds = np.linspace(0, tracecount, count + 1).astype(np.int64)
+        offsets = np.random.RandomState(seed).random_sample(count)
+        return bounds[:-1] + (offsets * (bounds[1:] - bounds[:-1])).astype(np.int64)
+
+    def _run(self):
+        args = dict(self._segyioargs, ignore_geometry=True)
+
+        with segyio.open(self._filename, "r", **args) as f:
+            f.mmap()
+            traces = []
+
+            for index in self.trace_indexes(f.tracecount, self._count):
+                if self._cancelled.is_set():
+                    return
+                traces.append(f.trace.raw[int(index)])
+
+        if not self._cancelled.is_set():
+            self.finished.emit(TraceSample(np.concatenate(traces) if traces else []))
@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+import segyio
+
+from segyviewlib import StreamingStatistics, CubeStatistics, TraceSample, TraceSampler
+from .test_segyviewwidget import data_path
+
+
+class StreamingStatisticsTest(TestCase):
+    def test_chunked_statistics(self):
+        values = np.random.RandomState(0).normal(5.0, 2.0, 100000).astype(np.single)
+
+        statistics = StreamingStatistics()
+        for chunk in np.array_split(values, 17):
+            statistics.update(chunk)
+
+        self.assertEqual(statistics.count, values.size)
+        self.assertEqual(statistics.minimum, values.min())
+        self.assertEqual(statistics.maximum, values.max())
+        self.assertAlmostEqual(statistics.mean, values.mean(dtype=np.float64), places=6)
+        self.assertAlmostEqual(statistics.rms, np.sqrt(np.mean(values.astype(np.float64) ** 2)), places=6)
+
+        for percent in (1, 50, 99.5):
+            self.assertAlmostEqual(statistics.percentile(percent), np.percentile(values, percent), delta=0.02)
+
+    def test_non_finite_samples_are_ignored(self):
+        statistics = StreamingStatistics()
+        statistics.update(np.array([1.0, np.nan, np.inf, -np.inf, 3.0]))
+
+        self.assertEqual(statistics.count, 2)
+        self.assertEqual(statistics.minimum, 1.0)
+        self.assertEqual(statistics.maximum, 3.0)
+
+
+class TraceSampleTest(TestCase):
+    def test_clip_range(self):
+        sample = TraceSample(np.arange(1001, dtype=np.single) - 500)
+
+        self.assertEqual(sample.clip_range(100), (-500, 500))
+        self.assertEqual(sample.clip_range(98), (-490, 490))
+
+    def test_trace_indexes_are_spread(self):
+        indexes = TraceSampler.trace_indexes(10000, 100)
+
+        self.assertEqual(len(indexes), 100)
+        self.assertTrue(np.all(np.diff(indexes) > 0))
+        self.assertTrue(np.all(indexes // 100 == np.arange(100)))
+        np.testing.assert_array_equal(TraceSampler.trace_indexes(10, 100), np.arange(10))
+
+
+class CubeStatisticsTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "small.sgy")
+        shutil.copy(data_path("small.sgy"), self.filename)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_statistics_are_cached(self):
+        with segyio.open(self.filename) as f:
+            cube = segyio.tools.cube(f)
+
+        results = []
+        job = CubeStatistics(self.filename)
+        job.finished.connect(results.append)
+        job._run()
+
+        statistics = results[0]
+        self.assertEqual(statistics.count, cube.size)
+        self.assertAlmostEqual(statistics.minimum, cube.min())
+        self.assertAlmostEqual(statistics.maximum, cube.max())
+        self.assertTrue(os.path.exists(self.filename + CubeStatistics.SUFFIX))
+
+        cached = CubeStatistics.load(self.filename)
+        self.assertEqual(cached.count, statistics.count)
+        np.testing.assert_array_equal(cached.histogram, statistics.histogram)
+
+        with open(self.filename, "ab") as f:
+            f.write(b"\0")
+
+        self.assertIsNone(CubeStatistics.load(self.filename))
+
+    def test_unreadable_file(self):
+        # truncated in the middle of the traces
+        with open(self.filename, "r+b") as f:
+            f.truncate(os.path.getsize(self.filename) // 2)
+
+        results, errors = [], []
+        job = CubeStatistics(self.filename)
+        job.finished.connect(results.append)
+        job.failed.connect(errors.append)
+        job._run()
+
+        self.assertEqual(results, [])
+        self.assertEqual(len(errors), 1)
+        self.assertFalse(os.path.exists(self.filename + CubeStatistics.SUFFIX))
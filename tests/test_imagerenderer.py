@@ -0,0 +1,45 @@
+from unittest import TestCase
+
+import numpy as np
+from matplotlib.cm import ScalarMappable
+
+from segyviewlib import ImageRenderer
+
+
+class ImageRendererTest(TestCase):
+    def test_map_matches_colormap(self):
+        renderer = ImageRenderer()
+        data = np.array([[-2.0, -1.0, 0.0], [0.5, 1.0, np.nan]], dtype=np.single)
+
+        argb = renderer.map(data, 'seismic', -1.0, 1.0)
+        self.assertEqual(argb.shape, data.shape)
+
+        cmap = ScalarMappable(cmap='seismic').get_cmap()
+        lut = cmap(np.linspace(0.0, 1.0, ImageRenderer.LUT_SIZE), bytes=True).astype(np.uint32)
+
+        def pack(index):
+            r, g, b, a = lut[index]
+            return (a << 24) | (r << 16) | (g << 8) | b
+
+        self.assertEqual(argb[0, 0], pack(0))
+        self.assertEqual(argb[0, 1], pack(0))
+        self.assertEqual(argb[0, 2], pack(127))
+        self.assertEqual(argb[1, 1], pack(255))
+
+        # NaN is drawn with the bad colour of the colormap, transparent by default
+        r, g, b, a = cmap(np.nan, bytes=True)
+        self.assertEqual(argb[1, 2], (int(a) << 24) | (int(r) << 16) | (int(g) << 8) | int(b))
+        self.assertEqual(argb[1, 2] >> 24, 0)
+
+    def test_rendered_images_are_cached(self):
+        renderer = ImageRenderer()
+        data = np.linspace(-1.0, 1.0, 12, dtype=np.single).reshape(3, 4)
+        key = ('Inlines', 2, (1, 1), None)
+
+        renderer.render(data, 'seismic', -1.0, 1.0, key)
+        renderer.render(data, 'gray', -1.0, 1.0, key)
+        renderer.render(data, 'seismic', -1.0, 1.0, key)
+
+        self.assertEqual(renderer.cache.misses, 2)
+        self.assertEqual(renderer.cache.hits, 1)
+        self.assertEqual(len(renderer.cache), 2)
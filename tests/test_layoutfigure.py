@@ -0,0 +1,38 @@
+from unittest import TestCase
+
+import numpy as np
+
+from segyviewlib import LayoutFigure
+
+THREE_BOTTOM = {"dims": (2, 2), "grid": [(0, 0), (0, 1), (1, slice(0, 2))]}
+TWO_VERTICAL = {"dims": (1, 2), "grid": [(0, 0), (0, 1)]}
+SINGLE = {"dims": (1, 1), "grid": [(0, 0)]}
+
+
+def positions(figure):
+    return [axes.get_position().bounds for axes in figure.layout_axes() + [figure.colormap_axes()]]
+
+
+class LayoutFigureTest(TestCase):
+    def test_axes_are_reused(self):
+        figure = LayoutFigure()
+        figure.set_plot_layout(THREE_BOTTOM)
+        axes = figure.layout_axes()
+        colormap_axes = figure.colormap_axes()
+
+        for layout in [TWO_VERTICAL, SINGLE, THREE_BOTTOM]:
+            figure.set_plot_layout(layout)
+            count = len(layout["grid"])
+
+            # the axes that are still needed are kept, in the same order
+            self.assertEqual(figure.layout_axes()[:min(count, len(axes))], axes[:count])
+            self.assertIs(figure.colormap_axes(), colormap_axes)
+            self.assertEqual(len(figure.axes), count + 1)
+            self.assertIs(figure.current_layout(), layout)
+
+            # and placed as in a figure laid out from scratch
+            fresh = LayoutFigure()
+            fresh.set_plot_layout(layout)
+            np.testing.assert_allclose(positions(figure), positions(fresh))
+
+            axes = figure.layout_axes()
@@ -0,0 +1,102 @@
+from unittest import TestCase
+
+from segyviewlib import SliceCache, MemoryBudget, MemoryAccount
+import numpy as np
+
+
+class SliceCacheTest(TestCase):
+    def test_hits_and_misses(self):
+        cache = SliceCache(max_bytes=1024)
+        data = np.zeros((4, 4), dtype=np.single)
+
+        self.assertIsNone(cache.get(("Inlines", 0)))
+        cache.put(("Inlines", 0), data)
+        self.assertIs(cache.get(("Inlines", 0)), data)
+
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 1)
+        self.assertEqual(cache.bytes, data.nbytes)
+        self.assertIn(("Inlines", 0), cache)
+
+    def test_least_recently_used_is_evicted(self):
+        cache = SliceCache(max_bytes=2 * 64)
+        cache.put(("Inlines", 0), np.zeros((4, 4), dtype=np.single))
+        cache.put(("Inlines", 1), np.zeros((4, 4), dtype=np.single))
+        cache.get(("Inlines", 0))
+        cache.put(("Inlines", 2), np.zeros((4, 4), dtype=np.single))
+
+        self.assertIn(("Inlines", 0), cache)
+        self.assertNotIn(("Inlines", 1), cache)
+        self.assertIn(("Inlines", 2), cache)
+        self.assertEqual(cache.evictions, 1)
+        self.assertLessEqual(cache.bytes, cache.max_bytes)
+
+    def test_budget(self):
+        cache = SliceCache(max_bytes=32)
+        cache.put(("Depth", 0), np.zeros((4, 4), dtype=np.single))
+        self.assertEqual(len(cache), 0)
+
+        cache.max_bytes = 1024
+        cache.put(("Depth", 0), np.zeros((4, 4), dtype=np.single))
+        cache.put(("Depth", 1), np.zeros((4, 4), dtype=np.single))
+        cache.max_bytes = 64
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.bytes, 64)
+
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.bytes, 0)
+
+    def test_memory_budget(self):
+        budget = MemoryBudget(max_bytes=3 * 64)
+        shown = SliceCache(budget=budget)
+        hidden = SliceCache(budget=budget)
+        hidden.priority = MemoryBudget.OFF_SCREEN
+        shown.distance = lambda key: abs(key[1] - 5)
+
+        hidden.put(("Inlines", 0), np.zeros((4, 4), dtype=np.single))
+        for index in [4, 5, 9]:
+            shown.put(("Inlines", index), np.zeros((4, 4), dtype=np.single))
+
+        self.assertEqual(len(hidden), 0)
+        self.assertEqual(len(shown), 3)
+
+        shown.put(("Inlines", 6), np.zeros((4, 4), dtype=np.single))
+        self.assertNotIn(("Inlines", 9), shown)
+        self.assertEqual(budget.bytes, 3 * 64)
+        self.assertEqual(budget.evictions, 2)
+        self.assertEqual(len(budget.accounts), 2)
+
+        # an evictable account goes after the slices of its priority
+        evicted = []
+        cube = MemoryAccount(2 * 64, lambda: evicted.append(True), MemoryBudget.ON_SCREEN, budget)
+        self.assertEqual(evicted, [])
+        self.assertEqual(len(shown), 1)
+
+        model_buffers = MemoryAccount(budget=budget)
+        model_buffers.bytes = 2 * 64
+        self.assertEqual(evicted, [True])
+        self.assertEqual(len(shown), 0)
+        self.assertEqual(cube.bytes, 0)
+        self.assertEqual(budget.bytes, 2 * 64)
+
+    def test_warm_caches(self):
+        budget = MemoryBudget(max_bytes=2 * 64)
+        shown = SliceCache(budget=budget)
+        warm = SliceCache(budget=budget)
+        warm.priority = MemoryBudget.WARM
+        hidden = SliceCache(budget=budget)
+        hidden.priority = MemoryBudget.OFF_SCREEN
+
+        warm.put(("Inlines", 0), np.zeros((4, 4), dtype=np.single))
+        hidden.put(("Inlines", 0), np.zeros((4, 4), dtype=np.single))
+        shown.put(("Inlines", 0), np.zeros((4, 4), dtype=np.single))
+
+        # the warm slices go after the hidden, and before the shown ones
+        self.assertEqual(len(hidden), 0)
+        self.assertEqual(len(warm), 1)
+        self.assertEqual(len(shown), 1)
+
+        shown.put(("Inlines", 1), np.zeros((4, 4), dtype=np.single))
+        self.assertEqual(len(warm), 0)
+        self.assertEqual(len(shown), 2)
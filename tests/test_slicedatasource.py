@@ -0,0 +1,408 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+import segyio
+from PyQt4.QtCore import QCoreApplication
+
+from segyviewlib import SliceDataSource, SliceDirection as SD, DepthSidecar, BrickStore, GeometryIndex
+from segyviewlib import SliceCache, SlicePyramid, MemoryBudget, source_registry
+from segyviewlib.inmemorycube import InMemoryCube
+from segyviewlib.slicedatasource import read_line_window
+from segyviewlib._workerpool import worker_pool
+from .test_segyviewwidget import data_path
+
+
+class SliceDataSourceTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "small.sgy")
+        shutil.copy(data_path("small.sgy"), self.filename)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def temporaries(self):
+        """ The temporary files of sidecar builds left in the directory. """
+        return [name for name in os.listdir(self.directory) if name.endswith(".tmp")]
+
+    def test_cached_reads(self):
+        source = SliceDataSource(self.filename, prefetch_count=0)
+        first = source.read_slice(SD.inline, 1)
+        second = source.read_slice(SD.inline, 1)
+
+        self.assertIs(first, second)
+        self.assertEqual(source.cache.hits, 1)
+        self.assertEqual(source.cache.misses, 1)
+
+    def test_depth_sidecar(self):
+        plain = SliceDataSource(self.filename, prefetch_count=0)
+        source = SliceDataSource(self.filename, prefetch_count=0, depth_sidecar=True)
+
+        self.assertIsNotNone(source.depth_sidecar)
+        self.assertTrue(os.path.exists(self.filename + DepthSidecar.SUFFIX))
+
+        for index in range(len(plain.indexes_for_direction(SD.depth))):
+            np.testing.assert_array_equal(source.read_slice(SD.depth, index),
+                                          plain.read_slice(SD.depth, index))
+
+    def test_unwritable_depth_sidecar(self):
+        # a directory in the way of the sidecar makes it impossible to write
+        os.mkdir(self.filename + DepthSidecar.SUFFIX)
+
+        plain = SliceDataSource(self.filename, prefetch_count=0)
+        source = SliceDataSource(self.filename, prefetch_count=0, depth_sidecar=True)
+
+        self.assertIsNone(source.depth_sidecar)
+        self.assertEqual(self.temporaries(), [])
+        np.testing.assert_array_equal(source.read_slice(SD.depth, 1), plain.read_slice(SD.depth, 1))
+
+    def test_unwritable_brick_store(self):
+        os.mkdir(self.filename + BrickStore.SUFFIX)
+
+        plain = SliceDataSource(self.filename, prefetch_count=0)
+        source = SliceDataSource(self.filename, prefetch_count=0, brick_store=True)
+
+        self.assertIsNone(source.brick_store)
+        np.testing.assert_array_equal(source.read_slice(SD.crossline, 1), plain.read_slice(SD.crossline, 1))
+
+    def test_unwritable_pyramid(self):
+        os.mkdir(self.filename + SlicePyramid.SUFFIX)
+
+        source = SliceDataSource(self.filename, prefetch_count=0, pyramid=True)
+
+        self.assertIsNone(source.pyramid)
+        self.assertEqual(source.overview_step, (1, 1))
+        self.assertEqual(source.read_slice(SD.inline, 1, step=(2, 2)).shape,
+                         source.read_slice(SD.inline, 1)[::2, ::2].shape)
+
+    def test_interrupted_build(self):
+        def interrupt(fraction):
+            raise KeyboardInterrupt()
+
+        with segyio.open(self.filename) as f:
+            for sidecar in [DepthSidecar, BrickStore]:
+                with self.assertRaises(KeyboardInterrupt):
+                    sidecar.build(self.filename, f, progress=interrupt)
+
+                self.assertFalse(os.path.exists(self.filename + sidecar.SUFFIX))
+                self.assertEqual(self.temporaries(), [])
+
+    def test_concurrent_builds(self):
+        plain = SliceDataSource(self.filename, prefetch_count=0)
+
+        with segyio.open(self.filename) as f:
+            built = []
+
+            # another source builds the same sidecar in the middle of this build
+            def build_meanwhile(fraction):
+                if not built:
+                    built.append(DepthSidecar.build(self.filename, f))
+
+            DepthSidecar.build(self.filename, f, progress=build_meanwhile)
+            sidecar = DepthSidecar.open(self.filename, f)
+
+        self.assertIsNotNone(sidecar)
+        self.assertEqual(self.temporaries(), [])
+        np.testing.assert_array_equal(sidecar.depth_slice(1), plain.read_slice(SD.depth, 1))
+
+    def test_stale_depth_sidecar(self):
+        with segyio.open(self.filename) as f:
+            DepthSidecar.build(self.filename, f)
+            self.assertIsNotNone(DepthSidecar.open(self.filename, f))
+
+            os.utime(self.filename, (0, 0))
+            self.assertIsNone(DepthSidecar.open(self.filename, f))
+
+    def test_sidecar_fields(self):
+        other = (5, 193, 'big')
+
+        with segyio.open(self.filename) as f:
+            for sidecar in [DepthSidecar, BrickStore, SlicePyramid]:
+                sidecar.build(self.filename, f)
+                self.assertIsNotNone(sidecar.open(self.filename, f))
+                self.assertIsNotNone(sidecar.open(self.filename, f, fields=GeometryIndex.fields_for({})))
+
+                # the same file opened with other header fields has another geometry
+                self.assertIsNone(sidecar.open(self.filename, f, fields=other))
+
+                sidecar.build(self.filename, f, fields=other)
+                self.assertEqual(sidecar.open(self.filename, f, fields=other).fields, other)
+                self.assertIsNone(sidecar.open(self.filename, f))
+
+    def test_brick_store(self):
+        plain = SliceDataSource(self.filename, prefetch_count=0)
+        source = SliceDataSource(self.filename, prefetch_count=0, brick_store=True)
+
+        self.assertIsNotNone(source.brick_store)
+
+        for direction in [SD.inline, SD.crossline, SD.depth]:
+            for index in range(len(plain.indexes_for_direction(direction))):
+                np.testing.assert_array_equal(source.read_slice(direction, index),
+                                              plain.read_slice(direction, index))
+
+    def test_small_bricks(self):
+        with segyio.open(self.filename) as f:
+            store = BrickStore.build(self.filename, f, brick_size=2)
+            cube = segyio.tools.cube(f)
+
+            np.testing.assert_array_equal(store.read_cube(slice(1, 4), slice(None), slice(3, 40)),
+                                          cube[1:4, :, 3:40])
+            store.close()
+
+    def test_decimated_reads(self):
+        source = SliceDataSource(self.filename, prefetch_count=0)
+        full = source.read_slice(SD.inline, 2)
+
+        decimated = source.read_slice(SD.inline, 2, step=(4, 2))
+        np.testing.assert_array_equal(decimated, full[::4, ::2])
+
+        source.average_decimation = True
+        averaged = source.read_slice(SD.inline, 2, step=(4, 2))
+        self.assertEqual(averaged.shape, decimated.shape)
+        self.assertAlmostEqual(averaged[0, 0], full[0:4, 0:2].mean(), places=5)
+
+    def test_pyramid(self):
+        source = SliceDataSource(self.filename, prefetch_count=0, pyramid=True)
+        self.assertIsNotNone(source.pyramid)
+        self.assertEqual(source.overview_step, (8, 8))
+
+        with segyio.open(self.filename) as f:
+            cube = segyio.tools.cube(f)
+
+        inline = source.read_slice(SD.inline, 2, step=(2, 2))
+        self.assertEqual(inline.shape, (25, 3))
+        self.assertAlmostEqual(inline[0, 0], cube[2:4, 0:2, 0:2].mean(), places=5)
+
+        depth = source.read_slice(SD.depth, 10, step=(4, 2))
+        self.assertEqual(depth.shape, (2, 3))
+        self.assertTrue(source.is_cached(SD.depth, 10, step=(4, 2)))
+
+    def test_in_memory_cube(self):
+        plain = SliceDataSource(self.filename, prefetch_count=0)
+        source = SliceDataSource(self.filename, prefetch_count=0, in_memory_limit=SliceDataSource.SMALL_FILE_SIZE)
+        worker_pool().waitForDone()
+
+        cube = source.in_memory_cube
+        self.assertIsNotNone(cube)
+        self.assertFalse(source.in_memory_loading)
+        self.assertEqual(cube.shape, (5, 5, 50))
+
+        for direction in [SD.inline, SD.crossline, SD.depth]:
+            data = source.read_slice(direction, 2)
+            np.testing.assert_array_equal(data, plain.read_slice(direction, 2))
+            self.assertTrue(source.is_cached(direction, 3))
+
+        self.assertEqual(len(source.cache), 0)
+
+        # the limit is on the size of the cube, 5 * 5 * 50 floats
+        small = SliceDataSource(self.filename, prefetch_count=0, in_memory_limit=5 * 5 * 50 * 4)
+        worker_pool().waitForDone()
+        self.assertIsNone(small.in_memory_cube)
+
+    def test_in_memory_cube_closed_while_loading(self):
+        closed = []
+
+        class ClosingLock(object):
+            # the file is closed by someone else while waiting for the lock
+            def __enter__(self):
+                closed.append(True)
+
+            def __exit__(self, *args):
+                pass
+
+        with segyio.open(self.filename) as f:
+            self.assertIsNone(InMemoryCube.load(f, ClosingLock(), cancelled=lambda: bool(closed)))
+
+    def test_warm_source(self):
+        source = SliceDataSource(self.filename, prefetch_count=0, pyramid=True)
+        source.active = False
+        self.assertEqual(source.cache.priority, MemoryBudget.OFF_SCREEN)
+        self.assertEqual(source.cache.max_bytes, SliceDataSource.INACTIVE_CACHE_SIZE)
+
+        source.warm = True
+        self.assertEqual(source.cache.priority, MemoryBudget.WARM)
+        self.assertEqual(source.cache.max_bytes, SliceCache.DEFAULT_MAX_BYTES)
+
+        # slices shown from the pyramid are preloaded from the pyramid
+        source.preload_slice(SD.inline, 2, (2, 2))
+        self.assertTrue(source.is_cached(SD.inline, 2, (2, 2)))
+        self.assertFalse(source.is_cached(SD.inline, 2))
+
+        hits = source.cache.hits
+        source.read_slice(SD.inline, 2, (2, 2))
+        self.assertEqual(source.cache.hits, hits + 1)
+
+    def test_decimation(self):
+        source = SliceDataSource(self.filename, prefetch_count=0, pyramid=True)
+
+        self.assertIsNone(source.decimation((1, 1)))
+        self.assertEqual(source.decimation((2, 2)), "pyramid")
+        self.assertEqual(source.decimation((1, 2)), "pick")
+
+        source.average_decimation = True
+        self.assertEqual(source.decimation((1, 2)), "average")
+
+        # a cube in memory is decimated from the full slices
+        source = SliceDataSource(self.filename, prefetch_count=0, pyramid=True, in_memory_limit=10 ** 9)
+        worker_pool().waitForDone()
+        QCoreApplication.processEvents()
+        self.assertIsNotNone(source.in_memory_cube)
+        self.assertEqual(source.decimation((2, 2)), "pick")
+
+    def test_window_reads(self):
+        plain = SliceDataSource(self.filename, prefetch_count=0)
+        bricks = SliceDataSource(self.filename, prefetch_count=0, brick_store=True)
+        window = (10, 31, 2, 5)
+
+        for direction in [SD.inline, SD.crossline]:
+            full = plain.read_slice(direction, 1)
+            np.testing.assert_array_equal(plain.read_slice(direction, 1, window=window), full[10:31, 2:5])
+            np.testing.assert_array_equal(bricks.read_slice(direction, 1, window=window), full[10:31, 2:5])
+            np.testing.assert_array_equal(bricks.read_slice(direction, 1, step=(2, 1), window=window),
+                                          full[10:31:2, 2:5])
+
+        self.assertEqual(len(bricks.cache), 0)
+        self.assertEqual(len(plain.cache), 2)
+
+    def test_window_reads_from_file(self):
+        class CountingRaw(object):
+            def __init__(self, raw):
+                self.raw = raw
+                self.traces = 0
+
+            def __getitem__(self, i):
+                data = self.raw[i]
+                self.traces += len(data)
+                return data
+
+        class CountingSource(object):
+            # reads through segyio, counting the traces read
+            def __init__(self, f):
+                self.ilines = f.ilines
+                self.xlines = f.xlines
+                self.sorting = f.sorting
+                self.raw = CountingRaw(f.trace.raw)
+                self.trace = self
+
+        window = (10, 31, 2, 4)
+        with segyio.open(self.filename) as f:
+            f.mmap()
+            counting = CountingSource(f)
+
+            for direction, line in [(SD.inline, f.iline[f.ilines[1]]), (SD.crossline, f.xline[f.xlines[1]])]:
+                counting.raw.traces = 0
+                data = read_line_window(counting, direction, 1, window)
+                np.testing.assert_array_equal(data, line.T[10:31, 2:4])
+                self.assertEqual(counting.raw.traces, 2)
+
+        # the window is not cached, the full slice is left for the prefetcher
+        source = SliceDataSource(self.filename, prefetch_count=0)
+        data = source.read_slice(SD.inline, 1, window=window)
+        self.assertEqual(len(source.cache), 0)
+        np.testing.assert_array_equal(data, source.read_slice(SD.inline, 1)[10:31, 2:4])
+
+    def test_geometry_index(self):
+        plain = SliceDataSource(self.filename, prefetch_count=0)
+        SliceDataSource(self.filename, prefetch_count=0, geometry_index=True)
+        self.assertTrue(os.path.exists(self.filename + GeometryIndex.SUFFIX))
+
+        fields = GeometryIndex.fields_for({})
+        index = GeometryIndex.open(self.filename, fields)
+        np.testing.assert_array_equal(index.ilines, [1, 2, 3, 4, 5])
+        np.testing.assert_array_equal(index.xlines, [20, 21, 22, 23, 24])
+        self.assertIsNone(GeometryIndex.open(self.filename, (5, 193, 'big')))
+
+        source = SliceDataSource(self.filename, prefetch_count=0, geometry_index=True)
+        for direction in [SD.inline, SD.crossline, SD.depth]:
+            np.testing.assert_array_equal(source.indexes_for_direction(direction),
+                                          plain.indexes_for_direction(direction))
+            np.testing.assert_array_equal(source.read_slice(direction, 2), plain.read_slice(direction, 2))
+
+        os.utime(self.filename, (0, 0))
+        self.assertIsNone(GeometryIndex.open(self.filename, fields))
+
+    def test_background_open(self):
+        source = SliceDataSource(None, prefetch_count=0)
+        changes = []
+        source.slice_data_source_changed.connect(lambda: changes.append(source.source_filename))
+
+        source.open_source_filename(self.filename)
+        worker_pool().waitForDone()
+        QCoreApplication.processEvents()
+        self.assertFalse(source.opening)
+        self.assertEqual(changes, [self.filename])
+        self.assertEqual(len(source.indexes_for_direction(SD.inline)), 5)
+
+        failures = []
+        source.open_failed.connect(failures.append)
+        source.open_source_filename(os.path.join(self.directory, "missing.sgy"))
+        worker_pool().waitForDone()
+        QCoreApplication.processEvents()
+        self.assertEqual(len(failures), 1)
+        self.assertEqual(source.source_filename, self.filename)
+
+    def test_preload_without_file(self):
+        source = SliceDataSource(self.filename, prefetch_count=0)
+        source.set_source_filename(None)
+        source.preload_slice(SD.inline, 1)
+        source.prefetch(SD.inline, 1)
+        self.assertEqual(len(source.cache), 0)
+
+        # a prefetch scheduled before a shared file was closed runs with no
+        # file at all
+        first = SliceDataSource(self.filename, prefetch_count=0, shared=True)
+        second = SliceDataSource(self.filename, prefetch_count=0, shared=True)
+        first._close_current_file()
+        first.preload_slice(SD.inline, 1)
+        first.prefetch(SD.inline, 1)
+        self.assertNotIn((SD.inline['name'], 1), second.cache)
+        second.set_source_filename(None)
+
+    def test_inactive_source(self):
+        source = SliceDataSource(self.filename, cache_size=10 ** 9)
+        source.active = False
+        self.assertEqual(source.cache.max_bytes, SliceDataSource.INACTIVE_CACHE_SIZE)
+
+        source.active = True
+        self.assertEqual(source.cache.max_bytes, 10 ** 9)
+
+    def test_shared_sources(self):
+        registry = source_registry()
+        count = len(registry)
+
+        first = SliceDataSource(self.filename, prefetch_count=0, shared=True)
+        second = SliceDataSource(self.filename, prefetch_count=0, shared=True, cache_size=10 ** 9)
+        other = SliceDataSource(self.filename, prefetch_count=0)
+
+        self.assertIs(first.shared_source, second.shared_source)
+        self.assertIs(first.cache, second.cache)
+        self.assertIsNot(first.cache, other.cache)
+        self.assertEqual(len(registry), count + 1)
+        self.assertEqual(first.shared_source.references, 2)
+        self.assertEqual(first.cache.max_bytes, 10 ** 9)
+
+        data = first.read_slice(SD.inline, 2)
+        self.assertIs(second.read_slice(SD.inline, 2), data)
+
+        second.set_source_filename(None)
+        self.assertEqual(first.shared_source.references, 1)
+        self.assertEqual(first.cache.max_bytes, SliceCache.DEFAULT_MAX_BYTES)
+        np.testing.assert_array_equal(first.read_slice(SD.crossline, 1), other.read_slice(SD.crossline, 1))
+
+        first.set_source_filename(None)
+        self.assertEqual(len(registry), count)
+
+        limit = SliceDataSource.SMALL_FILE_SIZE
+        first = SliceDataSource(self.filename, prefetch_count=0, shared=True, in_memory_limit=limit)
+        second = SliceDataSource(self.filename, prefetch_count=0, shared=True, in_memory_limit=limit)
+        worker_pool().waitForDone()
+
+        self.assertIsNotNone(first.in_memory_cube)
+        self.assertIs(first.in_memory_cube, second.in_memory_cube)
+        self.assertIs(first.shared_source.cube, first.in_memory_cube)
+
+        first.set_source_filename(None)
+        second.set_source_filename(None)
@@ -0,0 +1,41 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from segyviewlib import SliceExporter, export_slices
+from .test_segyviewwidget import data_path
+
+
+class SliceExportTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = data_path("small.sgy")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_slice_jobs(self):
+        exporter = SliceExporter(self.filename)
+        jobs = exporter.slice_jobs('inline', every=2, directory=self.directory)
+
+        self.assertEqual([index for _, index, _ in jobs], [0, 2, 4])
+        self.assertEqual(jobs[1][2], os.path.join(self.directory, "small-inline-3.png"))
+
+    def test_export(self):
+        exporter = SliceExporter(self.filename, dpi=20)
+        for direction in ['inline', 'crossline', 'depth']:
+            path = os.path.join(self.directory, "%s.png" % direction)
+            exporter.export(direction, 1, path)
+            self.assertTrue(os.path.getsize(path) > 0)
+
+    def test_export_slices(self):
+        exporter = SliceExporter(self.filename)
+        jobs = exporter.slice_jobs('crossline', every=2, directory=self.directory, image_format="pdf")
+
+        written = []
+        export_slices(self.filename, jobs, processes=2, progress=written.append, dpi=20)
+
+        self.assertEqual(sorted(written), sorted(path for _, _, path in jobs))
+        for path in written:
+            self.assertTrue(os.path.exists(path))
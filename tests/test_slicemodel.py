@@ -119,6 +119,21 @@ class SliceModelTest(TestCase):
         self.assertEqual(model.y_index, 33)
         self.assertFalse(model.visible)
 
+    def test_middle_indexes(self):
+        model = SliceModel("test", SD.inline, SD.crossline, SD.depth)
+        model.indexes = [1, 2, 3, 4, 5]
+        model.x_indexes = [2, 4, 6, 8]
+        model.y_indexes = [1, 3, 5]
+
+        self.assertEqual(model.index, 2)
+        self.assertEqual(model.x_index, 2)
+        self.assertEqual(model.y_index, 1)
+
+        # the indexes are used to index lists and arrays
+        self.assertIsInstance(model.index, int)
+        self.assertIsInstance(model.x_index, int)
+        self.assertIsInstance(model.y_index, int)
+
     def test_reset(self):
         model = SliceModel("test", SD.inline, SD.crossline, SD.depth)
         model.data = np.zeros((3, 5))
@@ -142,4 +157,73 @@ class SliceModelTest(TestCase):
         self.assertEqual(model.y_index, 0)
         self.assertIsNone(model.indexes)
         self.assertIsNone(model.x_indexes)
-        self.assertIsNone(model.y_indexes)
\ No newline at end of file
+        self.assertIsNone(model.y_indexes)
+
+    def test_decimated_data(self):
+        model = SliceModel("test", SD.inline, SD.crossline, SD.depth)
+        model.x_indexes = [1, 2, 3, 4, 5]
+        model.y_indexes = [1, 2, 3, 4, 5, 6, 7, 8]
+        model.set_data(np.zeros((4, 3)), step=(2, 2))
+
+        self.assertEqual(model.data_step, (2, 2))
+        self.assertEqual(model.width, 5)
+        self.assertEqual(model.height, 8)
+        self.assertFalse(model.dirty)
+
+        model.resolution_step = (1, 1)
+        self.assertTrue(model.dirty)
+
+        with self.assertRaises(ValueError):
+            model.set_data(np.zeros((4, 3)), step=(1, 1))
+
+    def test_data_decimation(self):
+        model = SliceModel("test", SD.inline, SD.crossline, SD.depth)
+        model.x_indexes = list(range(4))
+        model.y_indexes = list(range(4))
+
+        model.set_data(np.zeros((2, 2)), (2, 2), decimation="pyramid")
+        self.assertEqual(model.data_decimation, "pyramid")
+
+        model.set_data(np.zeros((4, 4)))
+        self.assertIsNone(model.data_decimation)
+
+    def test_windowed_data(self):
+        model = SliceModel("test", SD.inline, SD.crossline, SD.depth)
+        model.x_indexes = list(range(10))
+        model.y_indexes = list(range(20))
+        model.set_data(np.zeros((5, 3)), step=(2, 1), window=(4, 14, 6, 9))
+
+        self.assertEqual(model.data_window, (4, 14, 6, 9))
+        self.assertEqual(model.data_extent, (6, 9, 14, 4))
+        self.assertTrue(model.covers((5, 10, 6, 8)))
+        self.assertFalse(model.covers((0, 10, 6, 8)))
+
+        model.window = None
+        self.assertTrue(model.dirty)
+
+        model.set_data(np.zeros((20, 10)))
+        self.assertIsNone(model.data_window)
+        self.assertEqual(model.data_extent, (0, 10, 20, 0))
+        self.assertTrue(model.covers((0, 20, 0, 10)))
+
+    def test_sanitised_data(self):
+        model = SliceModel("test", SD.inline, SD.crossline, SD.depth)
+        source = np.arange(15, dtype=np.single).reshape(5, 3)
+        source[0, 0] = np.inf
+        source[1, 1] = -np.inf
+        source[2, 2] = np.nan
+        data = source.T
+
+        model.data = data
+        self.assertEqual(source[0, 0], np.inf)
+        self.assertEqual(model.data[0, 0], 0.0)
+        self.assertEqual(model.data[1, 1], 0.0)
+        self.assertTrue(np.isnan(model.data[2, 2]))
+        self.assertEqual(model.min_value, 0.0)
+        self.assertEqual(model.max_value, 14.0)
+
+        first = model.data
+        model.data = np.ones((3, 5), dtype=np.single)
+        model.data = np.ones((3, 5), dtype=np.single)
+        self.assertIs(model.data, first)
+        self.assertEqual(model.min_value, 1.0)
@@ -0,0 +1,33 @@
+from unittest import TestCase
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from segyviewlib import SliceModel, SliceDirection as SD, SliceView
+
+
+class SliceViewTest(TestCase):
+    def test_interaction_region(self):
+        figure = Figure(figsize=(8, 6), dpi=100)
+        canvas = FigureCanvasAgg(figure)
+        axes = figure.add_subplot(2, 2, 1)
+
+        model = SliceModel("test", SD.inline, SD.crossline, SD.depth)
+        model.x_indexes = [1, 2, 3, 4, 5]
+        model.y_indexes = [10, 20, 30]
+        model.data = np.zeros((3, 5))
+        slice_view = SliceView(axes, model)
+        canvas.draw()
+
+        renderer = canvas.get_renderer()
+        region = slice_view.interaction_region(renderer)
+
+        # the axes and their tick labels, and not the rest of the figure
+        for extent in [axes.bbox, axes.xaxis.get_tightbbox(renderer), axes.yaxis.get_tightbbox(renderer)]:
+            self.assertLessEqual(region.x0, extent.x0)
+            self.assertLessEqual(region.y0, extent.y0)
+            self.assertGreaterEqual(region.x1, extent.x1)
+            self.assertGreaterEqual(region.y1, extent.y1)
+
+        self.assertLess(region.width * region.height, figure.bbox.width * figure.bbox.height / 2)
@@ -0,0 +1,51 @@
+from unittest import TestCase
+
+import numpy as np
+
+from segyviewlib import SliceDataSource, SliceDirection as SD, SliceModel, SliceViewContext, SliceViewWidget
+# the QApplication is created by test_segyviewwidget
+from .test_segyviewwidget import data_path
+
+THREE_BOTTOM = {"dims": (2, 2), "grid": [(0, 0), (0, 1), (1, slice(0, 2))]}
+TWO_HORIZONTAL = {"dims": (2, 1), "grid": [(0, 0), (1, 0)]}
+
+
+def slice_view_widget():
+    models = [SliceModel("Inline", SD.inline, SD.crossline, SD.depth),
+              SliceModel("Crossline", SD.crossline, SD.inline, SD.depth),
+              SliceModel("Depth", SD.depth, SD.inline, SD.crossline)]
+    context = SliceViewContext(models, SliceDataSource(data_path("small.sgy"), prefetch_count=0))
+    return SliceViewWidget(context)
+
+
+class SliceViewWidgetTest(TestCase):
+    def test_layout_change_reuses_slice_views(self):
+        widget = slice_view_widget()
+        figure = widget.layout_figure()
+
+        widget.set_plot_layout(THREE_BOTTOM)
+        axes = figure.layout_axes()
+        views = [widget._slice_views[ax] for ax in axes]
+        data = [view.model().data for view in views]
+
+        widget.set_plot_layout(TWO_HORIZONTAL)
+
+        # the views of the axes that are left keep their axes, model and data
+        self.assertEqual(figure.layout_axes(), axes[:2])
+        self.assertEqual(len(widget._slice_views), 2)
+        for ax, view, view_data in zip(axes[:2], views, data):
+            self.assertIs(widget._slice_views[ax], view)
+            self.assertIs(view.model().data, view_data)
+        self.assertFalse(views[2].model().visible)
+
+        # and are placed as in a widget laid out from scratch
+        fresh = slice_view_widget()
+        fresh.set_plot_layout(TWO_HORIZONTAL)
+        for ax, fresh_ax in zip(figure.layout_axes(), fresh.layout_figure().layout_axes()):
+            np.testing.assert_allclose(ax.get_position().bounds, fresh_ax.get_position().bounds)
+
+        # a view comes back for the axes added when growing the layout again
+        widget.set_plot_layout(THREE_BOTTOM)
+        self.assertEqual(figure.layout_axes()[:2], axes[:2])
+        self.assertEqual(len(widget._slice_views), 3)
+        self.assertTrue(views[2].model().visible)